@@ -22,7 +22,7 @@ from langchain.schema.runnable import RunnablePassthrough
 
 # 配置和工具
 from config.settings import get_settings
-from tools.mcp_tools import list_mcp_tools
+from tools.tool_catalog import get_tool_catalog
 # 删除 get_all_mcp_tools, get_all_mcp_tool_descriptions 的导入
 
 class BaseAgent(ABC):
@@ -141,7 +141,7 @@ class BaseAgent(ABC):
     def _create_fallback_llm(self) -> LLM:
         """创建后备LLM"""
         class FallbackLLM(LLM):
-            def _call(self, prompt: str, stop: Optional[List[str]] = None) -> str:
+            def _call(self, prompt: str, stop: Optional[List[str]] = None, **kwargs) -> str:
                 return f"回显: {prompt}"
             
             @property
@@ -169,11 +169,9 @@ class BaseAgent(ABC):
         return memory
     
     def get_all_tool_schemas(self):
-        """获取所有MCP工具的schema/描述，便于LLM参数补全和工具选择（如需可远程调用MCP服务获取）"""
+        """获取所有MCP工具的schema/描述，便于LLM参数补全和工具选择（来自共享工具目录，过期时后台刷新）"""
         try:
-            schemas = list_mcp_tools()
-            self.logger.info(f"远程MCP服务加载到 {len(schemas)} 个工具")
-            return schemas
+            return get_tool_catalog().get_schemas()
         except Exception as e:
             self.logger.error(f"远程MCP工具加载失败: {e}")
             return []
@@ -222,10 +220,9 @@ class BaseAgent(ABC):
         return APITool()
     
     def _load_base_prompt(self, prompt_name):
-        import os
-        prompt_path = os.path.join(os.path.dirname(__file__), 'prompt', 'base_agent', f'{prompt_name}.txt')
-        with open(prompt_path, 'r', encoding='utf-8') as f:
-            return f.read()
+        """从全局提示词注册表获取预编译模板（不再逐次读盘）"""
+        from .utils.prompt_registry import get_prompt_registry
+        return get_prompt_registry().get(f'base_agent/{prompt_name}')
 
     def _setup_prompt(self):
         """设置提示词模板"""
@@ -392,10 +389,40 @@ class BaseAgent(ABC):
         except Exception as e:
             self.logger.error(f"状态加载失败: {e}")
     
-    def llm_structured(self, prompt: str) -> dict:
-        """统一结构化LLM输出，自动处理代码块格式，返回dict"""
-        llm_response = self.llm(prompt)
+    def llm_structured(self, prompt: str, system_prompt: str = None) -> dict:
+        """
+        统一结构化LLM输出，自动处理代码块格式，返回dict。
+        system_prompt 通常为提示词模板的静态前缀（见 CompiledPrompt.render_split），利于命中提示词前缀缓存。
+        """
+        from .utils import telemetry
+        kwargs = {"system_prompt": system_prompt} if system_prompt else {}
+        with telemetry.scope(agent=self.name):
+            llm_response = self.llm(prompt, **kwargs)
         return self.llm.parse_code_block_response(llm_response)
+
+    def llm_structured_batch(self, prompts: List[str], max_concurrency: int = None) -> List[dict]:
+        """批量结构化LLM输出：多个相互独立的提示词以有限并发同时请求，按顺序返回解析后的dict列表"""
+        from .utils import telemetry
+        with telemetry.scope(agent=self.name):
+            if hasattr(self.llm, 'batch_call'):
+                responses = self.llm.batch_call(prompts, max_concurrency=max_concurrency)
+            else:
+                responses = [self.llm(prompt) for prompt in prompts]
+        return [self.llm.parse_code_block_response(r) for r in responses]
+
+    def llm_structured_stream(self, prompt: str, list_key: str = "tasks", system_prompt: str = None):
+        """
+        流式结构化LLM输出：边接收token边增量解析，list_key 列表中的元素一旦完整即产出，
+        调用方无需等待整段响应结束即可开始处理前面的元素；流结束后以完整解析结果兜底补齐。
+        """
+        from .utils.stream_parser import IncrementalStructuredParser
+        parser = IncrementalStructuredParser(list_key=list_key)
+        kwargs = {"system_prompt": system_prompt} if system_prompt else {}
+        for delta in self.llm.stream(prompt, **kwargs):
+            for item in parser.feed(delta):
+                yield item
+        for item in parser.remaining_items(parser.close()):
+            yield item
     
     @abstractmethod
     def _get_agent_description(self) -> str:
@@ -0,0 +1,346 @@
+# -*- coding: utf-8 -*-
+"""
+任务作业管理 - 接收用户输入并排队，由有界的工作协程池在线程中执行
+TaskIncubator.incubate_stream（JOB_STREAM_BLUEPRINT 关闭时为 incubate）+ Orchestrator.dispatch，
+流式孵化时蓝图中的任务一经生成即开始执行；提供作业状态、运行事件流、队列指标与准入控制。
+排队作业按租户与优先级加权公平出队，作业运行时的LLM/MCP调用也按同一调度流共享槽位（见 tools.scheduler）
+"""
+
+import asyncio
+import itertools
+import json
+import secrets
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Any, Dict, List, Optional
+
+from config.settings import get_settings
+from tools import deadline, scheduler
+
+# 作业终态
+FINISHED_STATES = ("completed", "failed", "cancelled")
+
+
+class QueueFullError(Exception):
+    """排队作业数已达上限，新作业被拒绝"""
+
+
+def _jsonable(value: Any) -> Any:
+    from agents.orchestrator import safe_to_dict
+    return json.loads(json.dumps(safe_to_dict(value), ensure_ascii=False, default=str))
+
+
+@dataclass
+class Job:
+    """一个作业：用户输入、状态、结果与按顺序记录的运行事件"""
+    job_id: str
+    user_input: Any
+    tenant: str = scheduler.DEFAULT_TENANT
+    priority: str = "normal"
+    status: str = "queued"  # queued / incubating / running / completed / failed / cancelled
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    run_id: Optional[str] = None
+    result: Any = None
+    error: Optional[str] = None
+    events: List[Dict[str, Any]] = field(default_factory=list)
+    scope: Optional[deadline.Deadline] = None
+    _changed: Optional[asyncio.Condition] = None
+
+    def to_dict(self, include_result: bool = True) -> Dict[str, Any]:
+        data = {
+            "job_id": self.job_id,
+            "status": self.status,
+            "tenant": self.tenant,
+            "priority": self.priority,
+            "run_id": self.run_id,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+            "events": len(self.events),
+        }
+        if include_result and self.status in FINISHED_STATES:
+            data["result"] = self.result
+        return data
+
+
+class JobManager:
+    """
+    作业队列与工作池。
+
+    submit 在排队数达到 JOB_QUEUE_MAX 时抛出 QueueFullError（准入控制）；排队作业按 (租户, 优先级) 加权公平出队，
+    大批量作业排队时交互式作业仍能优先开始。start 启动 JOB_WORKERS 个工作协程，
+    每个作业在独立线程中同步执行孵化与调度，各自拥有独立的运行上下文和截止时间，
+    运行事件经 loop.call_soon_threadsafe 回到事件循环，供 SSE 订阅者实时读取。
+    """
+
+    def __init__(self, society=None, workers: Optional[int] = None, queue_max: Optional[int] = None,
+                 retention: Optional[int] = None):
+        settings = get_settings()
+        self.society = society
+        self.workers = workers or settings.job_workers
+        self.queue_max = queue_max or settings.job_queue_max
+        self.retention = retention or settings.job_retention
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._fair = scheduler.FairQueue()
+        self._seq = itertools.count()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._tasks: List[asyncio.Task] = []
+        self.running = 0
+        self.counters = {"submitted": 0, "rejected": 0, "completed": 0, "failed": 0, "cancelled": 0}
+        self.wait_seconds_sum = 0.0
+        self.run_seconds_sum = 0.0
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.PriorityQueue()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job-worker")
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """停止接收新作业：取消排队中的作业，通知进行中的作业协作式退出并等待其结束"""
+        for job in list(self.jobs.values()):
+            if job.status not in FINISHED_STATES and job.scope is not None:
+                job.scope.cancel("服务停止")
+        while self._queue is not None and not self._queue.empty():
+            job = self._queue.get_nowait()[-1]
+            if job.status == "queued":
+                self._finish(job, "cancelled", error="服务停止")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._executor is not None:
+            # 在默认线程池中等待工作线程退出，不阻塞事件循环（SSE 推送与外层的优雅停止超时仍可运行）
+            await self._loop.run_in_executor(None, partial(self._executor.shutdown, wait=True))
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def submit(self, user_input: Any, tenant: Optional[str] = None, priority: Optional[str] = None) -> Job:
+        """
+        提交作业；priority 为空时取 SCHEDULER_DEFAULT_PRIORITY，未配置的优先级抛出 ValueError，
+        start() 之前调用抛出 RuntimeError
+        """
+        if self._queue is None:
+            raise RuntimeError("JobManager 尚未启动，请先 await start()")
+        priority = scheduler.validate_priority(priority or get_settings().scheduler_default_priority)
+        if self.queue_depth >= self.queue_max:
+            self.counters["rejected"] += 1
+            raise QueueFullError(f"排队作业已达上限 {self.queue_max}")
+        job = Job(job_id=secrets.token_hex(8), user_input=user_input, tenant=tenant or scheduler.DEFAULT_TENANT,
+                  priority=priority, _changed=asyncio.Condition())
+        self.jobs[job.job_id] = job
+        self._evict()
+        self.counters["submitted"] += 1
+        tag = self._fair.tag(scheduler.Flow(job.tenant, job.priority))
+        self._queue.put_nowait((tag, next(self._seq), job))
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """取消作业：排队中的直接标记取消，运行中的在下一个任务/调用边界退出"""
+        job = self.jobs.get(job_id)
+        if job is None or job.status in FINISHED_STATES:
+            return job
+        if job.status == "queued":
+            self._finish(job, "cancelled", error="已取消")
+        elif job.scope is not None:
+            job.scope.cancel("作业已取消")
+        return job
+
+    def _evict(self):
+        """只保留最近 JOB_RETENTION 个作业，优先淘汰最早结束的，同时释放其运行产物"""
+        from agents.utils.artifact_store import get_artifact_store
+        while len(self.jobs) > self.retention:
+            finished = next((jid for jid, j in self.jobs.items() if j.status in FINISHED_STATES), None)
+            if finished is None:
+                return
+            get_artifact_store().release(self.jobs.pop(finished).run_id)
+
+    def artifact(self, job: Job, artifact_id: str, path: Optional[str] = None, offset: int = 0,
+                 limit: Optional[int] = None) -> Any:
+        """读取作业结果中引用的产物片段；产物不属于该作业或已释放时抛出 KeyError"""
+        from agents.utils.artifact_store import get_artifact_store
+        store = get_artifact_store()
+        if job.run_id is None or not store.owns(job.run_id, artifact_id):
+            raise KeyError(artifact_id)
+        return _jsonable(store.slice(artifact_id, path, offset, limit))
+
+    async def _worker(self):
+        while True:
+            tag, _, job = await self._queue.get()
+            if job.status != "queued":
+                continue
+            self._fair.advance(tag)
+            self.running += 1
+            # 在事件循环线程中先切换状态并创建截止时间作用域，之后的取消请求都能送达
+            job.scope = deadline.Deadline(name="作业")
+            self._append_event(job, {"type": "status", "time": time.time(), "status": "incubating"})
+            job.started_at = time.time()
+            self.wait_seconds_sum += job.started_at - job.created_at
+            try:
+                await self._loop.run_in_executor(self._executor, self._run_job, job)
+            finally:
+                self.running -= 1
+                self.run_seconds_sum += time.time() - job.started_at
+
+    def _run_job(self, job: Job):
+        """工作线程中执行一个作业（孵化 + 调度）"""
+        incubator = self.society.registry.get("TaskIncubator")
+        orchestrator = self.society.registry.get("Orchestrator")
+        with deadline.use(job.scope) as scope, scheduler.scheduling(job.tenant, job.priority):
+            try:
+                if get_settings().job_stream_blueprint:
+                    tasks = incubator.incubate_stream(job.user_input, self.society)["tasks"]
+                    blueprint = {"tasks": self._announce_tasks(job, tasks)}
+                else:
+                    blueprint = incubator.incubate(job.user_input, self.society)
+                    scope.check()
+                    self._post(job, {"type": "blueprint", "time": time.time(), "blueprint": _jsonable(blueprint)})
+                job.run_id = secrets.token_hex(16)
+                self._set_status(job, "running")
+                results = orchestrator.dispatch(
+                    blueprint, run_id=job.run_id,
+                    on_event=lambda event: self._post(job, _jsonable(event))
+                )
+                if scope.cancelled:
+                    self._finish_threadsafe(job, "cancelled", result=_jsonable(results), error=scope.cancel_reason)
+                else:
+                    self._finish_threadsafe(job, "completed", result=_jsonable(results))
+            except deadline.TaskCancelled as e:
+                self._finish_threadsafe(job, "cancelled", error=str(e))
+            except Exception as e:
+                self._finish_threadsafe(job, "failed", error=str(e))
+
+    def _announce_tasks(self, job: Job, tasks):
+        """流式孵化的任务逐个推送 blueprint_task 事件后交给调度，全部生成后再推送完整的 blueprint 事件"""
+        received = []
+        for task in tasks:
+            self._post(job, {"type": "blueprint_task", "time": time.time(), "task_idx": len(received), "task": _jsonable(task)})
+            received.append(task)
+            yield task
+        self._post(job, {"type": "blueprint", "time": time.time(), "blueprint": _jsonable({"tasks": received})})
+
+    # 以下方法在事件循环线程中修改作业状态并唤醒订阅者
+    def _call_soon(self, callback, *args):
+        """从工作线程把回调投递到事件循环；服务停止后事件循环已关闭时丢弃"""
+        if self._loop.is_closed():
+            return
+        try:
+            self._loop.call_soon_threadsafe(callback, *args)
+        except RuntimeError:
+            # 检查之后事件循环才关闭
+            pass
+
+    def _post(self, job: Job, event: Dict[str, Any]):
+        self._call_soon(self._append_event, job, event)
+
+    def _set_status(self, job: Job, status: str):
+        self._post(job, {"type": "status", "time": time.time(), "status": status})
+
+    def _finish_threadsafe(self, job: Job, status: str, result: Any = None, error: Optional[str] = None):
+        self._call_soon(self._finish, job, status, result, error)
+
+    def _append_event(self, job: Job, event: Dict[str, Any]):
+        if event.get("type") == "status":
+            job.status = event["status"]
+        job.events.append(event)
+        asyncio.ensure_future(self._notify(job))
+
+    def _finish(self, job: Job, status: str, result: Any = None, error: Optional[str] = None):
+        job.result, job.error, job.finished_at = result, error, time.time()
+        self.counters[status] += 1
+        self._append_event(job, {"type": "status", "time": job.finished_at, "status": status, "error": error})
+
+    async def _notify(self, job: Job):
+        async with job._changed:
+            job._changed.notify_all()
+
+    async def iter_events(self, job: Job, heartbeat_seconds: Optional[float] = None):
+        """
+        依次产出作业事件（先补发已有事件，再实时等待新事件），作业结束后停止；
+        超过 heartbeat_seconds 没有新事件时产出 None，供SSE发送心跳。
+        """
+        heartbeat_seconds = heartbeat_seconds or get_settings().job_sse_heartbeat_seconds
+        position = 0
+        while True:
+            while position < len(job.events):
+                yield job.events[position]
+                position += 1
+            if job.status in FINISHED_STATES:
+                return
+            try:
+                async with job._changed:
+                    await asyncio.wait_for(job._changed.wait_for(lambda: len(job.events) > position), heartbeat_seconds)
+            except asyncio.TimeoutError:
+                yield None
+
+    def render_prometheus(self) -> str:
+        prefix = "seven_agents_jobs"
+        states = {}
+        for job in self.jobs.values():
+            states[job.status] = states.get(job.status, 0) + 1
+        lines = [
+            f"# TYPE {prefix}_queue_depth gauge",
+            f"{prefix}_queue_depth {self.queue_depth}",
+            f"# TYPE {prefix}_queue_capacity gauge",
+            f"{prefix}_queue_capacity {self.queue_max}",
+            f"# TYPE {prefix}_running gauge",
+            f"{prefix}_running {self.running}",
+            f"# TYPE {prefix}_workers gauge",
+            f"{prefix}_workers {self.workers}",
+            f"# TYPE {prefix}_total counter",
+        ]
+        for name, value in self.counters.items():
+            lines.append(f'{prefix}_total{{outcome="{name}"}} {value}')
+        lines.append(f"# TYPE {prefix}_by_status gauge")
+        for status, count in sorted(states.items()):
+            lines.append(f'{prefix}_by_status{{status="{status}"}} {count}')
+        lines += [
+            f"# TYPE {prefix}_wait_seconds_sum counter",
+            f"{prefix}_wait_seconds_sum {self.wait_seconds_sum}",
+            f"# TYPE {prefix}_run_seconds_sum counter",
+            f"{prefix}_run_seconds_sum {self.run_seconds_sum}",
+        ]
+        lines += self._render_scheduler_metrics("seven_agents_scheduler")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _render_scheduler_metrics(prefix: str) -> List[str]:
+        """LLM/MCP 共享槽位的占用、按优先级的排队数、授予次数与累计排队秒数"""
+        snapshots = [(kind, scheduler.get_scheduler(kind).snapshot()) for kind in ("llm", "mcp")]
+        lines = [f"# TYPE {prefix}_slots gauge"]
+        lines += [f'{prefix}_slots{{pool="{name}"}} {snap["capacity"]}' for name, snap in snapshots]
+        lines.append(f"# TYPE {prefix}_slots_in_use gauge")
+        lines += [f'{prefix}_slots_in_use{{pool="{name}"}} {snap["in_use"]}' for name, snap in snapshots]
+        for metric, key, kind in (("waiting", "waiting", "gauge"), ("granted_total", "granted", "counter"),
+                                  ("wait_seconds_sum", "wait_seconds", "counter")):
+            lines.append(f"# TYPE {prefix}_{metric} {kind}")
+            for name, snap in snapshots:
+                for priority, value in sorted(snap[key].items()):
+                    lines.append(f'{prefix}_{metric}{{pool="{name}",priority="{priority}"}} {value}')
+        return lines
+
+
+def build_society():
+    """创建元治理智能体并注册全部工会、TaskIncubator 与 Orchestrator（进程内共享）"""
+    from agents.meta_agent import MetaAgent
+    from agents.orchestrator import Orchestrator
+    from agents.task_incubator import TaskIncubator
+    meta = MetaAgent(auto_register_all=True)
+    meta.register("TaskIncubator", TaskIncubator(meta))
+    meta.register("Orchestrator", Orchestrator(meta))
+    return meta
+
+
+__all__ = ["Job", "JobManager", "QueueFullError", "FINISHED_STATES", "build_society"]
@@ -5,6 +5,8 @@ import json
 import os
 import pkgutil
 from agents.tool_agent import ToolCollective
+from agents.utils.artifact_store import ArtifactHandle, get_artifact_store
+from agents.utils.run_context import current_run_context
 
 @register_agent
 class MetaAgent:
@@ -13,10 +15,29 @@ class MetaAgent:
     def __init__(self, auto_register_all=False):
         self.registry = {}  # 所有智能体/工会/工具的注册表
         self.tool_collective = ToolCollective()  # 全局唯一工具智能体
-        self.context = {}   # 全局上下文
+        self._default_context = {}  # 不在任何运行中时使用的上下文
         if auto_register_all:
             self.auto_register_all()
 
+    @property
+    def context(self):
+        """
+        当前运行的上下文（见 run_context.RunContext），并发的多次运行互不干扰；
+        不在 Orchestrator.dispatch 运行中时返回进程级的默认上下文。
+        上游任务结果以产物引用保存，用 get_context_value 按需读取。
+        """
+        current = current_run_context()
+        return current if current is not None else self._default_context
+
+    def get_context_value(self, key, path=None, offset=0, limit=None):
+        """
+        读取上下文中的值；产物引用（如上游任务结果）从产物库按 path/offset/limit 只取所需片段。
+        """
+        value = self.context.get(key)
+        if isinstance(value, ArtifactHandle):
+            return get_artifact_store().slice(value, path, offset, limit)
+        return value
+
     def get_tool_collective(self):
         return self.tool_collective
 
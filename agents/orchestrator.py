@@ -1,9 +1,19 @@
 from agents.utils.register import register_agent
 from agents.base_agent import BaseAgent
+from agents.utils import telemetry
+from agents.utils.prompt_registry import get_prompt_registry
+from agents.utils.artifact_store import ArtifactHandle, get_artifact_store
+from agents.utils.context_compactor import get_context_compactor
+from agents.utils import run_context as run_events
+from agents.utils.run_context import run_context
+from config.settings import get_settings
+from tools import deadline, scheduler
+import datetime
 import importlib
 import re
+import secrets
 import sys
-import os
+import threading
 import json
 
 # 彩色日志打印函数
@@ -34,6 +44,9 @@ class Orchestrator(BaseAgent):
     def __init__(self, meta_agent):
         super().__init__(name="Orchestrator")
         self.meta_agent = meta_agent
+        self.last_run_trace = None  # 最近一次 dispatch 的遥测数据，见 telemetry.RunTrace
+        self.last_run_id = None  # 最近一次 dispatch 的运行ID，可用于 resume
+        self._guild_lock = threading.Lock()
 
     def _get_agent_description(self):
         return "自治调度智能体，负责任务分发、工会调度、结果聚合等。"
@@ -44,11 +57,113 @@ class Orchestrator(BaseAgent):
     def _camel_to_snake(self, name):
         return re.sub(r'(?<!^)(?=[A-Z])', '_', name).lower()
 
-    def dispatch(self, task_blueprint):
+    def dispatch(self, task_blueprint, run_id=None, completed=None, timeout=None, on_event=None):
+        """
+        执行任务蓝图。启用检查点时每个任务的状态与结果异步写入检查点库，
+        中断后可用 resume(run_id) 续跑；completed 为 {任务序号: 已保存的结果}，这些任务直接复用结果。
+        timeout 为整次运行的时限（默认 RUN_TIMEOUT_SECONDS），与单任务时限一起经截止时间上下文传递给各级调用。
+        on_event 接收任务开始/完成/失败/跳过等运行事件（见 run_context.RunContext.emit）。
+        返回的各任务 result 为产物引用（ArtifactHandle），完整内容用 get_artifact_store().get/slice 读取；
+        产物登记在 run_id 名下，不再需要时可调用 get_artifact_store().release(run_id) 释放，
+        否则超过 ARTIFACT_RETAINED_RUNS 个运行后自动释放。
+        蓝图或任务中的 tenant / priority 字段决定LLM/MCP共享槽位的调度流，未指定时沿用调用方的调度作用域。
+        """
+        run_id = run_id or secrets.token_hex(16)
+        self.last_run_id = run_id
+        checkpoints = self._get_checkpoint_store()
+        if checkpoints:
+            checkpoints.save_run(run_id, {k: v for k, v in task_blueprint.items() if k != "tasks"})
+        # 每次运行使用独立的上下文，并发运行之间不会互相覆盖任务结果
+        with telemetry.start_run("orchestrator.dispatch", run_id=run_id) as run, run_context(run_id, on_event), \
+                deadline.deadline(timeout or get_settings().run_timeout_seconds, name="本次运行"), \
+                scheduler.scheduling(**self._task_scheduling(task_blueprint)):
+            try:
+                results = self._dispatch_tasks(task_blueprint, run_id, completed or {})
+            except BaseException:
+                if checkpoints:
+                    checkpoints.save_run(run_id, status="failed")
+                raise
+        if checkpoints:
+            checkpoints.save_run(run_id, status=self._run_status(results))
+        self.last_run_trace = run
+        total = run.summary()["total"]
+        print_color(
+            f"[Orchestrator] 本次运行 {run_id} 共 {total['calls']} 次LLM/工具调用，"
+            f"prompt tokens {total['prompt_tokens']}，completion tokens {total['completion_tokens']}", 'yellow'
+        )
+        return results
+
+    @staticmethod
+    def _run_status(results):
+        """按任务结果确定运行状态：全部成功为 completed，部分失败为 partial，全部失败为 failed"""
+        failed = sum(1 for r in results if "error" in r)
+        if not failed:
+            return "completed"
+        return "failed" if failed == len(results) else "partial"
+
+    def resume(self, run_id):
+        """从检查点恢复中断的运行：已完成的任务复用保存的结果，其余任务（含尚未开始的）重新执行"""
+        checkpoints = self._get_checkpoint_store()
+        saved = checkpoints.load_run(run_id) if checkpoints else None
+        if saved is None:
+            raise ValueError(f"未找到运行 {run_id} 的检查点")
+        tasks = [t["task"] for t in saved["tasks"]]
+        completed = {t["task_idx"]: t["result"] for t in saved["tasks"] if t["status"] == "completed"}
+        print_color(f"[Orchestrator] 恢复运行 {run_id}：已完成 {len(completed)}/{len(tasks)} 个任务", 'yellow')
+        return self.dispatch({**saved["blueprint"], "tasks": tasks}, run_id=run_id, completed=completed)
+
+    def _get_checkpoint_store(self):
+        if not get_settings().checkpoint_enabled:
+            return None
+        try:
+            from database.checkpoint_store import get_checkpoint_store
+            return get_checkpoint_store()
+        except Exception as e:
+            print_color(f"[Orchestrator] 检查点存储不可用，本次运行不保存检查点: {e}", 'red')
+            return None
+
+    def _dispatch_tasks(self, task_blueprint, run_id, completed):
+        checkpoints = self._get_checkpoint_store()
         results = []
-        self.meta_agent.context.clear()
-        for idx, task in enumerate(task_blueprint["tasks"]):
-            print_color(f"[Orchestrator] 开始执行任务 {idx+1}/{len(task_blueprint['tasks'])}: {task.get('intent', str(task))}", 'green')
+        tasks = task_blueprint["tasks"]
+        # tasks 可以是流式孵化出的迭代器，此时总数未知
+        total = len(tasks) if hasattr(tasks, '__len__') else '?'
+        run_scope = deadline.current_deadline()
+        failed = set()  # 失败或被跳过的任务序号，依赖它们的任务将被跳过
+        if checkpoints and hasattr(tasks, '__len__'):
+            # 预先记录全部待执行任务，运行在任意任务处中断后 resume 都能还原完整的任务列表
+            for idx, task in enumerate(tasks):
+                if idx not in completed:
+                    checkpoints.save_task(run_id, idx, task=task, status="pending")
+        for idx, task in enumerate(tasks):
+            if idx in completed:
+                # 检查点中已完成的任务：结果重新发布到产物库，不再调用LLM和工具
+                result = completed[idx]
+                handle = get_artifact_store().put(result, label="checkpoint", owner=run_id)
+                self.meta_agent.context[f"task_{idx}_result"] = handle
+                results.append({"task": task, "result": handle})
+                print_color(f"[Orchestrator] 跳过已完成任务 {idx+1}/{total}（复用检查点结果）", 'blue')
+                run_events.emit("task_completed", task_idx=idx, task=task, from_checkpoint=True)
+                continue
+            # 任务边界的抢占点：有更高优先级的请求在等待共享槽位时，先让出再开始本任务
+            with scheduler.scheduling(**self._task_scheduling(task)) as flow:
+                waited = scheduler.yield_point()
+            if waited >= 0.1:
+                print_color(f"[Orchestrator] 任务 {idx+1}/{total} 为更高优先级请求让出 {waited:.1f}s（{flow.priority}）", 'yellow')
+                run_events.emit("task_preempted", task_idx=idx, task=task, waited_seconds=round(waited, 3))
+            started_at = datetime.datetime.utcnow()
+            if checkpoints:
+                checkpoints.save_task(run_id, idx, task=task, status="running", started_at=started_at)
+            skip_reason = self._skip_reason(task, failed, run_scope)
+            if skip_reason:
+                print_color(f"[Orchestrator] 跳过任务 {idx+1}/{total}: {skip_reason}", 'red')
+                run_events.emit("task_skipped", task_idx=idx, task=task, error=skip_reason)
+                results.append({"task": task, "error": skip_reason, "skipped": True})
+                self._checkpoint_task(checkpoints, run_id, idx, started_at, error=skip_reason)
+                failed.add(idx)
+                continue
+            print_color(f"[Orchestrator] 开始执行任务 {idx+1}/{total}: {task.get('intent', str(task)) if isinstance(task, dict) else task}", 'green')
+            run_events.emit("task_started", task_idx=idx, task=task)
             intent = task["intent"] if isinstance(task, dict) and "intent" in task else None
             if intent:
                 if '_' in intent:
@@ -64,29 +179,102 @@ class Orchestrator(BaseAgent):
             guild = self.meta_agent.registry.get(guild_name)
             if not guild:
                 try:
-                    module = importlib.import_module(f"agents.guilds.{file_name}")
-                    guild_class = getattr(module, class_name)
-                    guild = guild_class(self.meta_agent)
-                    self.meta_agent.register(guild_name, guild)
+                    # 并发运行可能同时需要同一个尚未注册的工会，加锁保证只创建一次
+                    with self._guild_lock:
+                        guild = self.meta_agent.registry.get(guild_name)
+                        if not guild:
+                            module = importlib.import_module(f"agents.guilds.{file_name}")
+                            guild_class = getattr(module, class_name)
+                            guild = guild_class(self.meta_agent)
+                            self.meta_agent.register(guild_name, guild)
                 except Exception as e:
                     print_color(f"[Orchestrator] 任务 {idx+1} 工会创建失败: {e}", 'red')
+                    run_events.emit("task_failed", task_idx=idx, task=task, error=f"无法自动创建工会 {guild_name}: {e}")
                     results.append({"task": task, "error": f"无法自动创建工会 {guild_name}: {e}"})
+                    self._checkpoint_task(checkpoints, run_id, idx, started_at, error=f"无法自动创建工会 {guild_name}: {e}")
+                    self._mark_failed(task, idx, failed, run_scope)
                     continue
             try:
                 # 传递 context 给 handle_task
-                result = guild.handle_task(task)
-                self.meta_agent.context[f"task_{idx}_result"] = result
-                results.append({"task": task, "result": result})
-                print_color(f"[Orchestrator] 结束任务 {idx+1}: {task.get('intent', str(task))}", 'blue')
+                task_timeout = task.get("timeout_seconds") if isinstance(task, dict) else None
+                with telemetry.scope(agent=guild_name, task_idx=idx), telemetry.span("task", intent=guild_name), \
+                        deadline.deadline(task_timeout or get_settings().task_timeout_seconds, name=f"任务 {idx+1}"), \
+                        scheduler.scheduling(**self._task_scheduling(task)):
+                    result = guild.handle_task(task)
+                    # 工会逐个工具调用时会把异常记为单个工具的失败并继续；任务已超时或被取消时
+                    # 后续调用在入口即抛出，这里统一按任务失败处理，不把部分结果当作完成
+                    deadline.check()
+                # 上下文只保存产物引用，完整结果按需从产物库读取
+                handle = get_artifact_store().put(result, label=guild_name, owner=run_id)
+                self.meta_agent.context[f"task_{idx}_result"] = handle
+                results.append({"task": task, "result": handle})
+                self._checkpoint_task(checkpoints, run_id, idx, started_at, result=result, artifact_id=handle.artifact_id)
+                print_color(f"[Orchestrator] 结束任务 {idx+1}: {task.get('intent', str(task)) if isinstance(task, dict) else task}", 'blue')
+                run_events.emit("task_completed", task_idx=idx, task=task, artifact=handle.to_dict())
             except Exception as e:
-                print_color(f"[Orchestrator] 任务 {idx+1} 执行异常: {e}", 'red')
+                kind = "超时" if isinstance(e, deadline.DeadlineExceeded) else "执行异常"
+                print_color(f"[Orchestrator] 任务 {idx+1} {kind}: {e}", 'red')
+                run_events.emit("task_failed", task_idx=idx, task=task, error=str(e))
                 results.append({"task": task, "error": str(e)})
+                self._checkpoint_task(checkpoints, run_id, idx, started_at, error=str(e))
+                self._mark_failed(task, idx, failed, run_scope)
         return results
 
+    @staticmethod
+    def _dependencies(task):
+        depends_on = task.get("depends_on") if isinstance(task, dict) else None
+        if depends_on is None:
+            return []
+        return depends_on if isinstance(depends_on, list) else [depends_on]
+
+    @staticmethod
+    def _task_scheduling(task):
+        """蓝图或任务中的调度参数（tenant / priority），用于 scheduler.scheduling"""
+        if not isinstance(task, dict):
+            return {}
+        return {"tenant": task.get("tenant"), "priority": task.get("priority")}
+
+    def _skip_reason(self, task, failed, run_scope):
+        """运行已取消/超时或所依赖的任务失败时返回跳过原因"""
+        if run_scope is not None:
+            if run_scope.cancelled:
+                return f"运行已取消: {run_scope.cancel_reason}"
+            if run_scope.expired:
+                return "运行已超过截止时间"
+        failed_deps = [dep for dep in self._dependencies(task) if dep in failed]
+        if failed_deps:
+            return f"依赖的任务 {', '.join(str(dep + 1) for dep in failed_deps)} 失败"
+        return None
+
+    def _mark_failed(self, task, idx, failed, run_scope):
+        """记录失败任务；标记为 required 的任务失败时取消整次运行，其余任务协作式退出"""
+        failed.add(idx)
+        if run_scope is not None and isinstance(task, dict) and task.get("required"):
+            run_scope.cancel(f"必需任务 {idx+1} 失败")
+
+    def _checkpoint_task(self, checkpoints, run_id, idx, started_at, result=None, artifact_id=None, error=None):
+        if not checkpoints:
+            return
+        finished_at = datetime.datetime.utcnow()
+        checkpoints.save_task(
+            run_id, idx,
+            status="failed" if error else "completed",
+            result=safe_to_dict(result), artifact_id=artifact_id, error=error,
+            finished_at=finished_at, duration_seconds=(finished_at - started_at).total_seconds()
+        )
+
     def _load_prompt(self, prompt_name):
-        prompt_path = os.path.join(os.path.dirname(__file__), 'prompt', 'orchestrator', prompt_name)
-        with open(prompt_path, 'r', encoding='utf-8') as f:
-            return f.read()
+        """从全局提示词注册表获取预编译模板（不再逐次读盘）"""
+        return get_prompt_registry().get(f'orchestrator/{prompt_name}')
+
+    def _summarize_results(self, items):
+        """上下文压缩的LLM摘要兜底：[(文本, token上限)] 批量并发摘要"""
+        template = self._load_prompt('summarize.txt')
+        prompts = [template.render(content=text, max_tokens=budget) for text, budget in items]
+        with telemetry.scope(agent=self.name):
+            if hasattr(self.llm, 'batch_call'):
+                return self.llm.batch_call(prompts, max_tokens=max(budget for _, budget in items))
+            return [self.llm(prompt) for prompt in prompts]
 
     def handle_task(self, params):
         """
@@ -101,29 +289,58 @@ class Orchestrator(BaseAgent):
         # 优先用 LLM 直接生成任务链
         prompt_template = self._load_prompt('orchestrator.txt')
         abilities = self.meta_agent.discover_capabilities()
-        # 1. 收集所有上游结果
+        # 1. 收集所有上游结果（产物引用取回完整内容，再统一压缩）
+        store = get_artifact_store()
         upstream_results = []
-        for k, v in self.meta_agent.context.items():
+        for k, v in context.items():
             if k.startswith("task_") and k.endswith("_result"):
+                if isinstance(v, ArtifactHandle):
+                    try:
+                        v = store.get(v)
+                    except KeyError:
+                        v = v.to_dict()
                 upstream_results.append(safe_to_dict(v))
 
-        # 2. 构造结构化 user_input
+        # 2. 构造结构化 user_input，各段落分别压缩到token预算内
+        settings = get_settings()
+        compactor = get_context_compactor(self._summarize_results)
         user_input = {
-            "user_params": safe_to_dict(params.get("params")),
-            "upstream_results": upstream_results
+            "user_params": compactor.compact(safe_to_dict(params.get("params")), settings.context_params_token_budget),
+            "upstream_results": compactor.compact_many(upstream_results, settings.context_upstream_token_budget)
         }
 
-        # 3. 生成 prompt
-        prompt = prompt_template.format(
+        # 3. 生成 prompt：静态前缀作为 system 消息，动态部分作为 user 消息
+        static_prefix, prompt = prompt_template.render_split(
+            ('user_input',),
             user_input=json.dumps(user_input, ensure_ascii=False, indent=2),
             abilities=json.dumps(abilities, ensure_ascii=False, indent=2)
         )
-        result = self.llm_structured(prompt)
+        result = self.llm_structured(prompt, system_prompt=static_prefix)
 
         # 4. 处理 LLM 结果
         if result and 'tasks' in result:
             params["tasks"] = result["tasks"]
-            return self.dispatch(params)
+            blueprint = params
         else:
-            new_blueprint = incubator.incubate(user_input, self.meta_agent)
-            return self.dispatch(new_blueprint) 
\ No newline at end of file
+            blueprint = incubator.incubate(user_input, self.meta_agent)
+        # 子运行的结果作为本任务的结果整体存入外层运行的产物，随后释放子运行登记的产物
+        run_id = secrets.token_hex(16)
+        try:
+            return self.materialize(self.dispatch(blueprint, run_id=run_id))
+        finally:
+            store.release(run_id)
+
+    @staticmethod
+    def materialize(results):
+        """把 dispatch 返回结果中的产物引用替换为完整内容（已释放的产物保留引用信息）"""
+        store = get_artifact_store()
+        materialized = []
+        for item in results:
+            handle = item.get("result")
+            if isinstance(handle, ArtifactHandle):
+                try:
+                    item = {**item, "result": store.get(handle)}
+                except KeyError:
+                    item = {**item, "result": handle.to_dict()}
+            materialized.append(item)
+        return materialized 
\ No newline at end of file
@@ -1,6 +1,6 @@
 from agents.utils.register import register_agent
 from agents.base_agent import BaseAgent
-import os
+from agents.utils.prompt_registry import get_prompt_registry
 
 @register_agent
 class TaskIncubator(BaseAgent):
@@ -11,21 +11,40 @@ class TaskIncubator(BaseAgent):
         return "任务孵化智能体，负责将用户输入转化为结构化任务蓝图。"
 
     def _load_prompt(self, prompt_name):
-        prompt_path = os.path.join(os.path.dirname(__file__), 'prompt', 'task_incubator', f'{prompt_name}.txt')
-        with open(prompt_path, 'r', encoding='utf-8') as f:
-            return f.read()
+        """从全局提示词注册表获取预编译模板（不再逐次读盘）"""
+        return get_prompt_registry().get(f'task_incubator/{prompt_name}')
 
     def incubate(self, user_input, meta_agent=None):
         # 获取所有能力描述
         abilities = meta_agent.discover_capabilities() if meta_agent else {}
         prompt_template = self._load_prompt('task_incubate')
-        prompt = prompt_template.format(user_input=user_input, abilities=abilities)
-        result = self.llm_structured(prompt)
+        static_prefix, prompt = prompt_template.render_split(('user_input',), user_input=user_input, abilities=abilities)
+        result = self.llm_structured(prompt, system_prompt=static_prefix)
         if not result or 'tasks' not in result:
             # 回退到简单模式
             return {"tasks": [user_input]}
         return result
 
+    def incubate_stream(self, user_input, meta_agent=None):
+        """
+        流式孵化任务蓝图，返回 {"tasks": 任务迭代器}。
+        蓝图中的任务一经LLM完整输出即可被 Orchestrator.dispatch 取出执行，无需等待整份蓝图生成完毕。
+        """
+        abilities = meta_agent.discover_capabilities() if meta_agent else {}
+        prompt_template = self._load_prompt('task_incubate')
+        static_prefix, prompt = prompt_template.render_split(('user_input',), user_input=user_input, abilities=abilities)
+
+        def iter_tasks():
+            produced = False
+            for task in self.llm_structured_stream(prompt, list_key='tasks', system_prompt=static_prefix):
+                produced = True
+                yield task
+            if not produced:
+                # 回退到简单模式
+                yield user_input
+
+        return {"tasks": iter_tasks()}
+
     def handle_task(self, params):
         """
         任务孵化器不直接处理业务任务，仅做兜底，防止抽象类报错。
@@ -1,27 +1,79 @@
 from agents.base_agent import BaseAgent
-from tools.mcp_tools import call_mcp_tool, list_mcp_tools
+from agents.utils import telemetry
+from agents.utils.prompt_registry import get_prompt_registry
+from agents.utils.tool_router import ToolRouter
+from agents.utils.tool_schema_compactor import ToolSchemaCompactor
+from config.settings import get_settings
+from tools.deadline import TaskCancelled
+from tools.mcp_tools import call_mcp_tool, format_tool_schema
+from tools.tool_catalog import get_tool_catalog
 import json
-import os
 
 class ToolCollective(BaseAgent):
     def __init__(self, name="ToolCollective"):
         super().__init__(name=name)
-        self._tool_schemas_cache = None
+        self._tool_catalog = get_tool_catalog()
+        self._schema_compactor = ToolSchemaCompactor()
+        self._tool_router = ToolRouter()
+        # 目录版本变化时在刷新线程中重建路由索引，请求路径上无需等待
+        self._tool_catalog.subscribe(lambda schemas, version: self._tool_router.build(schemas, version))
 
     def _get_agent_description(self):
         return "工具自治体，负责所有外部工具的注册、参数补全、调用和结果校验。"
 
     def get_all_tool_schemas(self, force_reload=False):
-        if self._tool_schemas_cache is not None and not force_reload:
-            return self._tool_schemas_cache
+        return self._get_catalog(force_reload)[0]
+
+    def _get_catalog(self, force_reload=False):
+        """返回 (工具schema列表, 目录版本)；目录过期时由后台线程刷新，不阻塞当前请求"""
         try:
-            schemas = list_mcp_tools()
-            self.logger.info(f"远程MCP服务加载到 {len(schemas)} 个工具")
-            self._tool_schemas_cache = schemas
-            return schemas
+            if force_reload:
+                self._tool_catalog.refresh()
+            schemas, version = self._tool_catalog.get()
+            # 版本未变化时为空操作
+            self._tool_router.build(schemas, version)
+            return schemas, version
         except Exception as e:
             self.logger.error(f"远程MCP工具加载失败: {e}")
-            return []
+            return [], None
+
+    def _select_tool(self, task, user_query, tool_schemas):
+        """
+        不经LLM直接确定工具：任务已指定且存在的工具优先，其次是路由索引中置信度足够高的工具。
+        无法确定时返回 None。
+        """
+        names = {t.get("name") for t in tool_schemas}
+        if isinstance(task, dict) and task.get("tool") in names:
+            return task["tool"]
+        # 路由索引可能已按更新的目录重建，或目录拉取失败时仍是旧索引，只接受本次目录中存在的工具
+        routed = self._tool_router.route(user_query)
+        return routed if routed in names else None
+
+    def _fill_tool_params(self, tool, user_query):
+        """只为已选定的工具补全参数；工具无入参时无需调用LLM"""
+        if not (tool.get("inputSchema") or {}).get("properties"):
+            return {}
+        prompt_template = self._load_prompt('tool_params')
+        static_prefix, prompt = prompt_template.render_split(
+            ('user_query',),
+            tool_schema=format_tool_schema(tool),
+            user_query=user_query
+        )
+        result = self.llm_structured(prompt, system_prompt=static_prefix)
+        if not isinstance(result, dict):
+            return None
+        return result.get("params", result)
+
+    def _call_tool(self, tool_name, params):
+        print(f"tool_name: {tool_name}, params: {params}")
+        try:
+            with telemetry.span("mcp.call_tool", agent=self.name, tool=tool_name):
+                result = call_mcp_tool(tool_name, params)
+            return result
+        except TaskCancelled:
+            raise
+        except Exception as e:
+            return f"MCP工具调用失败: {e}"
 
     def handle_tool_request(self, task):
         """
@@ -30,28 +82,40 @@ class ToolCollective(BaseAgent):
         # 1. 判断是否需要工具
         if self._need_tool(task):
             # 2. 获取所有MCP工具schema
-            tool_schemas = self.get_all_tool_schemas()
-            # 3. 加载并格式化tool_select提示词模板
+            tool_schemas, catalog_version = self._get_catalog()
+            user_query = json.dumps(task, ensure_ascii=False, indent=2) if isinstance(task, dict) else str(task)
+            # 3. 能直接确定工具时（任务指定或路由高置信度），LLM只负责补全该工具的参数
+            tool_name = self._select_tool(task, user_query, tool_schemas)
+            tool = next((t for t in tool_schemas if t.get("name") == tool_name), None) if tool_name else None
+            if tool is not None:
+                params = self._fill_tool_params(tool, user_query)
+                if params is None:
+                    return f"LLM参数解析失败: 未能补全工具 {tool_name} 的参数"
+                return self._call_tool(tool_name, params)
+            # 4. 加载并格式化tool_select提示词模板：工具目录只取决于目录版本，放在静态前缀中；
+            #    目录超出token预算时只列出名称与简介，与本次请求最相关的工具（路由候选优先）的完整签名放在动态部分
+            shortlist = [name for name, _ in self._tool_router.shortlist(user_query, top_k=get_settings().tool_router_shortlist_k)]
+            tool_catalog_text, candidates_text = self._schema_compactor.render_split(
+                tool_schemas,
+                query=user_query,
+                pinned=shortlist,
+                version=catalog_version
+            )
             prompt_template = self._load_prompt('tool_select')
-            prompt = prompt_template.format(
-                tool_schemas=json.dumps(tool_schemas, ensure_ascii=False, indent=2),
-                user_query=json.dumps(task, ensure_ascii=False, indent=2) if isinstance(task, dict) else str(task)
+            static_prefix, prompt = prompt_template.render_split(
+                ('tool_candidates', 'user_query'),
+                tool_schemas=tool_catalog_text,
+                tool_candidates=f"与本次任务最相关的工具（完整参数）：\n{candidates_text}\n\n" if candidates_text else "",
+                user_query=user_query
             )
-            # 4. 用llm_structured统一结构化解析LLM输出
-            tool_call = self.llm_structured(prompt)
+            # 5. 用llm_structured统一结构化解析LLM输出（静态前缀作为 system 消息以命中前缀缓存）
+            tool_call = self.llm_structured(prompt, system_prompt=static_prefix)
             if not tool_call or "tool_name" not in tool_call or "params" not in tool_call:
                 return f"LLM参数解析失败: {tool_call}\n原始LLM输出: {tool_call}"
-            tool_name = tool_call["tool_name"]
-            params = tool_call.get("params", {})
-            print(f"tool_name: {tool_name}, params: {params}")
-            # 5. 调用MCP工具
-            try:
-                result = call_mcp_tool(tool_name, params)
-                return result
-            except Exception as e:
-                return f"MCP工具调用失败: {e}"
+            # 6. 调用MCP工具
+            return self._call_tool(tool_call["tool_name"], tool_call.get("params", {}))
         else:
-            # 6. 不需要工具，直接用 LLM 回复
+            # 7. 不需要工具，直接用 LLM 回复
             return self._llm_reply(task)
 
     def handle_task(self, params):
@@ -77,6 +141,5 @@ class ToolCollective(BaseAgent):
         return self.llm_structured(prompt)
 
     def _load_prompt(self, prompt_name):
-        prompt_path = os.path.join(os.path.dirname(__file__), 'prompt', 'tool_agent', f'{prompt_name}.txt')
-        with open(prompt_path, 'r', encoding='utf-8') as f:
-            return f.read()
\ No newline at end of file
+        """从全局提示词注册表获取预编译模板（不再逐次读盘）"""
+        return get_prompt_registry().get(f'tool_agent/{prompt_name}')
\ No newline at end of file
@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+"""
+任务产物存储模块 - 任务结果按内容哈希存入产物库（内存LRU，超出预算溢写到磁盘），
+任务间只传递带摘要和预览的轻量引用（ArtifactHandle），下游按需读取所需片段，
+使提示词长度和进程内存不随任务蓝图增长而无限膨胀
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from config.settings import get_settings
+
+
+def _to_plain(obj: Any) -> Any:
+    """把任务结果转换为可JSON序列化的结构（与 Orchestrator.safe_to_dict 规则一致）"""
+    if isinstance(obj, (list, tuple)):
+        return [_to_plain(i) for i in obj]
+    if isinstance(obj, dict):
+        return {str(k): _to_plain(v) for k, v in obj.items()}
+    if hasattr(obj, 'to_dict') and callable(getattr(obj, 'to_dict')):
+        return _to_plain(obj.to_dict())
+    if hasattr(obj, '__dict__'):
+        return {k: _to_plain(v) for k, v in obj.__dict__.items() if not k.startswith('_')}
+    return obj
+
+
+def _describe(value: Any) -> Dict[str, Any]:
+    """结构概要：类型、长度与顶层键，供LLM判断是否需要读取详细内容"""
+    if isinstance(value, dict):
+        return {"type": "object", "keys": list(value.keys())[:20], "length": len(value)}
+    if isinstance(value, list):
+        return {"type": "array", "length": len(value)}
+    if isinstance(value, str):
+        return {"type": "string", "length": len(value)}
+    return {"type": type(value).__name__}
+
+
+@dataclass
+class ArtifactHandle:
+    """产物引用：artifact_id 为内容哈希，summary 为结构概要，preview 为截断后的内容预览"""
+    artifact_id: str
+    size_bytes: int
+    summary: Dict[str, Any] = field(default_factory=dict)
+    preview: str = ""
+    label: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "artifact_id": self.artifact_id,
+            "label": self.label,
+            "size_bytes": self.size_bytes,
+            "summary": self.summary,
+            "preview": self.preview,
+            "truncated": len(self.preview) < self.summary.get("chars", 0),
+        }
+
+
+class ArtifactStore:
+    """
+    内容寻址的产物库。
+
+    put 序列化结果并按 sha256 去重，返回 ArtifactHandle；内存中按字节预算维护LRU，
+    超出预算的最久未用产物写入 spill_dir，再次读取时从磁盘加载。
+    get 返回完整产物，slice 按路径和范围只取一部分。
+
+    put 可指定 owner（通常为 run_id）登记产物归属，release(owner) 释放该运行独占的产物
+    （引用、内存与溢写文件一并删除）；登记的运行超过 max_owners 个时自动释放最早的运行。
+    未指定 owner 的产物不会被释放。
+    """
+
+    def __init__(self, max_memory_bytes: Optional[int] = None, spill_dir: Optional[str] = None, preview_chars: Optional[int] = None,
+                 max_owners: Optional[int] = None):
+        settings = get_settings()
+        self.max_memory_bytes = settings.artifact_memory_bytes if max_memory_bytes is None else max_memory_bytes
+        self.spill_dir = spill_dir or settings.artifact_spill_dir or os.path.join(tempfile.gettempdir(), "seven_agents_artifacts")
+        self.preview_chars = settings.artifact_preview_chars if preview_chars is None else preview_chars
+        self.max_owners = settings.artifact_retained_runs if max_owners is None else max_owners
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, Tuple[int, Any]]" = OrderedDict()
+        self._memory_bytes = 0
+        self._handles: Dict[str, ArtifactHandle] = {}
+        # 归属登记：owner -> 产物ID集合（按登记先后排序），产物ID -> 引用它的 owner 数；_pinned 为无 owner 的产物
+        self._owners: "OrderedDict[str, Set[str]]" = OrderedDict()
+        self._refs: Dict[str, int] = {}
+        self._pinned: Set[str] = set()
+
+    def put(self, value: Any, label: Optional[str] = None, owner: Optional[str] = None) -> ArtifactHandle:
+        """保存产物并返回引用；内容相同的产物只存一份，owner 为空时产物常驻"""
+        plain = _to_plain(value)
+        text = json.dumps(plain, ensure_ascii=False, sort_keys=True, default=str)
+        data = text.encode('utf-8')
+        artifact_id = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            handle = self._handles.get(artifact_id)
+            if handle is None:
+                summary = {**_describe(plain), "chars": len(text)}
+                handle = ArtifactHandle(artifact_id, len(data), summary, text[:self.preview_chars], label)
+                self._handles[artifact_id] = handle
+                self._remember(artifact_id, len(data), plain)
+            elif artifact_id in self._memory:
+                self._memory.move_to_end(artifact_id)
+            else:
+                # 溢写文件可能已被其他运行释放，重新放回内存
+                self._remember(artifact_id, len(data), plain)
+            dropped = self._retain(artifact_id, owner)
+        self._delete_spilled(dropped)
+        if label and label != handle.label:
+            return ArtifactHandle(artifact_id, handle.size_bytes, handle.summary, handle.preview, label)
+        return handle
+
+    def _retain(self, artifact_id: str, owner: Optional[str]) -> List[str]:
+        """登记产物归属，超出 max_owners 时释放最早的运行；返回需删除溢写文件的产物ID（调用方持有锁）"""
+        if owner is None:
+            self._pinned.add(artifact_id)
+            return []
+        ids = self._owners.get(owner)
+        if ids is None:
+            ids = self._owners[owner] = set()
+        if artifact_id not in ids:
+            ids.add(artifact_id)
+            self._refs[artifact_id] = self._refs.get(artifact_id, 0) + 1
+        dropped = []
+        while self.max_owners and len(self._owners) > self.max_owners:
+            oldest = next(iter(self._owners))
+            if oldest == owner:
+                break
+            dropped += self._release_locked(oldest)
+        return dropped
+
+    def _release_locked(self, owner: str) -> List[str]:
+        dropped = []
+        for artifact_id in self._owners.pop(owner, ()):
+            self._refs[artifact_id] -= 1
+            if self._refs[artifact_id] > 0:
+                continue
+            del self._refs[artifact_id]
+            if artifact_id in self._pinned:
+                continue
+            self._handles.pop(artifact_id, None)
+            entry = self._memory.pop(artifact_id, None)
+            if entry is not None:
+                self._memory_bytes -= entry[0]
+            dropped.append(artifact_id)
+        return dropped
+
+    def _delete_spilled(self, artifact_ids: List[str]):
+        for artifact_id in artifact_ids:
+            try:
+                os.remove(self._path(artifact_id))
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                print(f"[产物库] 删除溢写产物 {artifact_id[:12]} 失败: {e}")
+
+    def release(self, owner: Optional[str]):
+        """释放 owner 登记的产物；仍被其他运行或无 owner 写入引用的产物保留"""
+        if owner is None:
+            return
+        with self._lock:
+            dropped = self._release_locked(owner)
+        self._delete_spilled(dropped)
+
+    def owns(self, owner: str, handle_or_id) -> bool:
+        """产物是否登记在 owner 名下"""
+        artifact_id = getattr(handle_or_id, "artifact_id", handle_or_id)
+        with self._lock:
+            return artifact_id in self._owners.get(owner, ())
+
+    def _remember(self, artifact_id: str, size: int, value: Any):
+        """放入内存LRU，超出预算时把最久未用的产物溢写到磁盘（调用方持有锁）"""
+        if artifact_id in self._memory:
+            self._memory.move_to_end(artifact_id)
+            return
+        self._memory[artifact_id] = (size, value)
+        self._memory_bytes += size
+        while self._memory_bytes > self.max_memory_bytes and len(self._memory) > 1:
+            evicted_id, (evicted_size, evicted_value) = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted_size
+            self._spill(evicted_id, evicted_value)
+
+    def _path(self, artifact_id: str) -> str:
+        return os.path.join(self.spill_dir, f"{artifact_id}.json")
+
+    def _spill(self, artifact_id: str, value: Any):
+        path = self._path(artifact_id)
+        if os.path.exists(path):
+            return
+        try:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(value, f, ensure_ascii=False, default=str)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"[产物库] 溢写产物 {artifact_id[:12]} 失败: {e}")
+
+    def get(self, handle_or_id) -> Any:
+        """读取完整产物，产物不存在时抛出 KeyError"""
+        artifact_id = getattr(handle_or_id, "artifact_id", handle_or_id)
+        with self._lock:
+            entry = self._memory.get(artifact_id)
+            if entry is not None:
+                self._memory.move_to_end(artifact_id)
+                return entry[1]
+            handle = self._handles.get(artifact_id)
+        try:
+            with open(self._path(artifact_id), 'r', encoding='utf-8') as f:
+                value = json.load(f)
+        except FileNotFoundError:
+            raise KeyError(artifact_id)
+        if handle is not None:
+            with self._lock:
+                if artifact_id in self._handles:
+                    self._remember(artifact_id, handle.size_bytes, value)
+        return value
+
+    def slice(self, handle_or_id, path: Optional[str] = None, offset: int = 0, limit: Optional[int] = None) -> Any:
+        """
+        读取产物片段：path 为以点分隔的键/下标路径（如 "items.0.title"），
+        定位到列表或字符串时再按 offset/limit 截取。
+        """
+        value = self.get(handle_or_id)
+        for part in (path.split('.') if path else []):
+            if isinstance(value, list):
+                value = value[int(part)]
+            elif isinstance(value, dict):
+                value = value[part]
+            else:
+                raise KeyError(path)
+        if isinstance(value, (list, str)) and (offset or limit is not None):
+            value = value[offset:None if limit is None else offset + limit]
+        return value
+
+    def handles(self) -> List[ArtifactHandle]:
+        with self._lock:
+            return list(self._handles.values())
+
+    def clear(self):
+        """清空内存中的产物、引用与归属登记（已溢写的文件保留，内容相同的产物可直接复用）"""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            self._handles.clear()
+            self._owners.clear()
+            self._refs.clear()
+            self._pinned.clear()
+
+    @property
+    def memory_bytes(self) -> int:
+        return self._memory_bytes
+
+
+_store: Optional[ArtifactStore] = None
+_store_lock = threading.Lock()
+
+
+def get_artifact_store() -> ArtifactStore:
+    """获取全局产物库"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ArtifactStore()
+    return _store
+
+
+__all__ = ["ArtifactHandle", "ArtifactStore", "get_artifact_store"]
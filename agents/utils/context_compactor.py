@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+上下文压缩模块 - 把上游结果等提示词段落压缩到各自的token预算内：
+先估算大小，超出预算时对JSON做确定性的截断与结构裁剪，仍然超出时才调用LLM摘要（摘要按内容缓存）
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+from config.settings import get_settings
+from .token_utils import estimate_tokens
+
+# 逐级加强的裁剪参数：(字符串最大字符数, 列表最多保留项数, 最大嵌套深度)
+PRUNE_LEVELS = (
+    (2000, 50, 8),
+    (500, 10, 5),
+    (200, 5, 4),
+    (80, 3, 3),
+    (40, 1, 2),
+)
+
+# 批量摘要函数：输入 [(文本, token上限)]，按顺序返回摘要文本
+Summarizer = Callable[[List[Tuple[str, int]]], List[str]]
+
+
+def dumps(value: Any) -> str:
+    """与提示词中一致的序列化方式"""
+    return json.dumps(value, ensure_ascii=False, indent=2, default=str)
+
+
+def estimate_value_tokens(value: Any) -> int:
+    return estimate_tokens(value if isinstance(value, str) else dumps(value))
+
+
+def prune_value(value: Any, max_string_chars: int, max_list_items: int, max_depth: int, _depth: int = 0) -> Any:
+    """确定性结构裁剪：截断长字符串、只保留列表前若干项、超出深度的子结构替换为概要说明"""
+    if isinstance(value, str):
+        if len(value) <= max_string_chars:
+            return value
+        return f"{value[:max_string_chars]}…(共{len(value)}字)"
+    if isinstance(value, dict):
+        if _depth >= max_depth:
+            return f"{{…{len(value)}个字段}}"
+        return {k: prune_value(v, max_string_chars, max_list_items, max_depth, _depth + 1) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        if _depth >= max_depth:
+            return f"[…{len(value)}项]"
+        items = [prune_value(v, max_string_chars, max_list_items, max_depth, _depth + 1) for v in value[:max_list_items]]
+        if len(value) > max_list_items:
+            items.append(f"…(共{len(value)}项，已省略{len(value) - max_list_items}项)")
+        return items
+    return value
+
+
+def hard_cap(value: Any, budget: int) -> Any:
+    """最后兜底：裁剪后仍超预算时把序列化文本截断到预算内，保证段落不超过硬上限"""
+    if estimate_value_tokens(value) <= budget:
+        return value
+    text = value if isinstance(value, str) else dumps(value)
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if estimate_tokens(text[:mid]) + 1 <= budget:
+            low = mid
+        else:
+            high = mid - 1
+    return text[:low] + "…"
+
+
+class ContextCompactor:
+    """
+    按token预算压缩提示词段落。
+
+    compact 对单个值逐级裁剪直到不超过预算；compact_many 把一个段落的预算分给多个结果，
+    小结果用不完的预算留给大结果；确定性裁剪仍超出预算的结果交给 summarizer 批量摘要，
+    摘要按（内容哈希, 预算）缓存，重复规划时不再重新调用LLM。
+    """
+
+    def __init__(self, summarizer: Optional[Summarizer] = None, cache_size: int = 256):
+        self.summarizer = summarizer
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self._summaries: "OrderedDict[str, str]" = OrderedDict()
+
+    def prune(self, value: Any, budget: int) -> Tuple[Any, bool]:
+        """逐级裁剪，返回 (结果, 是否已在预算内)"""
+        if estimate_value_tokens(value) <= budget:
+            return value, True
+        pruned = value
+        for level in PRUNE_LEVELS:
+            pruned = prune_value(value, *level)
+            if estimate_value_tokens(pruned) <= budget:
+                return pruned, True
+        return pruned, False
+
+    def compact(self, value: Any, budget: int) -> Any:
+        return self.compact_many([value], budget)[0]
+
+    def compact_many(self, values: Sequence[Any], budget: int) -> List[Any]:
+        """把 budget 分配给多个值并逐个压缩，返回与输入顺序一致的列表"""
+        results: List[Any] = [None] * len(values)
+        pending: List[Tuple[int, Any, int]] = []
+        remaining = budget
+        # 从小到大分配：每个值先按剩余预算均分，小值用不完的部分留给后面的大值
+        order = sorted(range(len(values)), key=lambda i: estimate_value_tokens(values[i]))
+        for position, idx in enumerate(order):
+            share = max(remaining // (len(order) - position), 1)
+            value, fits = self.prune(values[idx], share)
+            if not fits:
+                pending.append((idx, value, share))
+            results[idx] = value
+            remaining -= estimate_value_tokens(value) if fits else share
+        if pending:
+            # 摘要输入使用最轻一级裁剪结果，避免把超大原文整体送入LLM
+            items = [(prune_value(values[idx], *PRUNE_LEVELS[0]), share) for idx, _, share in pending]
+            for (idx, _, share), summary in zip(pending, self._summarize(items)):
+                results[idx] = hard_cap(results[idx] if summary is None else summary, share)
+        return results
+
+    def _summarize(self, items: List[Tuple[Any, int]]) -> List[Optional[str]]:
+        """对裁剪后仍超预算的值做LLM摘要，命中缓存的直接返回；无摘要器或摘要失败时返回 None（保留裁剪结果）"""
+        if self.summarizer is None:
+            return [None] * len(items)
+        texts = [(value if isinstance(value, str) else dumps(value), budget) for value, budget in items]
+        keys = [f"{hashlib.sha256(text.encode('utf-8')).hexdigest()}:{budget}" for text, budget in texts]
+        summaries: List[Optional[str]] = []
+        with self._lock:
+            for key in keys:
+                summaries.append(self._summaries.get(key))
+                if key in self._summaries:
+                    self._summaries.move_to_end(key)
+        missing = [i for i, s in enumerate(summaries) if s is None]
+        if missing:
+            try:
+                generated = self.summarizer([texts[i] for i in missing])
+            except Exception as e:
+                print(f"[上下文压缩] LLM摘要失败，保留裁剪结果: {e}")
+                return summaries
+            with self._lock:
+                for i, summary in zip(missing, generated):
+                    if not summary:
+                        continue
+                    summaries[i] = summary
+                    self._summaries[keys[i]] = summary
+                    while len(self._summaries) > self.cache_size:
+                        self._summaries.popitem(last=False)
+        return summaries
+
+
+_compactor: Optional[ContextCompactor] = None
+_compactor_lock = threading.Lock()
+
+
+def get_context_compactor(summarizer: Optional[Summarizer] = None) -> ContextCompactor:
+    """获取全局上下文压缩器（摘要缓存跨多次规划共享）；传入 summarizer 时更新摘要函数"""
+    global _compactor
+    if _compactor is None:
+        with _compactor_lock:
+            if _compactor is None:
+                _compactor = ContextCompactor(cache_size=get_settings().context_summary_cache_size)
+    if summarizer is not None:
+        _compactor.summarizer = summarizer
+    return _compactor
+
+
+__all__ = ["ContextCompactor", "get_context_compactor", "prune_value", "hard_cap", "estimate_value_tokens", "PRUNE_LEVELS"]
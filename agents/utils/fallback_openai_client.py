@@ -3,6 +3,7 @@ import asyncio
 from typing import Optional, Any, Mapping, Dict
 from openai import AsyncOpenAI, APIStatusError, APIConnectionError, APITimeoutError, APIError
 from openai.types.chat import ChatCompletion
+from . import telemetry
 
 class AsyncFallbackOpenAIClient:
     """
@@ -82,6 +83,7 @@ class AsyncFallbackOpenAIClient:
         for attempt in range(max_retries + 1):
             try:
                 # print(f"尝试使用 {api_name} API ({client.base_url}) 模型: {kwargs.get('model', model_name)}, 第 {attempt + 1} 次尝试")
+                telemetry.annotate(endpoint=str(client.base_url), api=api_name, attempts=attempt + 1)
                 completion = await client.chat.completions.create(
                     model=kwargs.pop('model', model_name),
                     messages=messages,
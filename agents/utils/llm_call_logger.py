@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+LLM调用日志模块 - 后台线程异步写入的结构化(JSONL)调用日志，支持按大小/时间轮转、压缩与采样
+"""
+
+import atexit
+import datetime
+import gzip
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import shutil
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from config.settings import get_settings
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """只负责入队，不在调用线程上做任何格式化，序列化与磁盘IO全部留给后台线程"""
+
+    def prepare(self, record):
+        return record
+
+
+class _JsonLinesFormatter(logging.Formatter):
+    """把日志记录中的dict序列化为一行JSON"""
+
+    def format(self, record):
+        return json.dumps(record.msg, ensure_ascii=False, default=str)
+
+
+class _SizeTimedRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    按大小或时间间隔（任一条件满足即可）轮转的文件处理器，轮转出的旧文件可选gzip压缩。
+    """
+
+    def __init__(self, filename: str, max_bytes: int = 0, backup_count: int = 0,
+                 interval_seconds: float = 0, compress: bool = True):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count,
+                         encoding='utf-8', delay=True)
+        self.interval_seconds = interval_seconds
+        self.rollover_at = time.time() + interval_seconds if interval_seconds > 0 else 0
+        if compress:
+            self.namer = lambda name: name + ".gz"
+            self.rotator = self._gzip_rotator
+
+    @staticmethod
+    def _gzip_rotator(source: str, dest: str):
+        with open(source, 'rb') as f_in, gzip.open(dest, 'wb') as f_out:
+            shutil.copyfileobj(f_in, f_out)
+        os.remove(source)
+
+    def shouldRollover(self, record):
+        if self.rollover_at and time.time() >= self.rollover_at:
+            return True
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        super().doRollover()
+        if self.interval_seconds > 0:
+            self.rollover_at = time.time() + self.interval_seconds
+
+
+class LLMCallLogger:
+    """
+    非阻塞的LLM调用日志sink。
+
+    调用方只把记录放入内存队列，由 QueueListener 后台线程完成JSON序列化、写盘、轮转和压缩，
+    请求路径上不产生任何磁盘IO。
+    """
+
+    def __init__(
+        self,
+        log_path: str,
+        max_bytes: int = 50 * 1024 * 1024,
+        backup_count: int = 10,
+        rotate_interval_seconds: float = 24 * 3600,
+        compress: bool = True,
+        sample_rate: float = 1.0
+    ):
+        """
+        Args:
+            log_path: 日志文件路径。
+            max_bytes: 单个日志文件的最大字节数，超出后轮转；0 表示不按大小轮转。
+            backup_count: 保留的历史日志文件个数。
+            rotate_interval_seconds: 按时间轮转的间隔（秒）；0 表示不按时间轮转。
+            compress: 是否gzip压缩轮转出的历史文件。
+            sample_rate: 成功调用的采样率（0~1），失败调用始终记录。
+        """
+        self.log_path = log_path
+        self.sample_rate = sample_rate
+        log_dir = os.path.dirname(log_path)
+        if log_dir:
+            os.makedirs(log_dir, exist_ok=True)
+
+        file_handler = _SizeTimedRotatingFileHandler(
+            log_path,
+            max_bytes=max_bytes,
+            backup_count=backup_count,
+            interval_seconds=rotate_interval_seconds,
+            compress=compress
+        )
+        file_handler.setFormatter(_JsonLinesFormatter())
+
+        self._queue: queue.Queue = queue.Queue()
+        self._listener = logging.handlers.QueueListener(self._queue, file_handler)
+        self._logger = logging.getLogger(f"llm_calls.{log_path}")
+        self._logger.setLevel(logging.INFO)
+        self._logger.propagate = False
+        self._logger.addHandler(_DeferredQueueHandler(self._queue))
+        self._listener.start()
+        atexit.register(self.stop)
+
+    def log(self, record: Dict[str, Any]):
+        """入队一条调用记录；按采样率丢弃部分成功记录"""
+        if not record.get("error") and self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return
+        record.setdefault("timestamp", datetime.datetime.now().isoformat(timespec='milliseconds'))
+        self._logger.info(record)
+
+    def stop(self):
+        """刷新队列中剩余的记录并停止后台写入线程"""
+        if self._listener._thread is not None:
+            self._listener.stop()
+
+
+_loggers: Dict[str, LLMCallLogger] = {}
+_loggers_lock = threading.Lock()
+
+
+def get_llm_call_logger(log_path: Optional[str] = None) -> LLMCallLogger:
+    """按日志路径获取进程内共享的 LLMCallLogger 实例"""
+    settings = get_settings()
+    log_path = os.path.abspath(log_path or settings.llm_log_path)
+    with _loggers_lock:
+        call_logger = _loggers.get(log_path)
+        if call_logger is None:
+            call_logger = LLMCallLogger(
+                log_path,
+                max_bytes=settings.llm_log_max_bytes,
+                backup_count=settings.llm_log_backup_count,
+                rotate_interval_seconds=settings.llm_log_rotate_interval_hours * 3600,
+                compress=settings.llm_log_compress,
+                sample_rate=settings.llm_log_sample_rate
+            )
+            _loggers[log_path] = call_logger
+        return call_logger
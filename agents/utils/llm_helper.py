@@ -4,14 +4,33 @@ LLM调用辅助模块 - LangChain集成版本
 """
 
 import asyncio
+import contextvars
+import json
+import queue
+import threading
 import yaml
-import os
-import datetime
-from typing import Any, List, Optional, Dict
+import time
+from typing import Any, AsyncIterator, Iterator, List, Optional, Dict
 from langchain_core.language_models.llms import LLM
-from langchain_core.callbacks.manager import CallbackManagerForLLMRun
+from langchain_core.callbacks.manager import CallbackManagerForLLMRun, AsyncCallbackManagerForLLMRun
+from langchain_core.outputs import GenerationChunk
 from config.llm_config import LLMConfig
+from config.settings import get_settings
+from tools import deadline, scheduler
+from . import telemetry
 from .fallback_openai_client import AsyncFallbackOpenAIClient
+from .llm_call_logger import get_llm_call_logger
+from .prompt_registry import get_prompt_registry
+
+
+def _render_packed_prompt(prompts: List[str]) -> str:
+    """把多条相互独立的短提示词合并为一次要求按JSON数组逐条作答的请求"""
+    questions = "\n\n".join(f"### 问题 {i + 1}\n{p}" for i, p in enumerate(prompts))
+    return get_prompt_registry().render('llm_helper/batch_pack', count=len(prompts), questions=questions)
+
+
+# iter_deltas 后台线程与消费方之间最多缓存的增量段数
+STREAM_QUEUE_MAX_ITEMS = 256
 
 
 class LLMHelper(LLM):
@@ -39,7 +58,7 @@ class LLMHelper(LLM):
             content_filter_error_code=config.content_filter_error_code,
             content_filter_error_field=config.content_filter_error_field
         )
-        llm_log_path = os.path.join(os.getcwd(), 'llm_calls.log')
+        llm_log_path = get_settings().llm_log_path
         
         # 调用父类初始化，传入所有必需字段
         super().__init__(
@@ -72,26 +91,70 @@ class LLMHelper(LLM):
     ) -> str:
         """LangChain LLM的异步调用方法"""
         return await self.async_call(prompt, **kwargs)
+
+    def _stream(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[GenerationChunk]:
+        """LangChain LLM的同步流式方法，支撑 llm.stream(prompt) 逐段返回token增量"""
+        for delta in self.iter_deltas(prompt, **kwargs):
+            if run_manager:
+                run_manager.on_llm_new_token(delta)
+            yield GenerationChunk(text=delta)
+
+    async def _astream(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[GenerationChunk]:
+        """LangChain LLM的异步流式方法，支撑 llm.astream(prompt) 逐段返回token增量"""
+        async for delta in self.async_stream_call(prompt, **kwargs):
+            if run_manager:
+                await run_manager.on_llm_new_token(delta)
+            yield GenerationChunk(text=delta)
     
-    def log_llm_call(self, prompt, system_prompt, response):
+    def log_llm_call(self, prompt, system_prompt, response, usage=None, **fields):
+        """
+        记录一次LLM调用。记录仅放入内存队列，由后台线程以JSONL格式写入 llm_log_path。
+
+        Args:
+            usage: OpenAI 响应中的 usage 对象（可选），用于提取token数与提示词缓存命中情况。
+            **fields: 其他附加字段，如 model、latency_ms、stream、error 等。
+        """
+        record = {
+            "model": self.config.model,
+            "system_prompt": system_prompt,
+            "prompt": prompt,
+            "response": response,
+        }
+        if usage is not None:
+            cached_tokens = getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", None) or 0
+            record.update({
+                "prompt_tokens": getattr(usage, "prompt_tokens", None),
+                "completion_tokens": getattr(usage, "completion_tokens", None),
+                "total_tokens": getattr(usage, "total_tokens", None),
+                "cached_tokens": cached_tokens,
+                "cache_hit": cached_tokens > 0,
+            })
+        record.update(fields)
         try:
-            print(f"LLM日志写入路径: {self.llm_log_path}")
-            with open(self.llm_log_path, 'a', encoding='utf-8') as f:
-                f.write(f"\n{'='*40}\n[{datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}]\n")
-                if system_prompt:
-                    f.write(f"[System Prompt]:\n{system_prompt}\n")
-                f.write(f"[User Prompt]:\n{prompt}\n")
-                f.write(f"[LLM Response]:\n{response}\n")
+            get_llm_call_logger(self.llm_log_path).log(record)
         except Exception as e:
-            print(f"写入llm_calls.log失败: {e}")
+            print(f"写入LLM调用日志失败: {e}")
 
-    async def async_call(self, prompt: str, system_prompt: str = None, max_tokens: int = None, temperature: float = None) -> str:
-        """异步调用LLM"""
+    def _build_messages(self, prompt: str, system_prompt: str = None) -> List[Dict[str, str]]:
         messages = []
         if system_prompt:
             messages.append({"role": "system", "content": system_prompt})
         messages.append({"role": "user", "content": prompt})
-        
+        return messages
+
+    def _build_call_kwargs(self, max_tokens: int = None, temperature: float = None) -> Dict[str, Any]:
         kwargs = {}
         if max_tokens is not None:
             kwargs['max_tokens'] = max_tokens
@@ -102,20 +165,173 @@ class LLMHelper(LLM):
             kwargs['temperature'] = temperature
         else:
             kwargs['temperature'] = self.config.temperature
+        return kwargs
+
+    async def async_call(self, prompt: str, system_prompt: str = None, max_tokens: int = None, temperature: float = None) -> str:
+        """
+        异步调用LLM；调用前占用一个LLM共享槽位（按当前调度流公平排队），
+        超时取 LLM_CALL_TIMEOUT_SECONDS 与当前截止时间剩余时间中的较小者（含排队时间）
+        """
+        messages = self._build_messages(prompt, system_prompt)
+        kwargs = self._build_call_kwargs(max_tokens, temperature)
+        timeout = deadline.effective_timeout(get_settings().llm_call_timeout_seconds)
+        queued = {}
+
+        async def scheduled_call():
+            async with scheduler.get_scheduler("llm").slot_async():
+                queued["ms"] = round((time.perf_counter() - start) * 1000, 1)
+                return await self.client.chat_completions_create(messages=messages, **kwargs)
             
+        with telemetry.span("llm.call", model=self.config.model) as call_span:
+            start = time.perf_counter()
+            try:
+                response = await asyncio.wait_for(scheduled_call(), timeout)
+                result = response.choices[0].message.content
+                latency_ms = round((time.perf_counter() - start) * 1000, 1)
+                usage = getattr(response, "usage", None)
+                call_span.set(
+                    model=getattr(response, "model", None),
+                    network_ms=round(latency_ms - queued.get("ms", 0.0), 1),
+                    # 批量调用的信号量等待（来自 telemetry.scope）加上共享槽位的排队时间
+                    queue_wait_ms=round((call_span.attributes.get("queue_wait_ms") or 0) + queued.get("ms", 0.0), 1),
+                    prompt_tokens=getattr(usage, "prompt_tokens", None),
+                    completion_tokens=getattr(usage, "completion_tokens", None)
+                )
+                self.log_llm_call(
+                    prompt, system_prompt, result,
+                    usage=usage,
+                    model=getattr(response, "model", None) or self.config.model,
+                    latency_ms=latency_ms
+                )
+                return result
+            except Exception as e:
+                print(f"LLM调用失败: {e}")
+                call_span.error = f"{type(e).__name__}: {e}"
+                self.log_llm_call(
+                    prompt, system_prompt, "",
+                    latency_ms=round((time.perf_counter() - start) * 1000, 1),
+                    error=call_span.error
+                )
+                # 因截止时间耗尽或任务取消而失败时向上抛出，不再当作空回复继续
+                deadline.check()
+                return ""
+
+    async def async_stream_call(self, prompt: str, system_prompt: str = None, max_tokens: int = None, temperature: float = None) -> AsyncIterator[str]:
+        """
+        异步流式调用LLM，逐段产出token增量；流结束后记录完整响应。
+        建立连接与每一段增量的等待时间都受 LLM_CALL_TIMEOUT_SECONDS 与当前截止时间剩余时间约束，
+        所在任务被取消时在下一段到达前退出；中途失败时抛出异常，不把截断的输出当作完整响应。
+        """
+        messages = self._build_messages(prompt, system_prompt)
+        kwargs = self._build_call_kwargs(max_tokens, temperature)
+        chunks = []
+        call_timeout = get_settings().llm_call_timeout_seconds
+        deadline.check()
+        start = time.perf_counter()
+        start_ns = time.time_ns()
+        first_token_ms = None
+        error = None
         try:
-            response = await self.client.chat_completions_create(
-                messages=messages,
-                **kwargs
-            )
-            result = response.choices[0].message.content
-            self.log_llm_call(prompt, system_prompt, result)
-            return result
+            # 整个流式响应期间占用一个LLM共享槽位
+            async with scheduler.get_scheduler("llm").slot_async():
+                stream = await asyncio.wait_for(
+                    self.client.chat_completions_create(messages=messages, stream=True, **kwargs),
+                    deadline.effective_timeout(call_timeout)
+                )
+                chunk_iter = stream.__aiter__()
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(chunk_iter.__anext__(), deadline.effective_timeout(call_timeout))
+                    except StopAsyncIteration:
+                        break
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        if first_token_ms is None:
+                            first_token_ms = round((time.perf_counter() - start) * 1000, 1)
+                        chunks.append(delta)
+                        yield delta
         except Exception as e:
-            print(f"LLM调用失败: {e}")
-            return ""
-    def call(self, prompt: str, system_prompt: str = None, max_tokens: int = None, temperature: float = None) -> str:
-        """同步调用LLM"""
+            print(f"LLM流式调用失败: {e}")
+            error = f"{type(e).__name__}: {e}"
+            # 截止时间耗尽或任务取消时抛出 TaskCancelled/DeadlineExceeded，其余异常原样抛出
+            deadline.check()
+            raise
+        finally:
+            latency_ms = round((time.perf_counter() - start) * 1000, 1)
+            telemetry.record(
+                "llm.stream", start_ns, error=error,
+                model=self.config.model,
+                network_ms=latency_ms,
+                first_token_ms=first_token_ms
+            )
+            self.log_llm_call(
+                prompt, system_prompt, "".join(chunks),
+                latency_ms=latency_ms,
+                first_token_ms=first_token_ms,
+                stream=True,
+                error=error
+            )
+
+    def iter_deltas(self, prompt: str, system_prompt: str = None, max_tokens: int = None, temperature: float = None) -> Iterator[str]:
+        """
+        同步流式调用LLM，在后台线程的事件循环中消费异步流，逐段产出token增量。
+        增量经有界队列传递（消费慢时反压到模型流）；消费方提前停止（生成器关闭、任务取消、解析异常）时
+        通知后台线程关闭流，及时释放连接与LLM共享槽位。
+        """
+        deltas = queue.Queue(maxsize=STREAM_QUEUE_MAX_ITEMS)
+        stop = threading.Event()
+        done = object()
+
+        def offer(item) -> bool:
+            """放入队列，消费方已停止时放弃"""
+            while not stop.is_set():
+                try:
+                    deltas.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        async def pump():
+            stream = self.async_stream_call(prompt, system_prompt, max_tokens, temperature)
+            try:
+                async for delta in stream:
+                    if not offer(delta):
+                        break
+            finally:
+                await stream.aclose()
+
+        def run_stream():
+            try:
+                asyncio.run(pump())
+            except BaseException as e:
+                offer(e)
+            finally:
+                offer(done)
+
+        # 后台线程沿用当前上下文，保证遥测属性（智能体、任务序号等）能够传递
+        ctx = contextvars.copy_context()
+        threading.Thread(target=ctx.run, args=(run_stream,), daemon=True).start()
+        try:
+            while True:
+                try:
+                    item = deltas.get(timeout=0.2)
+                except queue.Empty:
+                    # 等待下一段时同样响应取消与截止时间
+                    deadline.check()
+                    continue
+                if item is done:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+
+    def _run_sync(self, make_coro):
+        """在同步上下文中运行协程：无运行中的事件循环时直接 asyncio.run，否则借助 nest_asyncio 或独立线程"""
         try:
             # 尝试获取当前事件循环
             loop = asyncio.get_event_loop()
@@ -124,14 +340,9 @@ class LLMHelper(LLM):
                 try:
                     import nest_asyncio
                     nest_asyncio.apply()
-                    result = asyncio.run(self.async_call(prompt, system_prompt, max_tokens, temperature))
+                    return asyncio.run(make_coro())
                 except ImportError:
-                    # 如果没有nest_asyncio，使用create_task
-                    task = asyncio.create_task(self.async_call(prompt, system_prompt, max_tokens, temperature))
-                    # 等待任务完成
-                    import concurrent.futures
-                    import threading
-                    
+                    # 如果没有nest_asyncio，在独立线程的新事件循环中运行
                     result = None
                     exception = None
                     
@@ -140,27 +351,102 @@ class LLMHelper(LLM):
                         try:
                             new_loop = asyncio.new_event_loop()
                             asyncio.set_event_loop(new_loop)
-                            result = new_loop.run_until_complete(self.async_call(prompt, system_prompt, max_tokens, temperature))
+                            result = new_loop.run_until_complete(make_coro())
                             new_loop.close()
                         except Exception as e:
                             exception = e
                     
-                    thread = threading.Thread(target=run_task)
+                    ctx = contextvars.copy_context()
+                    thread = threading.Thread(target=ctx.run, args=(run_task,))
                     thread.start()
                     thread.join()
                     
                     if exception:
                         raise exception
+                    return result
             else:
                 # 如果事件循环未运行，直接使用asyncio.run
-                result = asyncio.run(self.async_call(prompt, system_prompt, max_tokens, temperature))
-            self.log_llm_call(prompt, system_prompt, result)
-            return result
+                return asyncio.run(make_coro())
         except RuntimeError:
             # 如果没有事件循环，创建新的
-            result = asyncio.run(self.async_call(prompt, system_prompt, max_tokens, temperature))
-            self.log_llm_call(prompt, system_prompt, result)
-            return result
+            return asyncio.run(make_coro())
+
+    def call(self, prompt: str, system_prompt: str = None, max_tokens: int = None, temperature: float = None) -> str:
+        """同步调用LLM"""
+        return self._run_sync(lambda: self.async_call(prompt, system_prompt, max_tokens, temperature))
+
+    async def async_batch_call(
+        self,
+        prompts: List[str],
+        system_prompt: str = None,
+        max_tokens: int = None,
+        temperature: float = None,
+        max_concurrency: int = None,
+        pack_size: int = 1,
+        pack_max_chars: int = 500
+    ) -> List[str]:
+        """
+        异步批量调用LLM，在共享客户端上以有限并发同时发出多个相互独立的小请求，按输入顺序返回结果。
+
+        Args:
+            prompts: 提示词列表。
+            max_concurrency: 最大并发请求数，默认取 config.max_concurrency。
+            pack_size: 大于1时，把不超过 pack_max_chars 的短提示词按 pack_size 个一组合并为一次
+                多段结构化请求，再按JSON数组拆分回各自的答案；拆分失败的组回退为逐条调用。
+            pack_max_chars: 可参与合并的单条提示词最大字符数。
+
+        Returns:
+            与 prompts 一一对应的响应文本列表，单条失败时对应位置为空字符串。
+        """
+        semaphore = asyncio.Semaphore(max_concurrency or self.config.max_concurrency)
+        results: List[str] = [""] * len(prompts)
+
+        async def run_one(prompt: str, system: Optional[str]) -> str:
+            enqueued = time.perf_counter()
+            async with semaphore:
+                queue_wait_ms = round((time.perf_counter() - enqueued) * 1000, 1)
+                with telemetry.scope(queue_wait_ms=queue_wait_ms):
+                    return await self.async_call(prompt, system, max_tokens, temperature)
+
+        async def run_single(idx: int):
+            results[idx] = await run_one(prompts[idx], system_prompt)
+
+        async def run_packed(indices: List[int]):
+            packed_prompt = _render_packed_prompt([prompts[i] for i in indices])
+            answers = self.parse_code_block_response(await run_one(packed_prompt, system_prompt))
+            if isinstance(answers, dict):
+                answers = answers.get("answers")
+            if isinstance(answers, list) and len(answers) == len(indices):
+                for i, answer in zip(indices, answers):
+                    results[i] = answer if isinstance(answer, str) else json.dumps(answer, ensure_ascii=False)
+            else:
+                print(f"合并请求的答案数量不匹配，回退为逐条调用: {len(indices)} 条")
+                await asyncio.gather(*(run_single(i) for i in indices))
+
+        jobs = []
+        group: List[int] = []
+        for idx, prompt in enumerate(prompts):
+            if pack_size > 1 and len(prompt) <= pack_max_chars:
+                group.append(idx)
+                if len(group) == pack_size:
+                    jobs.append(run_packed(group))
+                    group = []
+            else:
+                jobs.append(run_single(idx))
+        if len(group) > 1:
+            jobs.append(run_packed(group))
+        elif group:
+            jobs.append(run_single(group[0]))
+        await asyncio.gather(*jobs)
+        return results
+
+    def batch_call(self, prompts: List[str], system_prompt: str = None, max_tokens: int = None,
+                   temperature: float = None, max_concurrency: int = None, pack_size: int = 1,
+                   pack_max_chars: int = 500) -> List[str]:
+        """同步批量调用LLM，参数见 async_batch_call"""
+        return self._run_sync(lambda: self.async_batch_call(
+            prompts, system_prompt, max_tokens, temperature, max_concurrency, pack_size, pack_max_chars
+        ))
     
     def parse_yaml_response(self, response: str) -> dict:
         """解析YAML格式的响应"""
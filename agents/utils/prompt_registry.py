@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+提示词模板注册表 - 启动时一次性加载并预编译 agents/prompt 下的全部模板，
+开启 PROMPT_AUTO_RELOAD 时按文件mtime自动失效重载，并支持静态前缀/动态后缀拆分以提升服务端提示词前缀缓存命中率
+"""
+
+import os
+import string
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from config.settings import get_settings
+
+PROMPT_ROOT = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'prompt')
+
+
+class CompiledPrompt:
+    """预编译的提示词模板，语义与 str.format 一致（支持 {{ }} 转义、格式说明符和 !r/!s 转换）"""
+
+    _formatter = string.Formatter()
+
+    def __init__(self, name: str, text: str, mtime: float = 0.0):
+        self.name = name
+        self.text = text
+        self.mtime = mtime
+        # [(字面文本, 字段名, 格式说明, 转换符)]，与 string.Formatter.parse 的输出一致
+        self.segments: List[Tuple[str, Optional[str], Optional[str], Optional[str]]] = list(self._formatter.parse(text))
+        self.fields = [field for _, field, _, _ in self.segments if field is not None]
+
+    def _render_segments(self, segments, kwargs: Dict[str, Any]) -> str:
+        parts = []
+        for literal, field, spec, conversion in segments:
+            parts.append(literal)
+            if field is None:
+                continue
+            value, _ = self._formatter.get_field(field, (), kwargs)
+            value = self._formatter.convert_field(value, conversion)
+            parts.append(self._formatter.format_field(value, spec or ""))
+        return "".join(parts)
+
+    def render(self, **kwargs) -> str:
+        """渲染完整提示词"""
+        return self._render_segments(self.segments, kwargs)
+
+    # 兼容原先 _load_prompt(...).format(...) 的用法
+    format = render
+
+    def render_split(self, dynamic_fields: Iterable[str], **kwargs) -> Tuple[str, str]:
+        """
+        以第一个动态字段为界拆分渲染结果。
+
+        静态前缀只包含模板文本和静态字段（如工具列表、能力描述），在多次调用间保持逐字节一致，
+        适合作为 system 消息发送以命中服务端的提示词前缀缓存；动态后缀包含本次请求相关的内容。
+
+        Returns:
+            (静态前缀, 动态后缀)，两者拼接等于 render(**kwargs)。
+        """
+        dynamic = set(dynamic_fields)
+        for idx, (literal, field, spec, conversion) in enumerate(self.segments):
+            if field is not None and field.split('.')[0].split('[')[0] in dynamic:
+                prefix = self._render_segments(self.segments[:idx], kwargs) + literal
+                suffix = self._render_segments([("", field, spec, conversion)] + self.segments[idx + 1:], kwargs)
+                return prefix, suffix
+        return self.render(**kwargs), ""
+
+
+class PromptRegistry:
+    """提示词模板注册表，按相对路径（不含 .txt，如 "tool_agent/tool_select"）索引模板"""
+
+    def __init__(self, root: str = PROMPT_ROOT, auto_reload: bool = False):
+        """
+        Args:
+            root: 模板根目录。
+            auto_reload: 是否在每次获取时检查文件mtime并自动重载（用于调试模板）。
+        """
+        self.root = root
+        self.auto_reload = auto_reload
+        self._prompts: Dict[str, CompiledPrompt] = {}
+        self._lock = threading.Lock()
+        self.load_all()
+
+    @staticmethod
+    def _normalize(name: str) -> str:
+        name = name.replace('\\', '/')
+        return name[:-4] if name.endswith('.txt') else name
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.root, *name.split('/')) + '.txt'
+
+    def _load(self, name: str) -> CompiledPrompt:
+        path = self._path(name)
+        mtime = os.path.getmtime(path)
+        with open(path, 'r', encoding='utf-8') as f:
+            prompt = CompiledPrompt(name, f.read(), mtime)
+        self._prompts[name] = prompt
+        return prompt
+
+    def load_all(self):
+        """加载并预编译根目录下的全部模板"""
+        with self._lock:
+            for dirpath, _, files in os.walk(self.root):
+                for file in files:
+                    if file.endswith('.txt'):
+                        rel = os.path.relpath(os.path.join(dirpath, file), self.root)
+                        self._load(self._normalize(rel))
+
+    def get(self, name: str) -> CompiledPrompt:
+        """获取预编译模板；开启自动重载时文件有修改则重新加载"""
+        name = self._normalize(name)
+        prompt = self._prompts.get(name)
+        if prompt is not None and not self.auto_reload:
+            return prompt
+        with self._lock:
+            prompt = self._prompts.get(name)
+            if prompt is None or os.path.getmtime(self._path(name)) != prompt.mtime:
+                prompt = self._load(name)
+            return prompt
+
+    def render(self, name: str, **kwargs) -> str:
+        return self.get(name).render(**kwargs)
+
+    def render_split(self, name: str, dynamic_fields: Iterable[str], **kwargs) -> Tuple[str, str]:
+        return self.get(name).render_split(dynamic_fields, **kwargs)
+
+
+_registry: Optional[PromptRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_prompt_registry() -> PromptRegistry:
+    """获取全局提示词注册表（首次调用时加载全部模板）"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                settings = get_settings()
+                _registry = PromptRegistry(auto_reload=settings.prompt_auto_reload)
+    return _registry
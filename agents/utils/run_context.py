@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+运行上下文模块 - 每次 Orchestrator.dispatch 拥有独立的 RunContext（按 run_id 区分），经 contextvar
+在同一线程/协程及其派生的线程、任务中传递；注册表、工具目录、LLM客户端等重量级单例仍在进程内共享，
+只有任务结果等可变状态按运行隔离，同一进程可同时处理多个请求
+"""
+
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+# 运行事件监听函数，参数为 {"type": ..., "run_id": ..., "time": ..., **字段}
+EventListener = Callable[[Dict[str, Any]], None]
+
+
+class RunContext(dict):
+    """
+    一次运行的上下文。行为与原先的 MetaAgent.context 字典一致（如 task_{idx}_result -> 产物引用），
+    另外记录 run_id 与创建时间；listener 接收运行过程中的事件（任务开始、结束、跳过等）。
+    """
+
+    def __init__(self, run_id: str, *args, listener: Optional[EventListener] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.run_id = run_id
+        self.created_at = time.time()
+        self.listener = listener
+
+    def emit(self, event_type: str, **fields):
+        """发布运行事件；监听函数异常不影响任务执行"""
+        if self.listener is None:
+            return
+        try:
+            self.listener({"type": event_type, "run_id": self.run_id, "time": time.time(), **fields})
+        except Exception as e:
+            print(f"[RunContext] 事件监听异常: {e}")
+
+    def __repr__(self) -> str:
+        return f"RunContext(run_id={self.run_id!r}, keys={list(self.keys())})"
+
+
+_current: contextvars.ContextVar[Optional[RunContext]] = contextvars.ContextVar("run_context", default=None)
+
+
+def current_run_context() -> Optional[RunContext]:
+    """当前所在运行的上下文，不在任何运行中时返回 None"""
+    return _current.get()
+
+
+@contextmanager
+def run_context(run_id: str, listener: Optional[EventListener] = None):
+    """进入一次新运行的上下文；嵌套运行各自独立（未指定 listener 时沿用外层的监听函数），退出后恢复外层运行的上下文"""
+    outer = _current.get()
+    if listener is None and outer is not None:
+        listener = outer.listener
+    context = RunContext(run_id, listener=listener)
+    token = _current.set(context)
+    try:
+        yield context
+    finally:
+        _current.reset(token)
+
+
+def emit(event_type: str, **fields):
+    """向当前运行发布事件，不在运行中时忽略"""
+    context = _current.get()
+    if context is not None:
+        context.emit(event_type, **fields)
+
+
+__all__ = ["RunContext", "EventListener", "current_run_context", "run_context", "emit"]
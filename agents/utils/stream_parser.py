@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+"""
+增量结构化解析模块 - 在LLM流式输出过程中提前解析出已完整的列表项
+"""
+
+import json
+import re
+from typing import Any, List, Optional
+
+import yaml
+
+
+class IncrementalStructuredParser:
+    """
+    增量解析 LLM 流式输出的 JSON/YAML 文档。
+
+    每次 feed 一段 token 增量，返回指定列表字段（默认 tasks）中新近完整的元素，
+    使调用方在整段响应结束前就能开始处理前面的任务；close 时对完整文本做一次兜底解析。
+    """
+
+    _FENCE_PATTERN = re.compile(r"```(?:json|yaml)?\s*([\s\S]*?)```")
+
+    def __init__(self, list_key: Optional[str] = "tasks"):
+        """
+        Args:
+            list_key: 需要增量提取的列表字段名；为 None 时提取根节点列表的元素。
+        """
+        self.list_key = list_key
+        self.buffer = ""
+        self.mode: Optional[str] = None  # "json" / "yaml"
+        self.emitted = 0
+        self._pos = 0
+        # JSON 扫描状态
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_key: Optional[str] = None
+        self._expect_array = False
+        self._array_depth: Optional[int] = None
+        self._item_start: Optional[int] = None
+        self._done = False
+        # YAML 扫描状态
+        self._root_indent: Optional[int] = None  # 文档顶层键的缩进，只在这一层匹配 list_key
+        self._key_indent: Optional[int] = None
+        self._item_indent: Optional[int] = None
+        self._item_lines: List[str] = []
+
+    def feed(self, delta: str) -> List[Any]:
+        """输入一段增量文本，返回本次新解析出的完整列表项"""
+        if not delta:
+            return []
+        self.buffer += delta
+        if self.mode is None and not self._detect_mode():
+            return []
+        if self._done:
+            return []
+        if self.mode == "json":
+            items = self._scan_json()
+        else:
+            items = self._scan_yaml()
+        self.emitted += len(items)
+        return items
+
+    def close(self) -> Any:
+        """流结束后解析完整文本，兼容 ```json、```yaml、``` 代码块，失败返回 {}"""
+        content = self.buffer.strip()
+        match = self._FENCE_PATTERN.search(content)
+        if match:
+            content = match.group(1).strip()
+        try:
+            return json.loads(content)
+        except Exception:
+            pass
+        try:
+            return yaml.safe_load(content) or {}
+        except Exception as e:
+            print(f"代码块解析失败: {e}")
+            print(f"原始响应: {self.buffer}")
+            return {}
+
+    def remaining_items(self, document: Any) -> List[Any]:
+        """根据 close() 得到的完整文档，返回尚未通过 feed 产出的列表项"""
+        if self.list_key is None:
+            items = document if isinstance(document, list) else []
+        elif isinstance(document, dict) and isinstance(document.get(self.list_key), list):
+            items = document[self.list_key]
+        else:
+            items = []
+        return items[self.emitted:]
+
+    def _detect_mode(self) -> bool:
+        """跳过前导空白与代码块围栏，根据正文首字符判断 JSON 或 YAML"""
+        text = self.buffer
+        start = len(text) - len(text.lstrip())
+        rest = text[start:]
+        if not rest:
+            return False
+        if rest.startswith("```"):
+            newline = rest.find("\n")
+            if newline == -1:
+                return False
+            start += newline + 1
+        elif "```".startswith(rest):
+            return False
+        body = text[start:]
+        stripped = body.lstrip()
+        if not stripped:
+            return False
+        self._pos = start
+        self.mode = "json" if stripped[0] in "{[" else "yaml"
+        return True
+
+    def _scan_json(self) -> List[Any]:
+        items = []
+        text = self.buffer
+        i = self._pos
+        while i < len(text):
+            ch = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._array_depth is None:
+                        self._last_key = text[self._string_start:i]
+                i += 1
+                continue
+            if self._expect_array and not ch.isspace():
+                self._expect_array = False
+                if ch == "[":
+                    self._depth += 1
+                    self._array_depth = self._depth
+                    i += 1
+                    continue
+            if self._array_depth is not None and self._depth == self._array_depth:
+                if ch in ",]":
+                    if self._item_start is not None:
+                        item = self._load_json_item(text[self._item_start:i])
+                        if item is not None:
+                            items.append(item)
+                        self._item_start = None
+                elif not ch.isspace() and self._item_start is None:
+                    self._item_start = i
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i + 1
+            elif ch in "{[":
+                self._depth += 1
+                if self.list_key is None and self._depth == 1 and ch == "[":
+                    self._array_depth = 1
+            elif ch in "}]":
+                if self._array_depth is not None and self._depth == self._array_depth and ch == "]":
+                    self._array_depth = None
+                    self._done = True
+                    self._pos = i + 1
+                    return items
+                self._depth -= 1
+            elif ch == ":" and self._depth == 1 and self._last_key == self.list_key:
+                self._expect_array = True
+                self._last_key = None
+            i += 1
+        self._pos = i
+        return items
+
+    @staticmethod
+    def _load_json_item(raw: str) -> Any:
+        raw = raw.strip()
+        if not raw:
+            return None
+        try:
+            return json.loads(raw)
+        except Exception:
+            return None
+
+    def _scan_yaml(self) -> List[Any]:
+        items = []
+        text = self.buffer
+        while True:
+            newline = text.find("\n", self._pos)
+            if newline == -1:
+                break
+            line = text[self._pos:newline]
+            self._pos = newline + 1
+            item = self._consume_yaml_line(line)
+            if item is not None:
+                items.append(item)
+            if self._done:
+                break
+        return items
+
+    def _consume_yaml_line(self, line: str) -> Any:
+        stripped = line.strip()
+        indent = len(line) - len(line.lstrip())
+        if self._key_indent is None:
+            if not stripped or stripped.startswith("#") or stripped.startswith("```"):
+                return None
+            if self._root_indent is None:
+                self._root_indent = indent
+            if indent != self._root_indent:
+                # 嵌套在其他字段下的同名键（如任务内的 tasks:）不是要提取的列表
+                return None
+            if self.list_key is None:
+                if stripped.startswith("- "):
+                    self._key_indent = -1
+                else:
+                    return None
+            elif stripped == f"{self.list_key}:":
+                self._key_indent = indent
+                return None
+            else:
+                return None
+        if stripped.startswith("```"):
+            self._done = True
+            return self._flush_yaml_item()
+        if not stripped or stripped.startswith("#"):
+            if self._item_lines:
+                self._item_lines.append(line)
+            return None
+        if self._item_indent is None:
+            if stripped.startswith("-") and indent >= self._key_indent:
+                self._item_indent = indent
+                self._item_lines = [line]
+            elif indent <= self._key_indent:
+                self._done = True
+            return None
+        if indent == self._item_indent and stripped.startswith("-"):
+            item = self._flush_yaml_item()
+            self._item_lines = [line]
+            return item
+        if indent <= self._item_indent:
+            self._done = True
+            return self._flush_yaml_item()
+        self._item_lines.append(line)
+        return None
+
+    def _flush_yaml_item(self) -> Any:
+        if not self._item_lines:
+            return None
+        block = "\n".join(l[self._item_indent:] for l in self._item_lines)
+        self._item_lines = []
+        try:
+            parsed = yaml.safe_load(block)
+        except Exception:
+            return None
+        if isinstance(parsed, list) and parsed:
+            return parsed[0]
+        return None
@@ -0,0 +1,335 @@
+# -*- coding: utf-8 -*-
+"""
+调用遥测模块 - 记录每次LLM/工具调用的span（智能体、任务序号、端点、token数、排队与网络耗时），
+按 Orchestrator.dispatch 运行聚合，可导出为 OpenTelemetry(OTLP/JSON) 兼容的trace或本地Prometheus指标
+"""
+
+import contextvars
+import json
+import os
+import secrets
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+from config.settings import get_settings
+
+# 这些属性会从外层作用域自动继承到内层span上
+INHERITED_ATTRIBUTES = ("agent", "task_idx", "run_id", "queue_wait_ms")
+
+_current_run: contextvars.ContextVar[Optional["RunTrace"]] = contextvars.ContextVar("telemetry_run", default=None)
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("telemetry_span", default=None)
+_scope_attributes: contextvars.ContextVar[Dict[str, Any]] = contextvars.ContextVar("telemetry_scope", default={})
+
+
+@dataclass
+class Span:
+    """一次被观测的操作（LLM调用、工具调用、任务执行等）"""
+    name: str
+    trace_id: str
+    span_id: str = field(default_factory=lambda: secrets.token_hex(8))
+    parent_id: Optional[str] = None
+    start_ns: int = field(default_factory=time.time_ns)
+    end_ns: Optional[int] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    def set(self, **attributes):
+        """补充span属性，值为None的属性会被忽略"""
+        self.attributes.update({k: v for k, v in attributes.items() if v is not None})
+
+    @property
+    def duration_ms(self) -> float:
+        end_ns = self.end_ns or time.time_ns()
+        return (end_ns - self.start_ns) / 1e6
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or time.time_ns()),
+            "attributes": [_otlp_attribute(k, v) for k, v in self.attributes.items()],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+class RunTrace:
+    """一次 Orchestrator.dispatch 运行中收集到的全部span"""
+
+    def __init__(self, name: str, run_id: Optional[str] = None):
+        self.name = name
+        self.trace_id = secrets.token_hex(16)
+        self.run_id = run_id or self.trace_id
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def add(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        按智能体、任务序号和span类型聚合调用次数、token数与耗时（毫秒）。
+        """
+        def new_bucket():
+            return {"calls": 0, "errors": 0, "prompt_tokens": 0, "completion_tokens": 0,
+                    "duration_ms": 0.0, "queue_wait_ms": 0.0, "network_ms": 0.0}
+
+        by_agent = defaultdict(new_bucket)
+        by_task = defaultdict(new_bucket)
+        by_name = defaultdict(new_bucket)
+        total = new_bucket()
+        with self._lock:
+            spans = list(self.spans)
+        for span in spans:
+            if not span.name.startswith(("llm.", "mcp.")):
+                continue
+            attrs = span.attributes
+            buckets = [total, by_name[span.name], by_agent[attrs.get("agent", "unknown")]]
+            if "task_idx" in attrs:
+                buckets.append(by_task[attrs["task_idx"]])
+            for bucket in buckets:
+                bucket["calls"] += 1
+                bucket["errors"] += 1 if span.error else 0
+                bucket["prompt_tokens"] += attrs.get("prompt_tokens", 0) or 0
+                bucket["completion_tokens"] += attrs.get("completion_tokens", 0) or 0
+                bucket["duration_ms"] += span.duration_ms
+                bucket["queue_wait_ms"] += attrs.get("queue_wait_ms", 0) or 0
+                bucket["network_ms"] += attrs.get("network_ms", 0) or 0
+        return {
+            "run_id": self.run_id,
+            "total": total,
+            "by_agent": dict(by_agent),
+            "by_task": dict(by_task),
+            "by_span": dict(by_name),
+        }
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """导出为 OTLP/JSON 格式（可直接POST到 OpenTelemetry Collector 的 /v1/traces）"""
+        with self._lock:
+            spans = [s.to_otlp() for s in self.spans]
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [_otlp_attribute("service.name", "seven_agents")]},
+                "scopeSpans": [{
+                    "scope": {"name": "agents.telemetry"},
+                    "spans": spans,
+                }],
+            }]
+        }
+
+
+class MetricsRegistry:
+    """进程级累计指标，按 (span类型, 智能体) 聚合，可渲染为 Prometheus 文本格式"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[tuple, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+
+    def record(self, span: Span):
+        key = (span.name, str(span.attributes.get("agent", "unknown")))
+        with self._lock:
+            counter = self._counters[key]
+            counter["calls_total"] += 1
+            counter["errors_total"] += 1 if span.error else 0
+            counter["prompt_tokens_total"] += span.attributes.get("prompt_tokens", 0) or 0
+            counter["completion_tokens_total"] += span.attributes.get("completion_tokens", 0) or 0
+            counter["duration_seconds_total"] += span.duration_ms / 1000
+            counter["queue_wait_seconds_total"] += (span.attributes.get("queue_wait_ms", 0) or 0) / 1000
+            counter["network_seconds_total"] += (span.attributes.get("network_ms", 0) or 0) / 1000
+
+    def render_prometheus(self) -> str:
+        lines = []
+        with self._lock:
+            items = [(key, dict(counter)) for key, counter in self._counters.items()]
+        metric_names = sorted({name for _, counter in items for name in counter})
+        for metric in metric_names:
+            full_name = f"seven_agents_{metric}"
+            lines.append(f"# TYPE {full_name} counter")
+            for (span_name, agent), counter in items:
+                if metric in counter:
+                    lines.append(f'{full_name}{{span="{span_name}",agent="{agent}"}} {counter[metric]}')
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+
+def current_run() -> Optional[RunTrace]:
+    return _current_run.get()
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+@contextmanager
+def scope(**attributes):
+    """设置可继承的上下文属性（如 agent、task_idx），作用域内新建的span都会带上"""
+    merged = {**_scope_attributes.get(), **{k: v for k, v in attributes.items() if v is not None}}
+    token = _scope_attributes.set(merged)
+    try:
+        yield
+    finally:
+        _scope_attributes.reset(token)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    记录一个span。没有处于运行（start_run）中时仍会计入进程级指标，但不会进入任何trace。
+    """
+    run = _current_run.get()
+    parent = _current_span.get()
+    new_span = Span(
+        name=name,
+        trace_id=run.trace_id if run else secrets.token_hex(16),
+        parent_id=parent.span_id if parent else None,
+    )
+    new_span.set(**{k: v for k, v in _scope_attributes.get().items() if k in INHERITED_ATTRIBUTES})
+    new_span.set(**attributes)
+    token = _current_span.set(new_span)
+    try:
+        yield new_span
+    except BaseException as e:
+        new_span.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        new_span.end_ns = time.time_ns()
+        if run:
+            run.add(new_span)
+        metrics.record(new_span)
+
+
+def record(name: str, start_ns: int, error: Optional[str] = None, **attributes) -> Span:
+    """
+    直接记录一个已结束的span，用于无法用 with 包裹的场景（如异步生成器的流式调用）。
+    """
+    run = _current_run.get()
+    parent = _current_span.get()
+    finished = Span(
+        name=name,
+        trace_id=run.trace_id if run else secrets.token_hex(16),
+        parent_id=parent.span_id if parent else None,
+        start_ns=start_ns,
+        end_ns=time.time_ns(),
+        error=error,
+    )
+    finished.set(**{k: v for k, v in _scope_attributes.get().items() if k in INHERITED_ATTRIBUTES})
+    finished.set(**attributes)
+    if run:
+        run.add(finished)
+    metrics.record(finished)
+    return finished
+
+
+def annotate(**attributes):
+    """给当前span补充属性（如 fallback 客户端记录实际命中的端点）"""
+    current = _current_span.get()
+    if current is not None:
+        current.set(**attributes)
+
+
+@contextmanager
+def start_run(name: str = "orchestrator.dispatch", run_id: Optional[str] = None):
+    """
+    开始一次可观测运行。嵌套调用时复用外层运行，只新建一个子span。
+    运行结束后按配置导出 OTLP/JSON 文件或推送到 OTLP 端点。
+    """
+    outer = _current_run.get()
+    if outer is not None:
+        with span(name):
+            yield outer
+        return
+    run = RunTrace(name, run_id=run_id)
+    run_token = _current_run.set(run)
+    try:
+        with scope(run_id=run.run_id), span(name):
+            yield run
+    finally:
+        _current_run.reset(run_token)
+        _export_run(run)
+
+
+def _export_run(run: RunTrace):
+    settings = get_settings()
+    if settings.telemetry_export_dir:
+        try:
+            os.makedirs(settings.telemetry_export_dir, exist_ok=True)
+            path = os.path.join(settings.telemetry_export_dir, f"trace_{run.run_id}.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(run.to_otlp(), f, ensure_ascii=False)
+        except Exception as e:
+            print(f"写入trace文件失败: {e}")
+    if settings.telemetry_otlp_endpoint:
+        threading.Thread(target=_post_otlp, args=(settings.telemetry_otlp_endpoint, run.to_otlp()), daemon=True).start()
+
+
+def _post_otlp(endpoint: str, payload: Dict[str, Any]):
+    try:
+        import requests
+        requests.post(endpoint, json=payload, timeout=10)
+    except Exception as e:
+        print(f"推送OTLP trace失败: {e}")
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = metrics.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_metrics_server: Optional[ThreadingHTTPServer] = None
+_metrics_server_lock = threading.Lock()
+
+
+def start_metrics_server(port: Optional[int] = None, host: Optional[str] = None) -> Optional[ThreadingHTTPServer]:
+    """
+    在后台线程启动本地 /metrics 端点（Prometheus 文本格式），端口为0时不启动；重复调用返回已启动的实例。
+    默认只监听 TELEMETRY_METRICS_HOST（127.0.0.1），由入口程序调用。
+    """
+    global _metrics_server
+    settings = get_settings()
+    port = settings.telemetry_metrics_port if port is None else port
+    host = settings.telemetry_metrics_host if host is None else host
+    if not port:
+        return _metrics_server
+    with _metrics_server_lock:
+        if _metrics_server is None:
+            _metrics_server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            threading.Thread(target=_metrics_server.serve_forever, daemon=True).start()
+    return _metrics_server
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""
+token估算工具 - 优先使用 tiktoken 精确计数，未安装时按字符类型近似估算
+"""
+
+import re
+from functools import lru_cache
+
+_CJK_PATTERN = re.compile(r'[　-〿㐀-䶿一-鿿＀-￯]')
+_WORD_PATTERN = re.compile(r'[a-z0-9_]+')
+_HAN_RUN_PATTERN = re.compile(r'[一-鿿]+')
+
+
+@lru_cache(maxsize=1)
+def _get_encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+
+def estimate_tokens(text: str) -> int:
+    """估算文本的token数：中日韩字符约1个token，其余字符约4个字符1个token"""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    cjk = len(_CJK_PATTERN.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def text_terms(text: str) -> set:
+    """提取文本词项：英文单词/数字 + 中文字符二元组（单字时保留单字），用于相关性打分与哈希向量化"""
+    text = (text or "").lower()
+    terms = set(_WORD_PATTERN.findall(text))
+    for run in _HAN_RUN_PATTERN.findall(text):
+        if len(run) == 1:
+            terms.add(run)
+        terms.update(run[i:i + 2] for i in range(len(run) - 1))
+    return terms
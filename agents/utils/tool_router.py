@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+工具路由模块 - 在工具schema加载时为每个工具（名称、描述、inputSchema）建立向量索引，
+按请求给出最近邻候选工具；置信度足够高时直接选定工具，跳过LLM工具选择
+"""
+
+import threading
+import zlib
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from config.settings import get_settings
+from tools.tool_catalog import schema_version
+from .token_utils import text_terms
+
+
+class HashingEmbedder:
+    """无需模型的轻量向量化：把词项（英文单词 + 中文二元组）哈希到固定维度并做L2归一化"""
+
+    def __init__(self, dim: int = 4096):
+        self.dim = dim
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for term in text_terms(text):
+                vectors[row, zlib.crc32(term.encode('utf-8')) % self.dim] += 1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+
+class SentenceTransformerEmbedder:
+    """基于 sentence-transformers 的语义向量化（需安装 sentence-transformers）"""
+
+    def __init__(self, model_name: str, device: str = 'cpu'):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name, device=device)
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        return np.asarray(self.model.encode(texts, normalize_embeddings=True), dtype=np.float32)
+
+
+def create_default_embedder():
+    """配置了 TOOL_ROUTER_MODEL 且可加载时使用语义模型，否则回退到哈希向量化"""
+    settings = get_settings()
+    if settings.tool_router_model:
+        try:
+            return SentenceTransformerEmbedder(settings.tool_router_model, device=settings.rag_device if settings.use_gpu else 'cpu')
+        except Exception as e:
+            print(f"工具路由语义模型加载失败，回退到哈希向量化: {e}")
+    return HashingEmbedder()
+
+
+def tool_document(tool: dict) -> str:
+    """拼接用于建立索引的工具文本：名称、标题、描述与 inputSchema"""
+    input_schema = tool.get("inputSchema") or {}
+    parts = [tool.get("name") or "", tool.get("title") or "", tool.get("description") or ""]
+    for name, info in (input_schema.get("properties") or {}).items():
+        parts.append(f"{name} {info.get('description', '')}")
+    return "\n".join(p for p in parts if p)
+
+
+class ToolRouter:
+    """
+    工具路由索引。
+
+    build 在工具schema加载（或版本变化）时计算全部工具向量；shortlist 返回最近邻候选；
+    route 在最高分不低于阈值且领先第二名足够多时直接返回工具名，否则返回 None 交由LLM选择。
+    """
+
+    def __init__(self, embedder=None, threshold: Optional[float] = None, margin: Optional[float] = None):
+        settings = get_settings()
+        self._embedder = embedder
+        self.threshold = threshold if threshold is not None else settings.tool_router_threshold
+        self.margin = margin if margin is not None else settings.tool_router_margin
+        self._lock = threading.Lock()
+        self._names: List[str] = []
+        self._matrix: Optional[np.ndarray] = None
+        self._version: Optional[str] = None
+
+    @property
+    def embedder(self):
+        if self._embedder is None:
+            self._embedder = create_default_embedder()
+        return self._embedder
+
+    def build(self, tool_schemas: List[dict], version: Optional[str] = None):
+        """为工具schema建立向量索引；version 未变化时跳过"""
+        version = version or schema_version(tool_schemas)
+        if version == self._version and self._matrix is not None:
+            return
+        names = [t.get("name") for t in tool_schemas]
+        matrix = self.embedder.embed([tool_document(t) for t in tool_schemas]) if tool_schemas else None
+        with self._lock:
+            self._names, self._matrix, self._version = names, matrix, version
+
+    def shortlist(self, query: str, top_k: int = 5) -> List[Tuple[str, float]]:
+        """返回与请求最相近的 top_k 个工具 [(工具名, 余弦相似度)]"""
+        with self._lock:
+            names, matrix = self._names, self._matrix
+        if matrix is None or not names:
+            return []
+        query_vec = self.embedder.embed([query])[0]
+        scores = matrix @ query_vec
+        order = np.argsort(-scores)[:top_k]
+        return [(names[i], float(scores[i])) for i in order]
+
+    def route(self, query: str) -> Optional[str]:
+        """置信度足够高时直接返回选定的工具名，否则返回 None"""
+        candidates = self.shortlist(query, top_k=2)
+        if not candidates:
+            return None
+        best_name, best_score = candidates[0]
+        runner_up = candidates[1][1] if len(candidates) > 1 else 0.0
+        if best_score >= self.threshold and best_score - runner_up >= self.margin:
+            return best_name
+        return None
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+工具schema压缩渲染模块 - 以精简签名形式渲染MCP工具列表，按schema版本缓存渲染结果。
+目录超出token预算时，静态部分只列出全部工具的名称与简介（同一版本逐字节稳定），
+与当前请求最相关的前K个工具的完整签名放在动态部分
+"""
+
+import math
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from config.settings import get_settings
+from tools.mcp_tools import format_tool_schema
+from tools.tool_catalog import schema_version
+from .token_utils import estimate_tokens, text_terms
+
+
+def _truncate(text: Optional[str], max_chars: int) -> str:
+    text = (text or "").strip()
+    return text if len(text) <= max_chars else text[:max_chars].rstrip() + "…"
+
+
+class ToolSchemaCompactor:
+    """
+    工具schema压缩渲染器。
+
+    每个工具复用 format_tool_schema 渲染为精简签名（截断描述、去掉输出schema），
+    单个工具的渲染文本与token数按schema版本缓存；超出token预算时按相关性选出前K个工具，
+    并保持它们在目录中的原始顺序。render_split 把只取决于schema版本的目录文本与按请求选出的工具分开，
+    前者可放入提示词的静态前缀以命中前缀缓存。
+    """
+
+    def __init__(self, max_description_chars: int = 200, max_param_description_chars: int = 80, max_index_chars: int = 60):
+        self.max_description_chars = max_description_chars
+        self.max_param_description_chars = max_param_description_chars
+        self.max_index_chars = max_index_chars
+        self._lock = threading.Lock()
+        self._version: Optional[str] = None
+        self._version_source: Optional[List[dict]] = None
+        self._entries: List[Dict[str, Any]] = []
+        self._rendered_cache: Dict[Tuple[str, Tuple[str, ...]], str] = {}
+
+    def compact_tool(self, tool: dict) -> dict:
+        """生成用于渲染的精简schema副本"""
+        input_schema = tool.get("inputSchema") or {}
+        properties = {
+            name: {"description": _truncate(info.get("description") or info.get("type", ""), self.max_param_description_chars)}
+            for name, info in (input_schema.get("properties") or {}).items()
+        }
+        return {
+            "name": tool.get("name"),
+            "description": _truncate(tool.get("description"), self.max_description_chars),
+            "inputSchema": {"properties": properties, "required": input_schema.get("required", [])},
+        }
+
+    def _prepare(self, tool_schemas: List[dict], version: Optional[str]) -> Tuple[str, List[Dict[str, Any]]]:
+        """返回 (schema版本, 各工具的渲染条目)"""
+        # 同一个schema列表对象（如 ToolCollective 的缓存）重复使用时无需重新计算哈希
+        if version is None:
+            with self._lock:
+                known = self._version if tool_schemas is self._version_source else None
+            version = known or schema_version(tool_schemas)
+        with self._lock:
+            if version != self._version:
+                entries = []
+                for tool in tool_schemas:
+                    text = format_tool_schema(self.compact_tool(tool))
+                    entries.append({
+                        "name": tool.get("name"),
+                        "text": text,
+                        "tokens": estimate_tokens(text),
+                        "index": f"- {tool.get('name')}: {_truncate(tool.get('description'), self.max_index_chars)}",
+                        "terms": text_terms(f"{tool.get('name', '')} {tool.get('title') or ''} {tool.get('description') or ''}"),
+                    })
+                self._entries = entries
+                self._version = version
+                self._rendered_cache.clear()
+            self._version_source = tool_schemas
+            return self._version, self._entries
+
+    def rank(self, tool_schemas: List[dict], query: str, version: Optional[str] = None) -> List[Tuple[str, float]]:
+        """按与请求文本的词项重叠度为工具打分，返回 [(工具名, 分数)]，分数从高到低"""
+        _, entries = self._prepare(tool_schemas, version)
+        query_terms = text_terms(query)
+        scored = []
+        for entry in entries:
+            overlap = len(query_terms & entry["terms"])
+            scored.append((entry["name"], overlap / math.sqrt(len(entry["terms"]) or 1)))
+        scored.sort(key=lambda x: x[1], reverse=True)
+        return scored
+
+    def _cached(self, key: Tuple, build) -> str:
+        with self._lock:
+            text = self._rendered_cache.get(key)
+        if text is None:
+            text = build()
+            with self._lock:
+                # 构建期间版本已变化时不写入，避免旧版本的文本留在缓存中
+                if key[0] == self._version:
+                    if len(self._rendered_cache) >= 256:
+                        self._rendered_cache.clear()
+                    self._rendered_cache[key] = text
+        return text
+
+    @staticmethod
+    def _fits(entries: List[Dict[str, Any]], token_budget: int, top_k: int) -> bool:
+        return len(entries) <= top_k and sum(e["tokens"] for e in entries) <= token_budget
+
+    def render(
+        self,
+        tool_schemas: List[dict],
+        query: Optional[str] = None,
+        token_budget: Optional[int] = None,
+        top_k: Optional[int] = None,
+        pinned: Iterable[str] = (),
+        version: Optional[str] = None
+    ) -> str:
+        """
+        渲染工具目录文本（未超出预算时为全部工具，否则为按请求选出的工具）。
+
+        Args:
+            tool_schemas: 工具schema列表。
+            query: 当前请求文本，用于超预算时的相关性排序。
+            token_budget: 工具目录的token上限，默认取 TOOL_PROMPT_TOKEN_BUDGET。
+            top_k: 最多保留的工具数，默认取 TOOL_PROMPT_TOP_K。
+            pinned: 必须保留的工具名（如任务中已指定的工具）。
+            version: 调用方已知的schema版本，不传时按内容哈希计算。
+        """
+        settings = get_settings()
+        token_budget = token_budget if token_budget is not None else settings.tool_prompt_token_budget
+        top_k = top_k if top_k is not None else settings.tool_prompt_top_k
+        version, entries = self._prepare(tool_schemas, version)
+        pinned = [name for name in pinned if name]
+
+        if self._fits(entries, token_budget, top_k):
+            selected = [e["name"] for e in entries]
+        else:
+            ranked = [name for name, _ in self.rank(tool_schemas, query or "", version)]
+            by_name = {e["name"]: e for e in entries}
+            chosen, used = [], 0
+            for name in pinned + ranked:
+                entry = by_name.get(name)
+                if entry is None or name in chosen:
+                    continue
+                if len(chosen) >= top_k or (chosen and used + entry["tokens"] > token_budget):
+                    if name in pinned:
+                        chosen.append(name)
+                        used += entry["tokens"]
+                    continue
+                chosen.append(name)
+                used += entry["tokens"]
+            chosen_set = set(chosen)
+            selected = [e["name"] for e in entries if e["name"] in chosen_set]
+
+        def build():
+            by_name = {e["name"]: e["text"] for e in entries}
+            return "\n\n".join(by_name[name] for name in selected)
+
+        return self._cached((version, "signatures", tuple(selected)), build)
+
+    def render_catalog(
+        self,
+        tool_schemas: List[dict],
+        token_budget: Optional[int] = None,
+        top_k: Optional[int] = None,
+        version: Optional[str] = None
+    ) -> str:
+        """
+        渲染只取决于schema版本的工具目录：未超出预算时为全部工具的精简签名，
+        否则为全部工具的名称与简介索引（每个工具一行）。
+        """
+        settings = get_settings()
+        token_budget = token_budget if token_budget is not None else settings.tool_prompt_token_budget
+        top_k = top_k if top_k is not None else settings.tool_prompt_top_k
+        version, entries = self._prepare(tool_schemas, version)
+        if self._fits(entries, token_budget, top_k):
+            return self._cached((version, "signatures", tuple(e["name"] for e in entries)),
+                                lambda: "\n\n".join(e["text"] for e in entries))
+        return self._cached((version, "index"), lambda: "\n".join(e["index"] for e in entries))
+
+    def render_split(
+        self,
+        tool_schemas: List[dict],
+        query: Optional[str] = None,
+        token_budget: Optional[int] = None,
+        top_k: Optional[int] = None,
+        pinned: Iterable[str] = (),
+        version: Optional[str] = None
+    ) -> Tuple[str, str]:
+        """
+        返回 (目录文本, 候选工具文本)：目录文本见 render_catalog，适合放入提示词的静态前缀；
+        目录超出预算时候选工具文本为按请求选出的工具的完整签名（见 render），否则为空字符串。
+        """
+        settings = get_settings()
+        token_budget = token_budget if token_budget is not None else settings.tool_prompt_token_budget
+        top_k = top_k if top_k is not None else settings.tool_prompt_top_k
+        version, entries = self._prepare(tool_schemas, version)
+        catalog = self.render_catalog(tool_schemas, token_budget, top_k, version)
+        if self._fits(entries, token_budget, top_k):
+            return catalog, ""
+        return catalog, self.render(tool_schemas, query, token_budget, top_k, pinned, version)
@@ -10,6 +10,7 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 's
 
 from config.settings import SQLALCHEMY_DATABASE_URL
 from models.agent_model import Base
+from database.checkpoint_models import Base as CheckpointBase
 
 # Alembic Config 对象
 config = context.config
@@ -17,7 +18,7 @@ config = context.config
 # 读取 alembic.ini 的配置
 fileConfig(config.config_file_name)
 
-target_metadata = Base.metadata
+target_metadata = [Base.metadata, CheckpointBase.metadata]
 
 def run_migrations_offline():
     url = SQLALCHEMY_DATABASE_URL
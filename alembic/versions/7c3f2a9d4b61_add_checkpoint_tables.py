@@ -0,0 +1,45 @@
+"""add run/task checkpoint tables
+
+Revision ID: 7c3f2a9d4b61
+Revises: 1e50b8c48ca1
+Create Date: 2026-10-19 09:12:03.418276
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c3f2a9d4b61'
+down_revision = '1e50b8c48ca1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('run_checkpoints',
+    sa.Column('run_id', sa.String(length=64), nullable=False),
+    sa.Column('blueprint', sa.JSON(), nullable=True),
+    sa.Column('status', sa.String(length=16), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('run_id')
+    )
+    op.create_table('task_checkpoints',
+    sa.Column('run_id', sa.String(length=64), nullable=False),
+    sa.Column('task_idx', sa.Integer(), nullable=False),
+    sa.Column('task', sa.JSON(), nullable=True),
+    sa.Column('status', sa.String(length=16), nullable=True),
+    sa.Column('result', sa.JSON(), nullable=True),
+    sa.Column('artifact_id', sa.String(length=64), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.Column('duration_seconds', sa.Float(), nullable=True),
+    sa.PrimaryKeyConstraint('run_id', 'task_idx')
+    )
+
+
+def downgrade():
+    op.drop_table('task_checkpoints')
+    op.drop_table('run_checkpoints')
@@ -30,6 +30,9 @@ class LLMConfig:
     max_retries_fallback: int = 1
     retry_delay_seconds: float = 1.0
     
+    # 并发配置（批量调用时的最大并发请求数）
+    max_concurrency: int = 8
+    
     # 内容过滤配置
     content_filter_error_code: str = "1301"
     content_filter_error_field: str = "contentFilter"
@@ -53,6 +56,8 @@ class LLMConfig:
             max_retries_primary=int(os.getenv('LLM_MAX_RETRIES_PRIMARY', '1')),
             max_retries_fallback=int(os.getenv('LLM_MAX_RETRIES_FALLBACK', '1')),
             retry_delay_seconds=float(os.getenv('LLM_RETRY_DELAY_SECONDS', '1.0')),
+            # 并发配置
+            max_concurrency=int(os.getenv('LLM_MAX_CONCURRENCY', '8')),
             # 内容过滤配置
             content_filter_error_code=os.getenv('LLM_CONTENT_FILTER_ERROR_CODE', '1301'),
             content_filter_error_field=os.getenv('LLM_CONTENT_FILTER_ERROR_FIELD', 'contentFilter')
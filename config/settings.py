@@ -23,6 +23,16 @@ class Settings:
     postgres_password: Optional[str] = os.getenv('POSTGRES_PASSWORD')
     postgres_sslmode: str = os.getenv('POSTGRES_SSLMODE', 'prefer')
     
+    # 数据库连接池配置：同步引擎（检查点、RAG、智能体加载等）使用 DB_POOL_SIZE/DB_MAX_OVERFLOW，
+    # MCP数据库工具的 asyncpg 异步引擎使用 DB_ASYNC_POOL_SIZE/DB_ASYNC_MAX_OVERFLOW（每个事件循环一个池）；
+    # 超时与回收时间两者共用
+    db_pool_size: int = int(os.getenv('DB_POOL_SIZE', '10'))
+    db_max_overflow: int = int(os.getenv('DB_MAX_OVERFLOW', '20'))
+    db_async_pool_size: int = int(os.getenv('DB_ASYNC_POOL_SIZE', '10'))
+    db_async_max_overflow: int = int(os.getenv('DB_ASYNC_MAX_OVERFLOW', '20'))
+    db_pool_timeout_seconds: float = float(os.getenv('DB_POOL_TIMEOUT_SECONDS', '30'))
+    db_pool_recycle_seconds: int = int(os.getenv('DB_POOL_RECYCLE_SECONDS', '1800'))
+    
     # LLM配置
     openai_api_key: Optional[str] = os.getenv('OPENAI_API_KEY')
     anthropic_api_key: Optional[str] = os.getenv('ANTHROPIC_API_KEY')
@@ -45,6 +55,119 @@ class Settings:
     # 日志配置
     log_level: str = os.getenv('LOG_LEVEL', 'INFO')
     
+    # LLM调用日志配置
+    llm_log_path: str = os.getenv('LLM_LOG_PATH', os.path.join(os.getcwd(), 'llm_calls.log'))
+    llm_log_max_bytes: int = int(os.getenv('LLM_LOG_MAX_BYTES', str(50 * 1024 * 1024)))
+    llm_log_backup_count: int = int(os.getenv('LLM_LOG_BACKUP_COUNT', '10'))
+    llm_log_rotate_interval_hours: float = float(os.getenv('LLM_LOG_ROTATE_INTERVAL_HOURS', '24'))
+    llm_log_compress: bool = os.getenv('LLM_LOG_COMPRESS', 'true').lower() == 'true'
+    llm_log_sample_rate: float = float(os.getenv('LLM_LOG_SAMPLE_RATE', '1.0'))
+    
+    # 提示词模板配置（按文件mtime自动重载，每次获取模板都会 stat 一次文件，默认关闭，开发时按需开启）
+    prompt_auto_reload: bool = os.getenv('PROMPT_AUTO_RELOAD', 'false').lower() == 'true'
+    
+    # 工具选择提示词配置（工具目录的token预算与最多保留的工具数）
+    tool_prompt_token_budget: int = int(os.getenv('TOOL_PROMPT_TOKEN_BUDGET', '2000'))
+    tool_prompt_top_k: int = int(os.getenv('TOOL_PROMPT_TOP_K', '20'))
+    
+    # 工具目录配置（过期后后台刷新；快照用于冷启动）
+    tool_catalog_ttl_seconds: float = float(os.getenv('TOOL_CATALOG_TTL_SECONDS', '300'))
+    tool_catalog_snapshot_path: Optional[str] = os.getenv('TOOL_CATALOG_SNAPSHOT_PATH', os.path.join(os.getcwd(), 'tool_catalog.json'))
+    
+    # 工具结果缓存配置（只缓存声明为幂等/只读的工具；缓存目录为空时只用内存）
+    tool_cache_enabled: bool = os.getenv('TOOL_CACHE_ENABLED', 'true').lower() == 'true'
+    tool_cache_dir: Optional[str] = os.getenv('TOOL_CACHE_DIR')
+    tool_cache_max_entries: int = int(os.getenv('TOOL_CACHE_MAX_ENTRIES', '1024'))
+    tool_cache_default_ttl_seconds: float = float(os.getenv('TOOL_CACHE_DEFAULT_TTL_SECONDS', '600'))
+    
+    # 上下文压缩（Orchestrator 重新规划时各提示词段落的token预算、LLM摘要缓存条数）
+    context_upstream_token_budget: int = int(os.getenv('CONTEXT_UPSTREAM_TOKEN_BUDGET', '6000'))
+    context_params_token_budget: int = int(os.getenv('CONTEXT_PARAMS_TOKEN_BUDGET', '1500'))
+    context_summary_cache_size: int = int(os.getenv('CONTEXT_SUMMARY_CACHE_SIZE', '256'))
+    
+    # 作业服务（python job_server.py：工作线程数、排队上限、保留的作业数、SSE心跳间隔、429时建议的重试秒数、停止时的优雅等待秒数）
+    # 作业服务没有鉴权，默认只监听本机；需要对外提供服务时显式设置 JOB_SERVER_HOST 并在前面加鉴权代理
+    job_server_host: str = os.getenv('JOB_SERVER_HOST', '127.0.0.1')
+    job_server_port: int = int(os.getenv('JOB_SERVER_PORT', '8090'))
+    job_workers: int = int(os.getenv('JOB_WORKERS', '4'))
+    job_queue_max: int = int(os.getenv('JOB_QUEUE_MAX', '100'))
+    job_retention: int = int(os.getenv('JOB_RETENTION', '1000'))
+    job_sse_heartbeat_seconds: float = float(os.getenv('JOB_SSE_HEARTBEAT_SECONDS', '15'))
+    job_retry_after_seconds: int = int(os.getenv('JOB_RETRY_AFTER_SECONDS', '5'))
+    job_server_graceful_timeout_seconds: int = int(os.getenv('JOB_SERVER_GRACEFUL_TIMEOUT_SECONDS', '30'))
+    # 作业是否流式孵化蓝图（任务一经生成即开始调度，关闭时等待完整蓝图后再调度）
+    job_stream_blueprint: bool = os.getenv('JOB_STREAM_BLUEPRINT', 'true').lower() == 'true'
+    
+    # 公平调度（LLM/MCP共享并发槽位数，0表示不限；权重格式 name:weight,...；低优先级运行在任务边界让出的最长秒数）
+    scheduler_llm_slots: int = int(os.getenv('SCHEDULER_LLM_SLOTS', '16'))
+    scheduler_mcp_slots: int = int(os.getenv('SCHEDULER_MCP_SLOTS', '32'))
+    scheduler_priority_weights: str = os.getenv('SCHEDULER_PRIORITY_WEIGHTS', 'interactive:8,normal:2,batch:1')
+    scheduler_tenant_weights: str = os.getenv('SCHEDULER_TENANT_WEIGHTS', '')
+    scheduler_default_priority: str = os.getenv('SCHEDULER_DEFAULT_PRIORITY', 'normal')
+    scheduler_preempt_max_wait_seconds: float = float(os.getenv('SCHEDULER_PREEMPT_MAX_WAIT_SECONDS', '30'))
+    
+    # 截止时间（整次运行与单个任务的时限、单次LLM/MCP调用超时，0表示不限；调用超时会按剩余时间收紧）
+    run_timeout_seconds: float = float(os.getenv('RUN_TIMEOUT_SECONDS', '0'))
+    task_timeout_seconds: float = float(os.getenv('TASK_TIMEOUT_SECONDS', '600'))
+    llm_call_timeout_seconds: float = float(os.getenv('LLM_CALL_TIMEOUT_SECONDS', '120'))
+    mcp_tool_call_timeout_seconds: float = float(os.getenv('MCP_TOOL_CALL_TIMEOUT_SECONDS', '60'))
+    
+    # 任务检查点（默认关闭；开启后每个任务的状态与结果异步写入，可用 Orchestrator.resume(run_id) 断点续跑；
+    # 数据库URL为空时使用 SQLALCHEMY_DATABASE_URL，表由 alembic 迁移创建）
+    checkpoint_enabled: bool = os.getenv('CHECKPOINT_ENABLED', 'false').lower() == 'true'
+    checkpoint_database_url: str = os.getenv('CHECKPOINT_DATABASE_URL', '')
+    
+    # 任务产物库（内存预算字节数、溢写目录、引用中的预览字符数、保留产物的最近运行数）
+    artifact_memory_bytes: int = int(os.getenv('ARTIFACT_MEMORY_BYTES', str(64 * 1024 * 1024)))
+    artifact_spill_dir: Optional[str] = os.getenv('ARTIFACT_SPILL_DIR')
+    artifact_preview_chars: int = int(os.getenv('ARTIFACT_PREVIEW_CHARS', '500'))
+    artifact_retained_runs: int = int(os.getenv('ARTIFACT_RETAINED_RUNS', '32'))
+    
+    # MCP客户端批量调用的最大并发数
+    mcp_batch_max_concurrency: int = int(os.getenv('MCP_BATCH_MAX_CONCURRENCY', '16'))
+    
+    # MCP服务配置（streamable-http 模式下的工作进程数、无状态会话、工具线程池与优雅停止超时）
+    mcp_server_host: str = os.getenv('MCP_SERVER_HOST', '0.0.0.0')
+    mcp_server_workers: int = int(os.getenv('MCP_SERVER_WORKERS', '1'))
+    mcp_server_stateless: bool = os.getenv('MCP_SERVER_STATELESS', 'true').lower() == 'true'
+    mcp_server_debug: bool = os.getenv('MCP_SERVER_DEBUG', 'false').lower() == 'true'
+    mcp_server_graceful_timeout_seconds: int = int(os.getenv('MCP_SERVER_GRACEFUL_TIMEOUT_SECONDS', '30'))
+    mcp_tool_slow_call_seconds: float = float(os.getenv('MCP_TOOL_SLOW_CALL_SECONDS', '5'))
+    mcp_tool_thread_pool_size: int = int(os.getenv('MCP_TOOL_THREAD_POOL_SIZE', str(min(32, (os.cpu_count() or 1) + 4))))
+    
+    # MCP HTTP工具配置（共享连接池、超时与响应体大小上限）
+    http_tool_timeout_seconds: float = float(os.getenv('HTTP_TOOL_TIMEOUT_SECONDS', '30'))
+    http_tool_connect_timeout_seconds: float = float(os.getenv('HTTP_TOOL_CONNECT_TIMEOUT_SECONDS', '10'))
+    http_tool_max_connections: int = int(os.getenv('HTTP_TOOL_MAX_CONNECTIONS', '100'))
+    http_tool_max_keepalive_connections: int = int(os.getenv('HTTP_TOOL_MAX_KEEPALIVE_CONNECTIONS', '20'))
+    http_tool_max_connections_per_host: int = int(os.getenv('HTTP_TOOL_MAX_CONNECTIONS_PER_HOST', '10'))
+    http_tool_max_response_bytes: int = int(os.getenv('HTTP_TOOL_MAX_RESPONSE_BYTES', str(5 * 1024 * 1024)))
+    
+    # MCP数据库工具配置（SELECT分页行数、单次查询行数上限）
+    db_tool_page_size: int = int(os.getenv('DB_TOOL_PAGE_SIZE', '200'))
+    db_tool_max_rows: int = int(os.getenv('DB_TOOL_MAX_ROWS', '10000'))
+    # 续页令牌携带查询与偏移量，不依赖进程内状态，多进程部署可直接使用；
+    # 代价是每页重新执行一次查询（LIMIT/OFFSET），无 ORDER BY 的查询各页之间顺序不保证稳定
+    db_tool_cursor_paging: bool = os.getenv('DB_TOOL_CURSOR_PAGING', 'true').lower() == 'true'
+    
+    # MCP文件工具配置（单次读取上限、超限时的预览大小、内存映射阈值、写缓冲大小）
+    file_tool_max_read_bytes: int = int(os.getenv('FILE_TOOL_MAX_READ_BYTES', str(1024 * 1024)))
+    file_tool_preview_bytes: int = int(os.getenv('FILE_TOOL_PREVIEW_BYTES', '4096'))
+    file_tool_mmap_threshold_bytes: int = int(os.getenv('FILE_TOOL_MMAP_THRESHOLD_BYTES', str(8 * 1024 * 1024)))
+    file_tool_write_buffer_bytes: int = int(os.getenv('FILE_TOOL_WRITE_BUFFER_BYTES', str(1024 * 1024)))
+    
+    # 工具路由配置（语义模型为空时使用哈希向量化；相似度达到阈值且领先第二名足够多时跳过LLM工具选择）
+    tool_router_model: Optional[str] = os.getenv('TOOL_ROUTER_MODEL')
+    tool_router_threshold: float = float(os.getenv('TOOL_ROUTER_THRESHOLD', '0.6'))
+    tool_router_margin: float = float(os.getenv('TOOL_ROUTER_MARGIN', '0.1'))
+    tool_router_shortlist_k: int = int(os.getenv('TOOL_ROUTER_SHORTLIST_K', '5'))
+    
+    # 遥测配置
+    telemetry_export_dir: Optional[str] = os.getenv('TELEMETRY_EXPORT_DIR')
+    telemetry_otlp_endpoint: Optional[str] = os.getenv('TELEMETRY_OTLP_ENDPOINT')
+    telemetry_metrics_port: int = int(os.getenv('TELEMETRY_METRICS_PORT', '0'))
+    telemetry_metrics_host: str = os.getenv('TELEMETRY_METRICS_HOST', '127.0.0.1')
+    
     # RAG配置
     rag_model_name: str = os.getenv('RAG_MODEL_NAME', 'Qwen/Qwen3-Embedding-0.6B')
     rag_vector_dim: int = int(os.getenv('RAG_VECTOR_DIM', '1024'))
@@ -66,6 +189,14 @@ class Settings:
             f"@{self.postgres_host}:{self.postgres_port}/{self.postgres_db}"
             f"?sslmode={self.postgres_sslmode}"
         )
+    
+    @property
+    def sqlalchemy_async_database_url(self) -> str:
+        """获取异步数据库URL（asyncpg，SSL模式通过连接参数传入）"""
+        return (
+            f"postgresql+asyncpg://{self.postgres_user}:{self.postgres_password}"
+            f"@{self.postgres_host}:{self.postgres_port}/{self.postgres_db}"
+        )
 
 
 # 全局设置实例
@@ -1,12 +1,12 @@
 import json
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 from sqlalchemy.orm import sessionmaker
 from models.agent_model import AgentModel, Base
 from agents import (
     CoordinatorAgent, ResearchAgent, AnalysisAgent,
     ToolAgent, CommunicationAgent, ExecutionAgent, MonitorAgent
 )
-from config.settings import SQLALCHEMY_DATABASE_URL
+from database.engine import get_engine
 
 # 智能体类型与类的映射
 AGENT_CLASS_MAP = {
@@ -19,8 +19,8 @@ AGENT_CLASS_MAP = {
     'monitor': MonitorAgent,
 }
 
-# 创建数据库引擎和会话
-engine = create_engine(SQLALCHEMY_DATABASE_URL, echo=False)
+# 使用共享数据库引擎创建会话
+engine = get_engine()
 SessionLocal = sessionmaker(bind=engine)
 
 def init_db():
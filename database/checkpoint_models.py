@@ -0,0 +1,26 @@
+from sqlalchemy import Column, String, Text, DateTime, Integer, Float, JSON
+from sqlalchemy.orm import declarative_base
+from datetime import datetime
+
+Base = declarative_base()
+
+class RunCheckpointORM(Base):
+    __tablename__ = 'run_checkpoints'
+    run_id = Column(String(64), primary_key=True)
+    blueprint = Column(JSON)  # 除 tasks 外的蓝图字段，任务逐条记录在 task_checkpoints
+    status = Column(String(16))  # running / completed / partial（部分任务失败）/ failed
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class TaskCheckpointORM(Base):
+    __tablename__ = 'task_checkpoints'
+    run_id = Column(String(64), primary_key=True)
+    task_idx = Column(Integer, primary_key=True)
+    task = Column(JSON)
+    status = Column(String(16))  # pending / running / completed / failed
+    result = Column(JSON)  # 任务结果（恢复时重新发布到产物库）
+    artifact_id = Column(String(64))
+    error = Column(Text)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    duration_seconds = Column(Float)
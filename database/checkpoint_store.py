@@ -0,0 +1,156 @@
+"""
+任务检查点存储
+Orchestrator.dispatch 的每个任务（任务定义、状态、结果、耗时）写入 SQLite/Postgres，
+写入由后台线程异步完成，不阻塞任务执行；运行中断后可按 run_id 读取检查点并跳过已完成的任务。
+"""
+
+import atexit
+import json
+import queue
+import threading
+from typing import Any, Dict, Optional
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import sessionmaker
+
+from config.settings import get_settings
+from database.checkpoint_models import Base, RunCheckpointORM, TaskCheckpointORM
+from database.engine import get_engine
+
+_STOP = object()
+
+
+def _to_json(value: Any) -> Any:
+    """转换为可写入JSON列的结构，无法序列化的对象转为字符串"""
+    return json.loads(json.dumps(value, ensure_ascii=False, default=str))
+
+
+class CheckpointStore:
+    """
+    检查点存储。
+
+    save_run / save_task 只把写操作放入队列，由后台线程按顺序写库；
+    load_run 读取前会先等待队列中已提交的写操作落库。
+    检查点表由 alembic 迁移创建（alembic upgrade head），表不存在时抛出 RuntimeError。
+    """
+
+    def __init__(self, db_url: Optional[str] = None):
+        self.engine = get_engine(db_url or get_settings().checkpoint_database_url or None)
+        missing = {t.name for t in Base.metadata.sorted_tables} - set(inspect(self.engine).get_table_names())
+        if missing:
+            raise RuntimeError(f"检查点表 {', '.join(sorted(missing))} 不存在，请先执行 alembic upgrade head")
+        self.Session = sessionmaker(bind=self.engine, expire_on_commit=False)
+        self._queue: queue.Queue = queue.Queue()
+        self._thread = threading.Thread(target=self._worker, name="checkpoint-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def save_run(self, run_id: str, blueprint: Optional[dict] = None, status: str = "running"):
+        """记录运行（blueprint 不含 tasks 字段）"""
+        self._queue.put(("run", run_id, {"blueprint": _to_json(blueprint) if blueprint is not None else None, "status": status}))
+
+    def save_task(self, run_id: str, task_idx: int, **fields):
+        """记录任务检查点，fields 为 TaskCheckpointORM 的列（task/status/result/artifact_id/error/started_at/finished_at/duration_seconds）"""
+        for key in ("task", "result"):
+            if key in fields:
+                fields[key] = _to_json(fields[key])
+        self._queue.put(("task", (run_id, task_idx), fields))
+
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is _STOP:
+                    return
+                self._write(*item)
+            except Exception as e:
+                print(f"[检查点] 写入失败: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _write(self, kind: str, key, fields: Dict[str, Any]):
+        session = self.Session()
+        try:
+            if kind == "run":
+                row = session.get(RunCheckpointORM, key)
+                if row is None:
+                    row = RunCheckpointORM(run_id=key)
+                    session.add(row)
+                if fields.get("blueprint") is None:
+                    fields.pop("blueprint", None)
+            else:
+                row = session.get(TaskCheckpointORM, key)
+                if row is None:
+                    row = TaskCheckpointORM(run_id=key[0], task_idx=key[1])
+                    session.add(row)
+            for name, value in fields.items():
+                setattr(row, name, value)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def flush(self):
+        """等待已提交的写操作全部落库"""
+        self._queue.join()
+
+    def load_run(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """读取运行及其全部任务检查点（按任务序号排序），不存在时返回 None"""
+        self.flush()
+        session = self.Session()
+        try:
+            run = session.get(RunCheckpointORM, run_id)
+            if run is None:
+                return None
+            tasks = (
+                session.query(TaskCheckpointORM)
+                .filter_by(run_id=run_id)
+                .order_by(TaskCheckpointORM.task_idx)
+                .all()
+            )
+            return {
+                "run_id": run.run_id,
+                "blueprint": run.blueprint or {},
+                "status": run.status,
+                "tasks": [
+                    {
+                        "task_idx": t.task_idx,
+                        "task": t.task,
+                        "status": t.status,
+                        "result": t.result,
+                        "artifact_id": t.artifact_id,
+                        "error": t.error,
+                        "started_at": t.started_at,
+                        "finished_at": t.finished_at,
+                        "duration_seconds": t.duration_seconds,
+                    }
+                    for t in tasks
+                ],
+            }
+        finally:
+            session.close()
+
+    def close(self):
+        """写完队列中剩余的检查点并停止后台线程"""
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+
+
+_store: Optional[CheckpointStore] = None
+_store_lock = threading.Lock()
+
+
+def get_checkpoint_store() -> CheckpointStore:
+    """获取全局检查点存储（CHECKPOINT_DATABASE_URL，为空时使用 SQLALCHEMY_DATABASE_URL）"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = CheckpointStore()
+    return _store
+
+
+__all__ = ["CheckpointStore", "get_checkpoint_store"]
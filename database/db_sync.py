@@ -1,13 +1,13 @@
-from sqlalchemy import create_engine, text, inspect
+from sqlalchemy import text, inspect
 from sqlalchemy.orm import sessionmaker
 from models.agent_model import Base, AgentModel
-from config.settings import SQLALCHEMY_DATABASE_URL
+from database.engine import get_engine
 
 class DatabaseSync:
     """数据库结构同步管理器"""
     
     def __init__(self):
-        self.engine = create_engine(SQLALCHEMY_DATABASE_URL, echo=False)
+        self.engine = get_engine()
         self.SessionLocal = sessionmaker(bind=self.engine)
     
     def sync_database(self):
@@ -0,0 +1,73 @@
+"""
+共享数据库引擎
+同步代码（检查点、RAG、智能体加载、数据同步）共用 get_engine() 的按URL复用的连接池；
+异步代码（MCP数据库工具）使用基于 asyncpg 的 get_async_engine()，避免阻塞事件循环。
+同步与异步驱动无法共用连接，两类引擎是各自独立的连接池，池大小分别由
+DB_POOL_SIZE/DB_MAX_OVERFLOW 与 DB_ASYNC_POOL_SIZE/DB_ASYNC_MAX_OVERFLOW 配置。
+"""
+
+import asyncio
+import threading
+import weakref
+from typing import Dict, Optional
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+
+from config.settings import get_settings
+
+_engines: Dict[str, Engine] = {}
+_engines_lock = threading.Lock()
+# 异步引擎的连接与事件循环绑定，每个事件循环一个
+_async_engines: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, object]" = weakref.WeakKeyDictionary()
+
+
+def _pool_options(async_engine: bool = False) -> dict:
+    settings = get_settings()
+    return {
+        "pool_size": settings.db_async_pool_size if async_engine else settings.db_pool_size,
+        "max_overflow": settings.db_async_max_overflow if async_engine else settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout_seconds,
+        "pool_recycle": settings.db_pool_recycle_seconds,
+        "pool_pre_ping": True,
+    }
+
+
+def get_engine(db_url: Optional[str] = None) -> Engine:
+    """获取共享的同步引擎（按URL复用），默认使用 SQLALCHEMY_DATABASE_URL"""
+    db_url = db_url or get_settings().sqlalchemy_database_url
+    engine = _engines.get(db_url)
+    if engine is None:
+        with _engines_lock:
+            engine = _engines.get(db_url)
+            if engine is None:
+                engine = create_engine(db_url, echo=False, future=True, **_pool_options())
+                _engines[db_url] = engine
+    return engine
+
+
+def get_async_engine():
+    """获取当前事件循环上的共享异步引擎（postgresql+asyncpg）"""
+    from sqlalchemy.ext.asyncio import create_async_engine
+    loop = asyncio.get_running_loop()
+    engine = _async_engines.get(loop)
+    if engine is None:
+        settings = get_settings()
+        engine = create_async_engine(
+            settings.sqlalchemy_async_database_url,
+            echo=False,
+            connect_args={"ssl": settings.postgres_sslmode},
+            **_pool_options(async_engine=True)
+        )
+        _async_engines[loop] = engine
+    return engine
+
+
+async def dispose_async_engine():
+    """释放当前事件循环上的异步连接池（服务停止时调用）"""
+    engine = _async_engines.pop(asyncio.get_running_loop(), None)
+    if engine is not None:
+        await engine.dispose()
+
+
+__all__ = ["get_engine", "get_async_engine", "dispose_async_engine"]
@@ -1,5 +1,5 @@
-from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from database.engine import get_engine
 from database.rag_models import Base, DocumentORM, VectorORM
 from config.settings import SQLALCHEMY_DATABASE_URL, RAG_MODEL_NAME, RAG_MAX_TOKENS, RAG_DEVICE, USE_GPU, DATABASE_URL
 from tools.rag_types import VectorStore, Document
@@ -11,7 +11,7 @@ from typing import List, Tuple, Optional
 class DBVectorStore(VectorStore):
     """数据库向量存储实现，支持Qwen embedding"""
     def __init__(self, db_url=SQLALCHEMY_DATABASE_URL):
-        self.engine = create_engine(db_url, future=True)
+        self.engine = get_engine(db_url)
         Base.metadata.create_all(self.engine)
         self.Session = sessionmaker(bind=self.engine, expire_on_commit=False)
         # 加载Qwen embedding模型
@@ -100,7 +100,7 @@ class DBVectorStore(VectorStore):
 
 class DBVectorStoreSync:
     def __init__(self):
-        self.engine = create_engine(DATABASE_URL, echo=False)
+        self.engine = get_engine(DATABASE_URL)
         self.Session = sessionmaker(bind=self.engine)
 
     def sync_database(self):
@@ -12,8 +12,10 @@ from agents.guilds.finance_guild import FinanceGuild
 from agents.guilds.industry_guild import IndustryGuild
 from agents.guilds.audit_guild import AuditGuild
 from agents.guilds.report_guild import ReportGuild
+from agents.utils import telemetry
 
 if __name__ == "__main__":
+    telemetry.start_metrics_server()  # 配置了 TELEMETRY_METRICS_PORT 时暴露本地 /metrics
     # 1. 初始化元治理智能体
     meta = MetaAgent(auto_register_all=True)
     tool_collective = meta.get_tool_collective()
@@ -44,4 +46,5 @@ if __name__ == "__main__":
 
     # 7. 调度分发
     result = orchestrator.dispatch(task_blueprint)
-    print("最终结果：", result) 
\ No newline at end of file
+    # 各任务结果为产物引用，打印前取回完整内容
+    print("最终结果：", orchestrator.materialize(result)) 
\ No newline at end of file
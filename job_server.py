@@ -0,0 +1,136 @@
+import json
+import click
+from contextlib import asynccontextmanager
+from config.settings import get_settings
+
+# 作业服务：HTTP 接收用户输入并排队，由工作池执行任务孵化与调度
+# POST /jobs 提交作业（可选 tenant 与 priority，决定排队与LLM/MCP共享槽位的公平份额），GET /jobs/{id} 查询状态与结果，GET /jobs/{id}/events 以SSE推送运行事件，
+# GET /jobs/{id}/artifacts/{artifact_id} 按 path/offset/limit 读取结果中引用的产物，
+# DELETE /jobs/{id} 取消作业，GET /metrics 输出队列指标
+
+
+def create_app(manager=None):
+    """Starlette 应用工厂；manager 为空时在启动时创建智能体社会和 JobManager"""
+    from starlette.applications import Starlette
+    from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+    from starlette.routing import Route
+    from agents.job_manager import JobManager, QueueFullError, build_society
+    from agents.utils import telemetry
+
+    settings = get_settings()
+    state = {"manager": manager}
+
+    @asynccontextmanager
+    async def lifespan(app):
+        telemetry.start_metrics_server()  # 配置了 TELEMETRY_METRICS_PORT 时暴露本地 /metrics
+        if state["manager"] is None:
+            state["manager"] = JobManager(build_society())
+        await state["manager"].start()
+        try:
+            yield
+        finally:
+            await state["manager"].stop()
+
+    async def submit_job(request):
+        try:
+            body = await request.json()
+        except ValueError:
+            return JSONResponse({"error": "请求体必须是JSON"}, status_code=400)
+        user_input = body.get("input") if isinstance(body, dict) else None
+        if not user_input:
+            return JSONResponse({"error": "缺少input字段"}, status_code=400)
+        try:
+            job = state["manager"].submit(user_input, tenant=body.get("tenant"), priority=body.get("priority"))
+        except ValueError as e:
+            return JSONResponse({"error": str(e)}, status_code=400)
+        except QueueFullError as e:
+            # 准入控制：队列已满时直接拒绝，由调用方稍后重试
+            return JSONResponse({"error": str(e)}, status_code=429,
+                                headers={"Retry-After": str(settings.job_retry_after_seconds)})
+        return JSONResponse(job.to_dict(), status_code=202, headers={"Location": f"/jobs/{job.job_id}"})
+
+    async def get_job(request):
+        job = state["manager"].get(request.path_params["job_id"])
+        if job is None:
+            return JSONResponse({"error": "作业不存在"}, status_code=404)
+        return JSONResponse(job.to_dict())
+
+    async def cancel_job(request):
+        job = state["manager"].cancel(request.path_params["job_id"])
+        if job is None:
+            return JSONResponse({"error": "作业不存在"}, status_code=404)
+        return JSONResponse(job.to_dict(include_result=False), status_code=202)
+
+    async def job_events(request):
+        job = state["manager"].get(request.path_params["job_id"])
+        if job is None:
+            return JSONResponse({"error": "作业不存在"}, status_code=404)
+
+        async def stream():
+            async for event in state["manager"].iter_events(job):
+                if event is None:
+                    yield ": heartbeat\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False, default=str)}\n\n"
+            yield f"event: end\ndata: {json.dumps(job.to_dict(), ensure_ascii=False, default=str)}\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream",
+                                 headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+    async def job_artifact(request):
+        job = state["manager"].get(request.path_params["job_id"])
+        if job is None:
+            return JSONResponse({"error": "作业不存在"}, status_code=404)
+        query = request.query_params
+        try:
+            offset = int(query.get("offset", 0))
+            limit = int(query["limit"]) if "limit" in query else None
+        except ValueError:
+            return JSONResponse({"error": "offset/limit 必须是整数"}, status_code=400)
+        try:
+            value = state["manager"].artifact(job, request.path_params["artifact_id"], query.get("path"), offset, limit)
+        except (KeyError, IndexError, ValueError):
+            return JSONResponse({"error": "产物不存在、已释放或路径无效"}, status_code=404)
+        return JSONResponse({"artifact_id": request.path_params["artifact_id"], "value": value})
+
+    async def metrics(request):
+        return PlainTextResponse(state["manager"].render_prometheus(), media_type="text/plain; version=0.0.4")
+
+    return Starlette(
+        routes=[
+            Route("/jobs", endpoint=submit_job, methods=["POST"]),
+            Route("/jobs/{job_id}", endpoint=get_job, methods=["GET"]),
+            Route("/jobs/{job_id}", endpoint=cancel_job, methods=["DELETE"]),
+            Route("/jobs/{job_id}/events", endpoint=job_events, methods=["GET"]),
+            Route("/jobs/{job_id}/artifacts/{artifact_id}", endpoint=job_artifact, methods=["GET"]),
+            Route("/metrics", endpoint=metrics, methods=["GET"]),
+        ],
+        lifespan=lifespan,
+    )
+
+
+@click.command()
+@click.option("--host", default=None, help="Host to bind, defaults to JOB_SERVER_HOST (127.0.0.1)")
+@click.option("--port", default=None, type=int, help="Port to listen on, defaults to JOB_SERVER_PORT")
+def main(host: str, port: int) -> int:
+    import uvicorn
+
+    settings = get_settings()
+    host = host or settings.job_server_host
+    print("==============================")
+    print("作业服务即将启动！")
+    print("==============================")
+    if host not in ("127.0.0.1", "localhost", "::1"):
+        print(f"警告：作业服务没有鉴权，正在监听 {host}，任何能访问该地址的客户端都可以提交和取消作业")
+    # 作业状态保存在进程内存中，单进程运行；并发度由 JOB_WORKERS 控制
+    uvicorn.run(
+        "job_server:create_app",
+        factory=True,
+        host=host,
+        port=port or settings.job_server_port,
+        timeout_graceful_shutdown=settings.job_server_graceful_timeout_seconds,
+    )
+    return 0
+
+if __name__ == "__main__":
+    main()
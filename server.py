@@ -1,6 +1,8 @@
-import anyio
+import os
 import click
-from tools.mcp import mcp
+from contextlib import asynccontextmanager
+from tools.mcp import mcp, get_tool_executor, shutdown_tool_executor
+from config.settings import get_settings
 
 # 只需import所有工具模块，确保装饰器注册生效
 import tools.mcp.google_news_search
@@ -10,54 +12,138 @@ import tools.mcp.database_operation
 
 # 不要在本文件再创建mcp实例，确保全局唯一
 
+
+async def handle_metrics(request):
+    """Prometheus 文本格式的工具指标（本工作进程）"""
+    from starlette.responses import PlainTextResponse
+    from tools.mcp.tool_metrics import tool_metrics
+    return PlainTextResponse(tool_metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+@asynccontextmanager
+async def _tool_runtime():
+    """工作进程内的工具运行环境：启动时设置线程池，停止时等待进行中的工具完成并释放连接池"""
+    import asyncio
+    asyncio.get_running_loop().set_default_executor(get_tool_executor())
+    try:
+        yield
+    finally:
+        from tools.mcp.http_client import close_http_client
+        from database.engine import dispose_async_engine
+        await close_http_client()
+        try:
+            await dispose_async_engine()
+        except Exception as e:
+            print(f'[MCP] 释放数据库连接池异常: {e}')
+        # uvicorn 已等进行中的请求结束（timeout_graceful_shutdown），此处只需回收线程池
+        shutdown_tool_executor(wait=True)
+
+
+def _create_sse_app(debug: bool):
+    from mcp.server.sse import SseServerTransport
+    from starlette.applications import Starlette
+    from starlette.responses import Response
+    from starlette.routing import Mount, Route
+
+    sse = SseServerTransport("/messages/")
+
+    async def handle_sse(request):
+        try:
+            async with sse.connect_sse(
+                request.scope, request.receive, request._send
+            ) as streams:
+                await mcp._mcp_server.run(
+                    streams[0], streams[1], mcp._mcp_server.create_initialization_options(),
+                )
+        except (GeneratorExit, RuntimeError) as e:
+            print(f'[SSE] 流关闭异常: {e}')
+        return Response()
+
+    @asynccontextmanager
+    async def lifespan(app):
+        async with _tool_runtime():
+            yield
+
+    return Starlette(
+        debug=debug,
+        routes=[
+            Route("/sse", endpoint=handle_sse, methods=["GET", "POST"]),
+            Route("/metrics", endpoint=handle_metrics, methods=["GET"]),
+            Mount("/messages/", app=sse.handle_post_message),
+        ],
+        lifespan=lifespan,
+    )
+
+
+def _create_streamable_http_app(debug: bool):
+    """
+    streamable-http 传输。无状态模式下每个请求自带完整上下文，MCP会话不依赖进程内状态；
+    database_execute_sql 的续页令牌同样自带查询与偏移量，可由任一工作进程处理。
+    """
+    from starlette.applications import Starlette
+    from starlette.routing import Route
+
+    settings = get_settings()
+    mcp.settings.stateless_http = settings.mcp_server_stateless
+    inner = mcp.streamable_http_app()
+
+    @asynccontextmanager
+    async def lifespan(app):
+        async with _tool_runtime(), inner.router.lifespan_context(inner):
+            yield
+
+    routes = list(inner.routes) + [Route("/metrics", endpoint=handle_metrics, methods=["GET"])]
+    return Starlette(debug=debug, routes=routes, lifespan=lifespan)
+
+
+def create_app():
+    """uvicorn 应用工厂，每个工作进程各自调用一次；传输方式由 MCP_SERVER_TRANSPORT 决定"""
+    settings = get_settings()
+    transport = os.getenv("MCP_SERVER_TRANSPORT", "sse")
+    if transport == "streamable-http":
+        return _create_streamable_http_app(settings.mcp_server_debug)
+    return _create_sse_app(settings.mcp_server_debug)
+
+
 @click.command()
 @click.option("--port", default=8080, help="Port to listen on for SSE")
 @click.option(
     "--transport",
-    type=click.Choice(["stdio", "sse"]),
+    type=click.Choice(["stdio", "sse", "streamable-http"]),
     default="sse",
     help="Transport type",
 )
-def main(port: int, transport: str) -> int:
+@click.option("--host", default=None, help="Host to bind, defaults to MCP_SERVER_HOST")
+@click.option("--workers", default=None, type=int, help="Worker processes, defaults to MCP_SERVER_WORKERS")
+def main(port: int, transport: str, host: str, workers: int) -> int:
     print("==============================")
     print("MCP服务即将启动！")
     print("==============================")
 
-    if transport == "sse":
-        from mcp.server.sse import SseServerTransport
-        from starlette.applications import Starlette
-        from starlette.responses import Response
-        from starlette.routing import Mount, Route
-        import uvicorn
-
-        sse = SseServerTransport("/messages/")
-
-        async def handle_sse(request):
-            try:
-                async with sse.connect_sse(
-                    request.scope, request.receive, request._send
-                ) as streams:
-                    await mcp._mcp_server.run(
-                        streams[0], streams[1], mcp._mcp_server.create_initialization_options(),
-                    )
-            except (GeneratorExit, RuntimeError) as e:
-                print(f'[SSE] 流关闭异常: {e}')
-            return Response()
-
-        starlette_app = Starlette(
-            debug=True,
-            routes=[
-                Route("/sse", endpoint=handle_sse, methods=["GET", "POST"]),
-                Mount("/messages/", app=sse.handle_post_message),
-            ],
-        )
-
-        uvicorn.run(starlette_app, host="0.0.0.0", port=port)
-    else:
+    if transport == "stdio":
         # STDIO模式直接用FastMCP同步run方法
         mcp.run("stdio")
+        return 0
+
+    import uvicorn
 
+    settings = get_settings()
+    workers = workers or settings.mcp_server_workers
+    if transport == "sse" and workers > 1:
+        # SSE 的 /messages/ 回调依赖建立连接的进程内会话，多进程下无法保证落到同一进程
+        print("[MCP] SSE传输不支持多工作进程，已改为单进程；多进程请使用 --transport streamable-http")
+        workers = 1
+    # 工作进程通过应用工厂各自创建应用，传输方式经环境变量传递
+    os.environ["MCP_SERVER_TRANSPORT"] = transport
+    uvicorn.run(
+        "server:create_app",
+        factory=True,
+        host=host or settings.mcp_server_host,
+        port=port,
+        workers=workers,
+        timeout_graceful_shutdown=settings.mcp_server_graceful_timeout_seconds,
+    )
     return 0
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,60 @@
+import os
+
+import pytest
+
+from agents.utils.artifact_store import ArtifactStore
+
+
+def make_store(tmp_path, **kwargs):
+    kwargs.setdefault("max_memory_bytes", 1 << 20)
+    return ArtifactStore(spill_dir=str(tmp_path), preview_chars=20, **kwargs)
+
+
+def test_put_dedupes_and_slices(tmp_path):
+    store = make_store(tmp_path)
+    a = store.put({"items": [{"title": "x"}, {"title": "y"}]}, label="a", owner="run")
+    b = store.put({"items": [{"title": "x"}, {"title": "y"}]}, label="b", owner="run")
+    assert a.artifact_id == b.artifact_id and b.label == "b"
+    assert store.slice(a, "items.1.title") == "y"
+    assert store.slice(a, "items", offset=1, limit=1) == [{"title": "y"}]
+
+
+def test_spilled_artifacts_are_reloaded(tmp_path):
+    store = make_store(tmp_path, max_memory_bytes=64)
+    first = store.put("a" * 100, owner="run")
+    store.put("b" * 100, owner="run")
+    assert store.memory_bytes <= 200
+    assert os.path.exists(os.path.join(str(tmp_path), f"{first.artifact_id}.json"))
+    assert store.get(first) == "a" * 100
+
+
+def test_release_drops_handles_payloads_and_spill_files(tmp_path):
+    store = make_store(tmp_path, max_memory_bytes=64)
+    first = store.put("a" * 100, owner="run-1")
+    second = store.put("b" * 100, owner="run-1")
+    store.release("run-1")
+    assert store.handles() == [] and store.memory_bytes == 0
+    assert os.listdir(str(tmp_path)) == []
+    for handle in (first, second):
+        with pytest.raises(KeyError):
+            store.get(handle)
+
+
+def test_shared_artifacts_survive_until_last_owner(tmp_path):
+    store = make_store(tmp_path)
+    handle = store.put({"v": 1}, owner="run-1")
+    store.put({"v": 1}, owner="run-2")
+    store.release("run-1")
+    assert store.get(handle) == {"v": 1}
+    store.release("run-2")
+    with pytest.raises(KeyError):
+        store.get(handle)
+
+
+def test_oldest_runs_are_released_beyond_limit(tmp_path):
+    store = make_store(tmp_path, max_owners=2)
+    handles = [store.put({"run": i}, owner=f"run-{i}") for i in range(3)]
+    with pytest.raises(KeyError):
+        store.get(handles[0])
+    assert [store.get(h) for h in handles[1:]] == [{"run": 1}, {"run": 2}]
+    assert len(store.handles()) == 2
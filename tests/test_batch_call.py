@@ -0,0 +1,77 @@
+import asyncio
+import json
+import re
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from agents.utils.llm_helper import LLMHelper
+
+_QUESTION = re.compile(r"### 问题 \d+\n(.*?)(?=\n\n### 问题|\n\n请严格按照)", re.S)
+
+
+class FakeLLM:
+    """只替换 async_call 的 LLMHelper 替身，记录实际发出的请求"""
+
+    async_batch_call = LLMHelper.async_batch_call
+    batch_call = LLMHelper.batch_call
+    _run_sync = LLMHelper._run_sync
+    parse_code_block_response = LLMHelper.parse_code_block_response
+
+    def __init__(self, max_concurrency=8, drop_answer=False, delays=None):
+        self.config = SimpleNamespace(max_concurrency=max_concurrency)
+        self.drop_answer = drop_answer
+        self.delays = delays or {}
+        self.requests = []
+        self.active = 0
+        self.peak = 0
+
+    async def async_call(self, prompt, system_prompt=None, max_tokens=None, temperature=None):
+        questions = _QUESTION.findall(prompt)
+        self.requests.append(questions or prompt)
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delays.get(prompt, 0.01))
+        finally:
+            self.active -= 1
+        if not questions:
+            return f"A:{prompt}"
+        answers = [f"A:{q}" for q in questions]
+        if self.drop_answer:
+            answers = answers[:-1]
+        return "```json\n" + json.dumps({"answers": answers}, ensure_ascii=False) + "\n```"
+
+
+def test_short_prompts_are_packed_in_input_order():
+    llm = FakeLLM()
+    prompts = [f"q{i}" for i in range(5)]
+    assert llm.batch_call(prompts, pack_size=2) == [f"A:q{i}" for i in range(5)]
+    # 每组按输入顺序合并，不足一组的最后一条单独发出
+    assert llm.requests == [["q0", "q1"], ["q2", "q3"], "q4"]
+
+
+def test_long_prompts_are_sent_alone_without_breaking_groups():
+    llm = FakeLLM()
+    prompts = ["q0", "x" * 20, "q2", "q3"]
+    results = llm.batch_call(prompts, pack_size=2, pack_max_chars=10)
+    assert results == [f"A:{p}" for p in prompts]
+    # 超长提示词不占组内位置，q0 与 q2 仍合并为一组
+    assert llm.requests == ["x" * 20, ["q0", "q2"], "q3"]
+
+
+def test_mismatched_answers_fall_back_to_single_calls():
+    llm = FakeLLM(drop_answer=True)
+    prompts = ["q0", "q1", "q2"]
+    assert llm.batch_call(prompts, pack_size=3) == ["A:q0", "A:q1", "A:q2"]
+    assert llm.requests[0] == prompts
+    assert sorted(llm.requests[1:]) == prompts
+
+
+def test_results_keep_input_order_and_concurrency_is_bounded():
+    llm = FakeLLM(max_concurrency=2, delays={"slow": 0.1})
+    prompts = ["slow", "a", "b", "c", "d"]
+    assert llm.batch_call(prompts) == [f"A:{p}" for p in prompts]
+    assert llm.peak == 2
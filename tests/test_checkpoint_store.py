@@ -0,0 +1,142 @@
+import datetime
+import threading
+
+import pytest
+
+from database.checkpoint_models import Base
+from database.checkpoint_store import CheckpointStore
+from database.engine import get_engine
+
+
+@pytest.fixture
+def store(tmp_path):
+    url = f"sqlite:///{tmp_path / 'checkpoints.db'}"
+    # 生产环境由 alembic 迁移建表
+    Base.metadata.create_all(get_engine(url))
+    store = CheckpointStore(url)
+    yield store
+    store.close()
+
+
+def test_missing_tables_are_reported(tmp_path):
+    with pytest.raises(RuntimeError, match="alembic upgrade head"):
+        CheckpointStore(f"sqlite:///{tmp_path / 'empty.db'}")
+
+
+def test_run_and_task_round_trip(store):
+    started_at = datetime.datetime(2024, 1, 1, 8, 0, 0)
+    store.save_run("run", {"name": "研报", "priority": "normal"})
+    store.save_task("run", 1, task={"intent": "ChartGuild"}, status="running", started_at=started_at)
+    store.save_task("run", 0, task={"intent": "DataCrawlGuild"}, status="running", started_at=started_at)
+    store.save_task("run", 0, status="completed", result={"news": ["a", "b"]}, artifact_id="abc", duration_seconds=1.5)
+    store.save_task("run", 1, status="failed", error="超时")
+    store.save_run("run", status="completed")
+
+    saved = store.load_run("run")
+    assert saved["blueprint"] == {"name": "研报", "priority": "normal"}
+    assert saved["status"] == "completed"
+    first, second = saved["tasks"]
+    assert first["task_idx"] == 0 and first["status"] == "completed"
+    assert first["task"] == {"intent": "DataCrawlGuild"}
+    assert first["result"] == {"news": ["a", "b"]} and first["artifact_id"] == "abc"
+    assert first["started_at"] == started_at and first["duration_seconds"] == 1.5
+    assert second["status"] == "failed" and second["error"] == "超时"
+
+
+def test_unserializable_values_are_stringified(store):
+    store.save_run("run", {"when": datetime.date(2024, 1, 1)})
+    store.save_task("run", 0, task={"intent": "X"}, status="completed", result={"obj": object()})
+    saved = store.load_run("run")
+    assert saved["blueprint"] == {"when": "2024-01-01"}
+    assert isinstance(saved["tasks"][0]["result"]["obj"], str)
+
+
+def test_missing_run_returns_none(store):
+    assert store.load_run("missing") is None
+
+
+class _Crash(BaseException):
+    """模拟进程在任务执行中被终止"""
+
+
+class _Guild:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.calls = []
+
+    def handle_task(self, task):
+        self.calls.append(task)
+        if self.fail:
+            raise self.fail if isinstance(self.fail, BaseException) else RuntimeError("接口不可用")
+        return {"done": task["intent"]}
+
+
+class _Meta:
+    def __init__(self, guilds):
+        self.registry = dict(guilds)
+        self.context = {}
+
+    def register(self, name, agent):
+        self.registry[name] = agent
+
+
+def _orchestrator(meta, store, monkeypatch):
+    orchestrator_module = pytest.importorskip("agents.orchestrator")
+    orchestrator = orchestrator_module.Orchestrator.__new__(orchestrator_module.Orchestrator)
+    orchestrator.name = "Orchestrator"
+    orchestrator.meta_agent = meta
+    orchestrator.last_run_trace = None
+    orchestrator.last_run_id = None
+    orchestrator._guild_lock = threading.Lock()
+    monkeypatch.setattr(orchestrator, "_get_checkpoint_store", lambda: store)
+    return orchestrator
+
+
+def test_resume_reuses_completed_tasks(store, monkeypatch):
+    from agents.utils.artifact_store import get_artifact_store
+
+    crawl, chart = _Guild(), _Guild(fail=True)
+    orchestrator = _orchestrator(_Meta({"CrawlGuild": crawl, "ChartGuild": chart}), store, monkeypatch)
+    blueprint = {"name": "研报", "tasks": [{"intent": "CrawlGuild"}, {"intent": "ChartGuild"}]}
+
+    first = orchestrator.dispatch(blueprint, run_id="run")
+    assert "error" in first[1]
+    assert store.load_run("run")["status"] == "partial"
+
+    chart.fail = False
+    resumed = orchestrator.resume("run")
+    assert len(crawl.calls) == 1
+    assert len(chart.calls) == 2
+    assert get_artifact_store().get(resumed[0]["result"]) == {"done": "CrawlGuild"}
+    assert get_artifact_store().get(resumed[1]["result"]) == {"done": "ChartGuild"}
+    assert [t["status"] for t in store.load_run("run")["tasks"]] == ["completed", "completed"]
+    get_artifact_store().release("run")
+
+
+def test_resume_runs_tasks_that_never_started(store, monkeypatch):
+    from agents.utils.artifact_store import get_artifact_store
+
+    crawl, chart, report = _Guild(), _Guild(fail=_Crash()), _Guild()
+    guilds = {"CrawlGuild": crawl, "ChartGuild": chart, "ReportGuild": report}
+    orchestrator = _orchestrator(_Meta(guilds), store, monkeypatch)
+    tasks = [{"intent": name} for name in guilds]
+
+    with pytest.raises(_Crash):
+        orchestrator.dispatch({"tasks": tasks}, run_id="run")
+    saved = store.load_run("run")
+    assert saved["status"] == "failed"
+    assert [t["status"] for t in saved["tasks"]] == ["completed", "running", "pending"]
+
+    chart.fail = False
+    resumed = orchestrator.resume("run")
+    assert len(resumed) == 3
+    assert (len(crawl.calls), len(chart.calls), len(report.calls)) == (1, 2, 1)
+    assert get_artifact_store().get(resumed[2]["result"]) == {"done": "ReportGuild"}
+    assert store.load_run("run")["status"] == "completed"
+    get_artifact_store().release("run")
+
+
+def test_resume_unknown_run_raises(store, monkeypatch):
+    orchestrator = _orchestrator(_Meta({}), store, monkeypatch)
+    with pytest.raises(ValueError):
+        orchestrator.resume("missing")
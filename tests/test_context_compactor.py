@@ -0,0 +1,68 @@
+import pytest
+
+from agents.utils.context_compactor import ContextCompactor, estimate_value_tokens
+
+
+def big_result(n, text="商汤科技发布新一代大模型，相关新闻与行业分析如下。" * 20):
+    return {"items": [{"title": f"新闻{i}", "body": text, "tags": ["AI", "研报"]} for i in range(n)]}
+
+
+# 字段很多的字典无法靠结构裁剪压到预算内，需要摘要或截断兜底
+WIDE = {f"指标{i}": i for i in range(500)}
+VALUES = ["完成", {"status": "ok", "rows": 3}, big_result(40), "长文本" * 3000, big_result(5), WIDE]
+
+
+def total_tokens(values):
+    return sum(estimate_value_tokens(v) for v in values)
+
+
+def test_values_within_budget_are_unchanged():
+    values = ["完成", {"status": "ok"}]
+    assert ContextCompactor().compact_many(values, 1000) == values
+
+
+@pytest.mark.parametrize("budget", [50, 200, 800, 3000])
+def test_compact_many_stays_within_budget(budget):
+    results = ContextCompactor().compact_many(VALUES, budget)
+    assert len(results) == len(VALUES)
+    assert total_tokens(results) <= budget
+
+
+def test_small_values_keep_full_content_and_leave_budget_to_large_ones():
+    budget = 1500
+    results = ContextCompactor().compact_many(VALUES, budget)
+    assert results[:2] == VALUES[:2]
+    assert results[2] != VALUES[2]
+    # 小值用不完的预算留给大值，大值不会只分到平均份额
+    assert estimate_value_tokens(results[2]) > budget // len(VALUES)
+
+
+def test_summaries_are_capped_and_cached():
+    calls = []
+
+    def summarizer(items):
+        calls.append(len(items))
+        # 故意返回超出预算的摘要，压缩器仍需截断到预算内
+        return ["摘要" * budget for _, budget in items]
+
+    compactor = ContextCompactor(summarizer=summarizer)
+    first = compactor.compact_many(VALUES, 300)
+    assert total_tokens(first) <= 300
+    assert calls == [1]
+    assert first[-1].startswith("摘要")
+    assert compactor.compact_many(VALUES, 300) == first
+    assert len(calls) == 1
+
+
+def test_failing_summarizer_falls_back_to_pruned_values():
+    def summarizer(items):
+        raise RuntimeError("LLM不可用")
+
+    results = ContextCompactor(summarizer=summarizer).compact_many(VALUES, 200)
+    assert total_tokens(results) <= 200
+    assert results[0] == "完成"
+
+
+def test_compact_single_value():
+    result = ContextCompactor().compact(big_result(100), 120)
+    assert estimate_value_tokens(result) <= 120
@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("mcp.server.fastmcp")
+
+from sqlalchemy import create_engine, text
+
+from config.settings import get_settings
+from tools.mcp import database_operation
+
+
+class SyncBackedConnection:
+    """把同步 sqlite 连接包成 database_operation 用到的异步接口"""
+
+    def __init__(self, engine):
+        self.conn = engine.connect()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.conn.close()
+
+    async def execute(self, statement, params=None):
+        return self.conn.execute(statement, params or {})
+
+
+class SyncBackedEngine:
+    def __init__(self):
+        self.engine = create_engine("sqlite://")
+        with self.engine.begin() as conn:
+            conn.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)"))
+            conn.execute(text("INSERT INTO items (id, name) VALUES (:id, :name)"),
+                         [{"id": i, "name": f"item{i}"} for i in range(1, 8)])
+
+    def connect(self):
+        return SyncBackedConnection(self.engine)
+
+
+@pytest.fixture
+def engines(monkeypatch):
+    """每次调用 connect 换一个引擎实例，模拟续页请求落到不同的工作进程"""
+    calls = []
+
+    def get_async_engine():
+        calls.append(1)
+        return SyncBackedEngine()
+
+    monkeypatch.setattr(database_operation, "get_async_engine", get_async_engine)
+    monkeypatch.setattr(get_settings(), "db_tool_cursor_paging", True)
+    return calls
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_pages_follow_the_cursor_across_workers(engines):
+    sql = "SELECT id, name FROM items WHERE id > :min_id ORDER BY id;"
+    page = run(database_operation.database_execute_sql(sql, {"min_id": 1}, page_size=3))
+    ids = [row["id"] for row in page["rows"]]
+    while page["has_more"]:
+        page = run(database_operation.database_fetch_cursor(page["cursor"], page_size=3))
+        ids += [row["id"] for row in page["rows"]]
+    assert ids == [2, 3, 4, 5, 6, 7]
+    assert page["cursor"] is None
+    assert len(engines) == 2
+
+
+def test_max_rows_caps_the_paged_result(engines):
+    page = run(database_operation.database_execute_sql("SELECT id FROM items ORDER BY id", page_size=2, max_rows=3,
+                                                       encoding="columnar"))
+    assert page["column_values"] == [[1, 2]]
+    page = run(database_operation.database_fetch_cursor(page["cursor"], page_size=2, encoding="columnar"))
+    assert page["column_values"] == [[3]]
+    assert page["truncated"] is True
+    assert page["has_more"] is False
+
+
+def test_invalid_or_non_select_cursor_is_rejected(engines):
+    forged = database_operation._encode_cursor({"sql": "DELETE FROM items", "params": {}, "offset": 0,
+                                                "max_rows": 10})
+    assert run(database_operation.database_fetch_cursor(forged))["success"] is False
+    assert run(database_operation.database_fetch_cursor("not-a-token"))["success"] is False
+    assert engines == []
+
+
+def test_paging_disabled_returns_everything_up_to_max_rows(engines, monkeypatch):
+    monkeypatch.setattr(get_settings(), "db_tool_cursor_paging", False)
+    page = run(database_operation.database_execute_sql("SELECT id FROM items ORDER BY id", page_size=2, max_rows=5))
+    assert [row["id"] for row in page["rows"]] == [1, 2, 3, 4, 5]
+    assert page["truncated"] is True and page["cursor"] is None
+
+
+def test_empty_and_exact_page_results(engines):
+    empty = run(database_operation.database_execute_sql("SELECT id, name FROM items WHERE id > 100",
+                                                        encoding="columnar"))
+    assert empty["column_values"] == [[], []] and empty["has_more"] is False
+    exact = run(database_operation.database_execute_sql("SELECT id FROM items ORDER BY id", page_size=7))
+    # 恰好读满一页时不返回指向空页的游标
+    assert exact["row_count"] == 7 and exact["has_more"] is False and exact["cursor"] is None
+
+
+def test_each_page_uses_the_requested_encoding(engines):
+    sql = "SELECT id, name FROM items ORDER BY id"
+    page = run(database_operation.database_execute_sql(sql, page_size=4))
+    assert page["rows"][0] == {"id": 1, "name": "item1"}
+    page = run(database_operation.database_fetch_cursor(page["cursor"], page_size=4, encoding="columnar"))
+    assert page["columns"] == ["id", "name"]
+    assert page["column_values"] == [[5, 6, 7], ["item5", "item6", "item7"]]
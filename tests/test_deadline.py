@@ -0,0 +1,109 @@
+import threading
+import time
+
+import pytest
+
+from tools import deadline
+
+
+def test_child_scope_never_outlives_parent():
+    with deadline.deadline(0.05, name="运行") as run:
+        with deadline.deadline(60, name="任务") as task:
+            assert task.expires_at == run.expires_at
+            time.sleep(0.06)
+            with pytest.raises(deadline.DeadlineExceeded):
+                deadline.check()
+    deadline.check()
+
+
+def test_parent_cancellation_reaches_nested_scopes():
+    with deadline.deadline(name="运行") as run, deadline.deadline(name="任务") as task:
+        run.cancel("必需任务失败")
+        assert task.cancelled and task.cancel_reason == "必需任务失败"
+        with pytest.raises(deadline.TaskCancelled, match="必需任务失败"):
+            deadline.effective_timeout(10)
+
+
+class _ToolLoopGuild:
+    """与各工会相同的写法：逐个调用工具，单个工具的异常记为失败后继续"""
+
+    def __init__(self, *tools):
+        self.tools = tools
+        self.errors = []
+
+    def handle_task(self, task):
+        results = []
+        for tool in self.tools:
+            try:
+                results.append(tool())
+            except Exception as e:
+                self.errors.append(e)
+        return results
+
+
+class _Meta:
+    def __init__(self, guilds):
+        self.registry = dict(guilds)
+        self.context = {}
+
+    def register(self, name, agent):
+        self.registry[name] = agent
+
+
+def _orchestrator(guilds, monkeypatch):
+    orchestrator_module = pytest.importorskip("agents.orchestrator")
+    orchestrator = orchestrator_module.Orchestrator.__new__(orchestrator_module.Orchestrator)
+    orchestrator.name = "Orchestrator"
+    orchestrator.meta_agent = _Meta(guilds)
+    orchestrator.last_run_trace = None
+    orchestrator.last_run_id = None
+    orchestrator._guild_lock = threading.Lock()
+    monkeypatch.setattr(orchestrator, "_get_checkpoint_store", lambda: None)
+    return orchestrator
+
+
+def test_task_past_its_deadline_fails_even_if_the_guild_swallows_errors(monkeypatch):
+    calls = []
+
+    def slow_tool():
+        time.sleep(0.1)
+        deadline.check()
+        calls.append("slow")
+
+    def next_tool():
+        deadline.check()
+        calls.append("next")
+
+    guild = _ToolLoopGuild(slow_tool, next_tool)
+    events = []
+    orchestrator = _orchestrator({"SlowGuild": guild}, monkeypatch)
+    results = orchestrator.dispatch({"tasks": [{"intent": "SlowGuild", "timeout_seconds": 0.05}]},
+                                    run_id="deadline-run", on_event=events.append)
+
+    assert calls == []
+    assert all(isinstance(e, deadline.DeadlineExceeded) for e in guild.errors)
+    assert "超过截止时间" in results[0]["error"]
+    assert [e["type"] for e in events] == ["task_started", "task_failed"]
+
+
+def test_external_cancellation_fails_the_task_and_skips_the_rest(monkeypatch):
+    job = deadline.Deadline(name="作业")
+
+    def cancelling_tool():
+        job.cancel("用户取消")
+        return "partial"
+
+    def next_tool():
+        deadline.check()
+        return "unreachable"
+
+    later = _ToolLoopGuild(lambda: "later")
+    orchestrator = _orchestrator({"FirstGuild": _ToolLoopGuild(cancelling_tool, next_tool), "LaterGuild": later},
+                                 monkeypatch)
+    with deadline.use(job):
+        results = orchestrator.dispatch({"tasks": [{"intent": "FirstGuild"}, {"intent": "LaterGuild"}]},
+                                        run_id="cancel-run")
+
+    assert results[0]["error"] == "用户取消"
+    assert results[1]["skipped"] and "用户取消" in results[1]["error"]
+    assert later.errors == []
@@ -0,0 +1,46 @@
+import threading
+
+from config.settings import get_settings
+from database import engine as engine_module
+from database.engine import get_engine
+
+
+def test_sync_engine_is_shared_per_url(tmp_path):
+    url = f"sqlite:///{tmp_path / 'shared.db'}"
+    engines = []
+    threads = [threading.Thread(target=lambda: engines.append(get_engine(url))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({id(e) for e in engines}) == 1
+    assert get_engine(url) is engines[0]
+    assert get_engine(f"sqlite:///{tmp_path / 'other.db'}") is not engines[0]
+
+
+def test_checkpoint_store_reuses_the_shared_engine(tmp_path):
+    from database.checkpoint_models import Base
+    from database.checkpoint_store import CheckpointStore
+
+    url = f"sqlite:///{tmp_path / 'checkpoints.db'}"
+    Base.metadata.create_all(get_engine(url))
+    store = CheckpointStore(url)
+    try:
+        assert store.engine is get_engine(url)
+    finally:
+        store.close()
+
+
+def test_sync_and_async_pools_are_sized_separately(tmp_path, monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "db_pool_size", 3)
+    monkeypatch.setattr(settings, "db_max_overflow", 1)
+    monkeypatch.setattr(settings, "db_async_pool_size", 7)
+    monkeypatch.setattr(settings, "db_async_max_overflow", 2)
+
+    assert engine_module._pool_options()["pool_size"] == 3
+    options = engine_module._pool_options(async_engine=True)
+    assert (options["pool_size"], options["max_overflow"]) == (7, 2)
+    pool = get_engine(f"sqlite:///{tmp_path / 'sized.db'}").pool
+    assert pool.size() == 3
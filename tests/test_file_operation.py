@@ -0,0 +1,94 @@
+import pytest
+
+pytest.importorskip("mcp.server.fastmcp")
+
+from config.settings import get_settings
+from tools.mcp.file_operation import _read_lines, _read_tail, _trim_partial_utf8
+
+TEXT = "第一行\nline 2\n\nline 4\nlast line"
+
+
+@pytest.fixture(params=["read", "mmap"])
+def write(request, tmp_path, monkeypatch):
+    """同一组用例分别走直接读取与内存映射两条路径"""
+    threshold = 0 if request.param == "mmap" else 1 << 30
+    monkeypatch.setattr(get_settings(), "file_tool_mmap_threshold_bytes", threshold)
+
+    def write(text):
+        path = tmp_path / "data.txt"
+        path.write_bytes(text.encode("utf-8"))
+        return str(path)
+
+    return write
+
+
+@pytest.mark.parametrize("data, expected", [
+    (b"", b""),
+    (b"abc", b"abc"),
+    ("中文".encode("utf-8"), "中文".encode("utf-8")),
+    ("中文".encode("utf-8")[:-1], "中".encode("utf-8")),
+    ("中文".encode("utf-8")[:-2], "中".encode("utf-8")),
+    ("a😀".encode("utf-8")[:-1], b"a"),
+    ("a😀".encode("utf-8"), "a😀".encode("utf-8")),
+    (b"\x80\x80\x80\x80\x80", b"\x80\x80\x80\x80\x80"),
+])
+def test_trim_partial_utf8(data, expected):
+    assert _trim_partial_utf8(data) == expected
+
+
+def test_read_line_range(write):
+    path = write(TEXT)
+    data, last_line, next_offset, size = _read_lines(path, 2, 3, 1024)
+    assert data == b"line 2\n\n"
+    assert last_line == 3
+    assert next_offset == len("第一行\nline 2\n\n".encode("utf-8"))
+    assert size == len(TEXT.encode("utf-8"))
+
+
+def test_read_lines_to_end_without_trailing_newline(write):
+    path = write(TEXT)
+    data, last_line, next_offset, _ = _read_lines(path, 4, None, 1024)
+    assert data == b"line 4\nlast line"
+    assert last_line == 5 and next_offset is None
+
+
+def test_read_lines_past_the_end(write):
+    path = write(TEXT)
+    assert _read_lines(path, 10, 12, 1024)[:3] == (b"", 5, None)
+    assert _read_lines(write(""), 1, None, 1024) == (b"", 0, None, 0)
+
+
+def test_read_lines_stops_at_max_bytes(write):
+    path = write(TEXT)
+    data, last_line, next_offset, _ = _read_lines(path, 2, None, 10)
+    # 只返回完整的行，下一次从 next_offset 继续
+    assert data == b"line 2\n\n"
+    assert last_line == 3
+    assert next_offset == len("第一行\nline 2\n\n".encode("utf-8"))
+
+
+def test_single_line_longer_than_max_bytes_is_cut(write):
+    path = write("x" * 50 + "\nnext")
+    data, last_line, next_offset, _ = _read_lines(path, 1, 1, 20)
+    assert data == b"x" * 20
+    assert next_offset == 20
+
+
+@pytest.mark.parametrize("text", [TEXT, TEXT + "\n"])
+def test_read_tail(write, text):
+    path = write(text)
+    data, size = _read_tail(path, 2, 1024)
+    assert data.rstrip(b"\n") == b"line 4\nlast line"
+    assert size == len(text.encode("utf-8"))
+
+
+def test_read_tail_more_lines_than_the_file_has(write):
+    path = write(TEXT)
+    assert _read_tail(path, 100, 1024)[0] == TEXT.encode("utf-8")
+    assert _read_tail(write(""), 3, 1024) == (b"", 0)
+
+
+def test_read_tail_respects_max_bytes(write):
+    path = write(TEXT)
+    data, _ = _read_tail(path, 5, 9)
+    assert data == b"last line"
@@ -0,0 +1,95 @@
+import asyncio
+import re
+
+import pytest
+
+pytest.importorskip("mcp.server.fastmcp")
+pytest.importorskip("bs4")
+
+from tools.mcp import google_news_search as news
+
+
+def result_html(page, count=10):
+    items = "".join(
+        f'<div class="SoaBEf"><a class="WlydOe" href="https://news.example.com/{page}/{i}">'
+        f'<div class="n0jPhd">新闻 {page}-{i}</div><div class="GI74Re">摘要</div>'
+        f'<div class="MgUUmf"><span>来源</span></div><div class="OSrXXb"><span>1 天前</span></div></a></div>'
+        for i in range(count)
+    )
+    return f"<html><body>{items}</body></html>".encode("utf-8")
+
+
+class FakeSearch:
+    """按页返回结果；靠后的页面响应更快，用来检查结果仍按页序返回"""
+
+    def __init__(self, pages=3, fail_page=None, delays=None):
+        self.pages = pages
+        self.fail_page = fail_page
+        self.delays = delays or {}
+        self.started = []
+        self.cancelled = []
+
+    async def __call__(self, method, url, headers=None, timeout=None):
+        page = int(re.search(r"start=(\d+)", url).group(1)) // 10
+        self.started.append(page)
+        try:
+            await asyncio.sleep(self.delays.get(page, 0.03 * (self.pages - page)))
+        except asyncio.CancelledError:
+            self.cancelled.append(page)
+            raise
+        if page == self.fail_page:
+            return {"status_code": 503, "content": b"", "url": url}
+        return {"status_code": 200, "content": result_html(page), "url": url}
+
+
+@pytest.fixture
+def search(monkeypatch):
+    search = FakeSearch()
+    monkeypatch.setattr(news, "fetch", search)
+    return search
+
+
+def titles(result):
+    return [item["title"] for item in result["results"]]
+
+
+def test_pages_are_fetched_concurrently_and_returned_in_order(search):
+    result = asyncio.run(news.google_news_search("商汤", max_results=25))
+    assert sorted(search.started) == [0, 1, 2]
+    assert titles(result) == [f"新闻 {p}-{i}" for p in range(3) for i in range(10)][:25]
+    assert result["total_results"] == 25
+    first = result["results"][0]
+    assert first["url"] == "https://news.example.com/0/0" and first["source"] == "来源" and first["date"] == "1 天前"
+
+
+def test_only_needed_pages_are_requested(search):
+    result = asyncio.run(news.google_news_search("商汤", max_results=5))
+    assert search.started == [0]
+    assert len(result["results"]) == 5
+
+
+def test_failed_page_keeps_earlier_results(search):
+    search.fail_page = 1
+    result = asyncio.run(news.google_news_search("商汤", max_results=30))
+    # 第3页比第2页先返回，但第2页失败后不再计入后续页面
+    assert titles(result) == [f"新闻 0-{i}" for i in range(10)]
+
+
+def test_pending_pages_are_cancelled_when_the_search_stops(search):
+    search.fail_page = 0
+    search.delays = {0: 0.01, 1: 5, 2: 5}
+    result = asyncio.run(news.google_news_search("商汤", max_results=30))
+    assert result["results"] == []
+    assert sorted(search.cancelled) == [1, 2]
+
+
+def test_date_range_is_passed_to_the_query(search, monkeypatch):
+    urls = []
+
+    async def capture(method, url, headers=None, timeout=None):
+        urls.append(url)
+        return {"status_code": 200, "content": result_html(0, count=1), "url": url}
+
+    monkeypatch.setattr(news, "fetch", capture)
+    asyncio.run(news.google_news_search("AI", max_results=1, start_date="2024-01-01", end_date="2024-01-31"))
+    assert "tbs=cdr:1,cd_min:01/01/2024,cd_max:01/31/2024" in urls[0]
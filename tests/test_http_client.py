@@ -0,0 +1,91 @@
+import asyncio
+import functools
+
+import pytest
+
+pytest.importorskip("mcp.server.fastmcp")
+
+import httpx
+
+from config.settings import get_settings
+from tools.mcp import http_client
+
+
+class Upstream:
+    """MockTransport 的处理函数：记录同时进行中的请求数"""
+
+    def __init__(self, body=b'{"ok": true}', content_type="application/json", delay=0.0):
+        self.body = body
+        self.content_type = content_type
+        self.delay = delay
+        self.active = 0
+        self.peak = 0
+        self.requests = []
+
+    async def __call__(self, request):
+        self.requests.append(request)
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+            return httpx.Response(200, content=self.body, headers={"content-type": self.content_type})
+        finally:
+            self.active -= 1
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    upstream = Upstream()
+    monkeypatch.setattr(http_client.httpx, "AsyncClient",
+                        functools.partial(httpx.AsyncClient, transport=httpx.MockTransport(upstream)))
+    monkeypatch.setattr(http_client, "_client", None)
+    monkeypatch.setattr(http_client, "_client_loop", None)
+    return upstream
+
+
+def test_client_is_reused_within_a_loop_and_recreated_after_close(upstream):
+    async def main():
+        first = http_client.get_http_client()
+        await http_client.fetch("GET", "http://example.com/a")
+        assert http_client.get_http_client() is first
+        await http_client.close_http_client()
+        assert first.is_closed
+        return first, http_client.get_http_client()
+
+    first, second = asyncio.run(main())
+    assert second is not first
+
+    async def other_loop():
+        return http_client.get_http_client()
+
+    # 客户端与事件循环绑定，新的事件循环上会重新创建
+    assert asyncio.run(other_loop()) is not second
+
+
+def test_response_body_is_truncated_and_decoded(upstream):
+    upstream.body = b'{"items": [1, 2, 3]}'
+
+    async def main():
+        full = await http_client.fetch("GET", "http://example.com/json")
+        cut = await http_client.fetch("GET", "http://example.com/json", max_bytes=5)
+        await http_client.close_http_client()
+        return full, cut
+
+    full, cut = asyncio.run(main())
+    assert http_client.decode_body(full) == {"items": [1, 2, 3]}
+    assert cut["truncated"] and cut["content"] == b'{"ite'
+    # 截断的JSON按文本返回，不尝试解析
+    assert http_client.decode_body(cut) == '{"ite'
+
+
+def test_requests_per_host_are_limited(upstream, monkeypatch):
+    monkeypatch.setattr(get_settings(), "http_tool_max_connections_per_host", 2)
+    upstream.delay = 0.05
+
+    async def main():
+        await asyncio.gather(*(http_client.fetch("GET", f"http://example.com/{i}") for i in range(6)))
+        await http_client.close_http_client()
+
+    asyncio.run(main())
+    assert len(upstream.requests) == 6
+    assert upstream.peak == 2
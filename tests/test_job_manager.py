@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("agents.orchestrator")
+
+from agents.job_manager import JobManager
+
+
+class FakeIncubator:
+    def __init__(self, tasks):
+        self.tasks = tasks
+        self.finished = False
+
+    def incubate(self, user_input, meta_agent=None):
+        return {"tasks": list(self.tasks)}
+
+    def incubate_stream(self, user_input, meta_agent=None):
+        def iter_tasks():
+            for task in self.tasks:
+                yield task
+            self.finished = True
+        return {"tasks": iter_tasks()}
+
+
+class FakeOrchestrator:
+    def __init__(self, incubator):
+        self.incubator = incubator
+        self.seen = []
+
+    def dispatch(self, blueprint, run_id=None, on_event=None):
+        results = []
+        for task in blueprint["tasks"]:
+            # 记录每个任务开始时孵化是否已经结束
+            self.seen.append((task, self.incubator.finished))
+            results.append({"task": task, "result": f"done {task}"})
+        return results
+
+
+class FakeSociety:
+    def __init__(self, tasks):
+        incubator = FakeIncubator(tasks)
+        self.orchestrator = FakeOrchestrator(incubator)
+        self.registry = {"TaskIncubator": incubator, "Orchestrator": self.orchestrator}
+
+
+async def run_job(manager, user_input="研报"):
+    await manager.start()
+    try:
+        job = manager.submit(user_input)
+        events = [event async for event in manager.iter_events(job, heartbeat_seconds=1)]
+        return job, [e for e in events if e is not None]
+    finally:
+        await manager.stop()
+
+
+def test_streamed_tasks_are_dispatched_before_incubation_finishes(monkeypatch):
+    from config.settings import get_settings
+    monkeypatch.setattr(get_settings(), "job_stream_blueprint", True)
+    society = FakeSociety(["a", "b", "c"])
+    job, events = asyncio.run(run_job(JobManager(society, workers=1)))
+
+    assert job.status == "completed"
+    assert [task for task, _ in society.orchestrator.seen] == ["a", "b", "c"]
+    assert society.orchestrator.seen[0][1] is False
+    announced = [e["task"] for e in events if e["type"] == "blueprint_task"]
+    assert announced == ["a", "b", "c"]
+    blueprint = next(e for e in events if e["type"] == "blueprint")
+    assert blueprint["blueprint"] == {"tasks": ["a", "b", "c"]}
+
+
+def test_blueprint_is_incubated_in_full_when_streaming_is_off(monkeypatch):
+    from config.settings import get_settings
+    monkeypatch.setattr(get_settings(), "job_stream_blueprint", False)
+    society = FakeSociety(["a", "b"])
+    job, events = asyncio.run(run_job(JobManager(society, workers=1)))
+
+    assert job.status == "completed"
+    assert not any(e["type"] == "blueprint_task" for e in events)
+    assert [e["type"] for e in events].index("blueprint") < [e.get("status") for e in events].index("running")
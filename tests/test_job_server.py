@@ -0,0 +1,136 @@
+import json
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("agents.orchestrator")
+pytest.importorskip("httpx")
+
+from starlette.testclient import TestClient
+
+from agents.job_manager import JobManager
+from job_server import create_app
+from tools import deadline
+
+
+class FakeIncubator:
+    def incubate(self, user_input, meta_agent=None):
+        return {"tasks": [user_input]}
+
+    def incubate_stream(self, user_input, meta_agent=None):
+        return {"tasks": iter([user_input])}
+
+
+class FakeOrchestrator:
+    """输入为 "block" 时一直运行直到作业被取消"""
+
+    def __init__(self):
+        self.started = threading.Event()
+
+    def dispatch(self, blueprint, run_id=None, on_event=None):
+        results = []
+        for idx, task in enumerate(blueprint["tasks"]):
+            on_event({"type": "task_started", "task_idx": idx, "task": task})
+            if task == "block":
+                self.started.set()
+                while True:
+                    deadline.check()
+                    time.sleep(0.01)
+            results.append({"task": task, "result": f"done {task}"})
+            on_event({"type": "task_completed", "task_idx": idx, "task": task})
+        return results
+
+
+class FakeSociety:
+    def __init__(self):
+        self.orchestrator = FakeOrchestrator()
+        self.registry = {"TaskIncubator": FakeIncubator(), "Orchestrator": self.orchestrator}
+
+
+@pytest.fixture
+def society():
+    return FakeSociety()
+
+
+@pytest.fixture
+def client(society):
+    with TestClient(create_app(JobManager(society, workers=2, queue_max=10))) as client:
+        yield client
+
+
+def wait_for_status(client, job_id, statuses, timeout=5.0):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        body = client.get(f"/jobs/{job_id}").json()
+        if body["status"] in statuses:
+            return body
+        time.sleep(0.02)
+    pytest.fail(f"作业 {job_id} 未进入 {statuses}")
+
+
+def test_submit_and_poll_status(client):
+    response = client.post("/jobs", json={"input": "研报", "priority": "interactive"})
+    assert response.status_code == 202
+    job = response.json()
+    assert response.headers["Location"] == f"/jobs/{job['job_id']}"
+    assert job["priority"] == "interactive"
+
+    body = wait_for_status(client, job["job_id"], ("completed", "failed"))
+    assert body["status"] == "completed"
+    assert body["result"] == [{"task": "研报", "result": "done 研报"}]
+
+
+def test_submit_validation(client):
+    assert client.post("/jobs", content=b"not json").status_code == 400
+    assert client.post("/jobs", json={"tenant": "a"}).status_code == 400
+    assert client.post("/jobs", json={"input": "x", "priority": "urgent"}).status_code == 400
+    assert client.get("/jobs/missing").status_code == 404
+    assert client.delete("/jobs/missing").status_code == 404
+
+
+def test_event_stream_ends_with_final_status(client):
+    job_id = client.post("/jobs", json={"input": "研报"}).json()["job_id"]
+    events = []
+    with client.stream("GET", f"/jobs/{job_id}/events") as response:
+        assert response.headers["content-type"].startswith("text/event-stream")
+        name = None
+        for line in response.iter_lines():
+            if line.startswith("event: "):
+                name = line[len("event: "):]
+            elif line.startswith("data: "):
+                events.append((name, json.loads(line[len("data: "):])))
+    names = [name for name, _ in events]
+    assert names.index("task_started") < names.index("task_completed")
+    assert names[-1] == "end"
+    assert events[-1][1]["status"] == "completed"
+
+
+def test_cancel_running_job(client, society):
+    job_id = client.post("/jobs", json={"input": "block"}).json()["job_id"]
+    assert society.orchestrator.started.wait(5)
+    assert client.delete(f"/jobs/{job_id}").status_code == 202
+    body = wait_for_status(client, job_id, ("cancelled", "completed", "failed"))
+    assert body["status"] == "cancelled"
+
+
+def test_shutdown_cancels_running_jobs_without_blocking(society):
+    manager = JobManager(society, workers=1)
+    with TestClient(create_app(manager)) as client:
+        job_id = client.post("/jobs", json={"input": "block"}).json()["job_id"]
+        assert society.orchestrator.started.wait(5)
+        start = time.monotonic()
+    # 退出 TestClient 触发 lifespan 关闭：运行中的作业收到取消并结束
+    assert time.monotonic() - start < 5
+    assert manager.get(job_id).scope.cancelled
+
+
+def test_queue_full_returns_429(society):
+    manager = JobManager(society, workers=1, queue_max=1)
+    with TestClient(create_app(manager)) as client:
+        client.post("/jobs", json={"input": "block"})
+        assert society.orchestrator.started.wait(5)
+        assert client.post("/jobs", json={"input": "a"}).status_code == 202
+        response = client.post("/jobs", json={"input": "b"})
+        assert response.status_code == 429
+        assert "Retry-After" in response.headers
@@ -0,0 +1,59 @@
+import gzip
+import json
+import time
+
+from agents.utils.llm_call_logger import LLMCallLogger
+
+
+def read_lines(path):
+    opener = gzip.open if str(path).endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_records_are_written_as_jsonl(tmp_path):
+    path = tmp_path / "llm_calls.jsonl"
+    logger = LLMCallLogger(str(path), max_bytes=0, rotate_interval_seconds=0)
+    logger.log({"model": "m", "prompt_tokens": 3, "prompt": "商汤"})
+    logger.stop()
+
+    [record] = read_lines(path)
+    assert record["model"] == "m" and record["prompt"] == "商汤"
+    assert "timestamp" in record
+
+
+def test_size_rotation_compresses_and_keeps_backup_count(tmp_path):
+    path = tmp_path / "llm_calls.jsonl"
+    logger = LLMCallLogger(str(path), max_bytes=200, backup_count=2, rotate_interval_seconds=0)
+    for i in range(20):
+        logger.log({"i": i, "payload": "x" * 60})
+    logger.stop()
+
+    backups = sorted(p.name for p in tmp_path.iterdir() if p.name != "llm_calls.jsonl")
+    assert backups == ["llm_calls.jsonl.1.gz", "llm_calls.jsonl.2.gz"]
+    # 最新的记录在当前文件中，紧接着的是 .1.gz
+    newest = read_lines(path)
+    assert newest[-1]["i"] == 19
+    assert read_lines(tmp_path / "llm_calls.jsonl.1.gz")[-1]["i"] == newest[0]["i"] - 1
+
+
+def test_time_rotation(tmp_path):
+    path = tmp_path / "llm_calls.jsonl"
+    logger = LLMCallLogger(str(path), max_bytes=0, backup_count=3, rotate_interval_seconds=0.05, compress=False)
+    logger.log({"i": 0})
+    time.sleep(0.1)
+    logger.log({"i": 1})
+    logger.stop()
+
+    assert [r["i"] for r in read_lines(tmp_path / "llm_calls.jsonl.1")] == [0]
+    assert [r["i"] for r in read_lines(path)] == [1]
+
+
+def test_sampling_drops_successes_but_keeps_errors(tmp_path):
+    path = tmp_path / "llm_calls.jsonl"
+    logger = LLMCallLogger(str(path), max_bytes=0, rotate_interval_seconds=0, sample_rate=0.0)
+    logger.log({"i": 0})
+    logger.log({"i": 1, "error": "超时"})
+    logger.stop()
+
+    assert [r["i"] for r in read_lines(path)] == [1]
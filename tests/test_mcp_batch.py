@@ -0,0 +1,72 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from tools import mcp_tools
+
+
+class FakeTools:
+    """按参数决定耗时与结果的 _call_mcp_tool_raw 替身"""
+
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+
+    async def __call__(self, tool_name, params, server_name=None, use_cache=True, flow=None, **kwargs):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(params.get("delay", 0.01))
+        finally:
+            self.active -= 1
+        if params.get("raise"):
+            raise RuntimeError(params["raise"])
+        return SimpleNamespace(isError=params.get("is_error", False), value=params.get("value"))
+
+
+@pytest.fixture
+def tools(monkeypatch):
+    tools = FakeTools()
+    monkeypatch.setattr(mcp_tools, "_call_mcp_tool_raw", tools)
+    return tools
+
+
+def run_batch(calls, **kwargs):
+    kwargs.setdefault("timeout", 1)
+    return asyncio.run(mcp_tools.call_mcp_tools_batch_async(calls, **kwargs))
+
+
+def test_results_follow_input_order(tools):
+    # 先发出的调用最慢，结果仍按输入顺序返回
+    calls = [("search", {"value": i, "delay": 0.05 - i * 0.01}) for i in range(5)]
+    results = run_batch(calls)
+    assert [r["result"].value for r in results] == [0, 1, 2, 3, 4]
+    assert all(r["success"] and r["tool"] == "search" for r in results)
+
+
+def test_errors_are_reported_per_item(tools):
+    calls = [
+        ("search", {"value": "ok"}),
+        ("read_file", {"raise": "文件不存在"}),
+        ("api_get", {"delay": 5}),
+        ("write_file", {"is_error": True}),
+        ("search", {"value": "ok2"}),
+    ]
+    results = run_batch(calls, timeout=0.2)
+    assert [r["tool"] for r in results] == [name for name, _ in calls]
+    assert results[0]["success"] and results[0]["result"].value == "ok"
+    assert results[1] == {"tool": "read_file", "success": False, "error": "文件不存在"}
+    assert results[2] == {"tool": "api_get", "success": False, "error": "timeout"}
+    assert results[3]["success"] is False and "result" in results[3]
+    assert results[4]["result"].value == "ok2"
+
+
+def test_concurrency_is_capped(tools):
+    results = run_batch([("search", {"value": i, "delay": 0.02}) for i in range(10)], max_concurrency=3)
+    assert len(results) == 10
+    assert tools.peak == 3
+
+
+def test_empty_batch(tools):
+    assert run_batch([]) == []
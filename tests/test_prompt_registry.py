@@ -0,0 +1,68 @@
+import os
+
+import pytest
+
+from agents.utils.prompt_registry import PromptRegistry
+
+
+@pytest.fixture
+def root(tmp_path):
+    (tmp_path / "tool_agent").mkdir()
+    (tmp_path / "tool_agent" / "tool_select.txt").write_text(
+        "你是工具选择助手。\n工具列表:\n{tools}\n返回 {{\"tool\": ...}}\n用户请求: {user_query}\n", encoding="utf-8")
+    (tmp_path / "system.txt").write_text("智能体 {agent_name!r} 得分 {score:.1f}", encoding="utf-8")
+    return tmp_path
+
+
+def touch_with(path, text):
+    path.write_text(text, encoding="utf-8")
+    # 保证 mtime 变化，不受文件系统时间精度影响
+    stat = path.stat()
+    os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+
+
+def test_templates_are_loaded_once_and_cached(root):
+    registry = PromptRegistry(str(root))
+    prompt = registry.get("tool_agent/tool_select")
+    assert registry.get("tool_agent/tool_select.txt") is prompt
+    assert prompt.fields == ["tools", "user_query"]
+
+    touch_with(root / "system.txt", "已修改 {agent_name}")
+    # 未开启自动重载时不会再读盘
+    assert registry.render("system", agent_name="A", score=1) == "智能体 'A' 得分 1.0"
+
+
+def test_auto_reload_picks_up_modified_files(root):
+    registry = PromptRegistry(str(root), auto_reload=True)
+    first = registry.get("system")
+    assert registry.get("system") is first
+
+    touch_with(root / "system.txt", "已修改 {agent_name}")
+    assert registry.render("system", agent_name="A") == "已修改 A"
+    # 手动重新加载全部模板同样生效
+    touch_with(root / "tool_agent" / "tool_select.txt", "新模板 {user_query}")
+    registry.load_all()
+    assert registry.render("tool_agent/tool_select", user_query="q") == "新模板 q"
+
+
+def test_render_matches_str_format(root):
+    registry = PromptRegistry(str(root))
+    text = (root / "tool_agent" / "tool_select.txt").read_text(encoding="utf-8")
+    kwargs = {"tools": "- search", "user_query": "查新闻"}
+    assert registry.render("tool_agent/tool_select", **kwargs) == text.format(**kwargs)
+    assert registry.get("tool_agent/tool_select").format(**kwargs) == text.format(**kwargs)
+
+
+def test_render_split_keeps_a_stable_static_prefix(root):
+    registry = PromptRegistry(str(root))
+    first = registry.render_split("tool_agent/tool_select", ("user_query",), tools="- search", user_query="a")
+    second = registry.render_split("tool_agent/tool_select", ("user_query",), tools="- search", user_query="b")
+    assert first[0] == second[0]
+    assert first[0].endswith("用户请求: ")
+    assert "".join(first) == registry.render("tool_agent/tool_select", tools="- search", user_query="a")
+    assert registry.render_split("system", ("missing",), agent_name="A", score=2) == ("智能体 'A' 得分 2.0", "")
+
+
+def test_missing_template_raises(root):
+    with pytest.raises(FileNotFoundError):
+        PromptRegistry(str(root)).get("nope")
@@ -0,0 +1,66 @@
+import threading
+
+import pytest
+
+from agents.utils.run_context import current_run_context, run_context
+
+
+def test_nested_runs_are_isolated_and_restored():
+    events = []
+    with run_context("outer", events.append) as outer:
+        outer["k"] = "outer"
+        with run_context("inner") as inner:
+            assert current_run_context() is inner and "k" not in inner
+            inner.emit("task_started")
+        assert current_run_context() is outer
+    assert current_run_context() is None
+    assert [(e["type"], e["run_id"]) for e in events] == [("task_started", "inner")]
+
+
+class _ContextGuild:
+    """第一个任务写入本运行的标记，第二个任务读取上游结果；两次运行在任务之间互相等待以保证交错执行"""
+
+    def __init__(self, meta, barrier):
+        self.meta = meta
+        self.barrier = barrier
+        self.seen = {}
+
+    def handle_task(self, task):
+        self.barrier.wait(5)
+        if task["step"] == "read":
+            context = self.meta.context
+            self.seen[task["run"]] = (sorted(context), self.meta.get_context_value("task_0_result"))
+        return {"run": task["run"]}
+
+
+def test_concurrent_dispatches_do_not_share_context(monkeypatch):
+    meta_module = pytest.importorskip("agents.meta_agent")
+    orchestrator_module = pytest.importorskip("agents.orchestrator")
+
+    meta = meta_module.MetaAgent.__new__(meta_module.MetaAgent)
+    meta._default_context = {}
+    guild = _ContextGuild(meta, threading.Barrier(2))
+    meta.registry = {"ContextGuild": guild}
+    orchestrator = orchestrator_module.Orchestrator.__new__(orchestrator_module.Orchestrator)
+    orchestrator.name = "Orchestrator"
+    orchestrator.meta_agent = meta
+    orchestrator.last_run_trace = None
+    orchestrator.last_run_id = None
+    orchestrator._guild_lock = threading.Lock()
+    monkeypatch.setattr(orchestrator, "_get_checkpoint_store", lambda: None)
+
+    def run(name):
+        tasks = [{"intent": "ContextGuild", "run": name, "step": step} for step in ("write", "read")]
+        orchestrator.dispatch({"tasks": tasks}, run_id=name)
+
+    threads = [threading.Thread(target=run, args=(name,)) for name in ("a", "b")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+
+    assert guild.seen == {"a": (["task_0_result"], {"run": "a"}), "b": (["task_0_result"], {"run": "b"})}
+    assert meta._default_context == {}
+    from agents.utils.artifact_store import get_artifact_store
+    get_artifact_store().release("a")
+    get_artifact_store().release("b")
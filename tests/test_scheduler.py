@@ -0,0 +1,104 @@
+import asyncio
+import time
+
+import pytest
+
+from tools import deadline
+from tools.scheduler import FairQueue, FairScheduler, Flow
+
+INTERACTIVE = Flow(priority="interactive")
+BATCH = Flow(priority="batch")
+
+
+def test_tags_follow_weights():
+    queue = FairQueue()
+    tags = [(queue.tag(INTERACTIVE), "interactive") for _ in range(9)] + [(queue.tag(BATCH), "batch") for _ in range(9)]
+    order = [name for _, name in sorted(tags)]
+    # 权重 8:1：前9个槽位中交互式流占8个，批量流不必等到交互式请求全部完成
+    assert order[:9].count("interactive") == 8
+    assert order.index("batch") <= 8
+
+
+def test_idle_flow_does_not_bank_credit():
+    queue = FairQueue()
+    for _ in range(3):
+        queue.advance(queue.tag(BATCH))
+    # 新到达的流从当前虚拟时间开始计算，不会因之前空闲而长期插队
+    assert queue.tag(INTERACTIVE) > queue.virtual_time
+
+
+def test_waiters_are_granted_in_tag_order():
+    scheduler = FairScheduler("test", 1)
+    order = []
+
+    async def job(flow, label):
+        async with scheduler.slot_async(flow):
+            order.append(label)
+            await asyncio.sleep(0)
+
+    async def main():
+        async with scheduler.slot_async(Flow(priority="normal")):
+            tasks = []
+            for label, flow in [("b1", BATCH), ("b2", BATCH), ("i1", INTERACTIVE), ("i2", INTERACTIVE)]:
+                tasks.append(asyncio.create_task(job(flow, label)))
+                await asyncio.sleep(0)
+            assert scheduler.snapshot()["waiting"] == {"batch": 2, "interactive": 2}
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+    assert order == ["i1", "i2", "b1", "b2"]
+    assert scheduler.snapshot()["in_use"] == 0
+
+
+def test_deadline_abandons_sync_wait():
+    scheduler = FairScheduler("test", 1)
+    with scheduler.slot():
+        start = time.monotonic()
+        with deadline.deadline(0.3), pytest.raises(deadline.DeadlineExceeded):
+            with scheduler.slot():
+                pass
+        assert time.monotonic() - start < 2
+        assert scheduler.snapshot()["waiting"] == {"normal": 0}
+    assert scheduler.snapshot()["in_use"] == 0
+    with scheduler.slot():
+        assert scheduler.snapshot()["in_use"] == 1
+
+
+def test_cancelled_waiter_returns_granted_slot():
+    scheduler = FairScheduler("test", 1)
+
+    async def main():
+        holder = scheduler.slot_async()
+        await holder.__aenter__()
+        entered = asyncio.Event()
+
+        async def waiter():
+            async with scheduler.slot_async():
+                entered.set()
+
+        task = asyncio.create_task(waiter())
+        await asyncio.sleep(0)
+        # 释放时槽位已授予排队的协程，但它在恢复执行前被取消，槽位必须归还
+        await holder.__aexit__(None, None, None)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert not entered.is_set()
+
+    asyncio.run(main())
+    assert scheduler.snapshot()["in_use"] == 0
+
+
+def test_wait_for_timeout_leaves_queue():
+    scheduler = FairScheduler("test", 1)
+
+    async def main():
+        async with scheduler.slot_async():
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(scheduler.slot_async().__aenter__(), 0.05)
+            assert scheduler.snapshot()["waiting"] == {"normal": 0}
+        async with scheduler.slot_async():
+            assert scheduler.snapshot()["in_use"] == 1
+
+    asyncio.run(main())
+    assert scheduler.snapshot()["in_use"] == 0
@@ -0,0 +1,110 @@
+import asyncio
+
+import pytest
+
+from tools.mcp_tools import Server, ServerPool
+
+READ_ONLY = {"readOnlyHint": True}
+
+
+class FakeSession:
+    """按 URL 区分的假会话：fail 为 True 时每次 call_tool 都失败"""
+
+    def __init__(self, tools, fail=False, connect_error=None):
+        self.tools = tools
+        self.fail = fail
+        self.connect_error = connect_error
+        self.calls = 0
+
+    async def list_tools(self):
+        return {"tools": self.tools}
+
+    async def call_tool(self, tool_name, arguments):
+        self.calls += 1
+        if self.fail:
+            raise ConnectionError("副本不可用")
+        return {"tool": tool_name, "arguments": arguments}
+
+
+@pytest.fixture
+def sessions(monkeypatch):
+    sessions = {}
+
+    async def initialize(self):
+        session = sessions[self.url]
+        if session.connect_error:
+            raise session.connect_error
+        self.session = session
+
+    monkeypatch.setattr(Server, "initialize", initialize)
+    return sessions
+
+
+def files_pool(sessions, tools, fail=("http://a",), connect_error=None):
+    for url in ("http://a", "http://b"):
+        sessions[url] = FakeSession(tools, fail=url in fail, connect_error=connect_error if url in fail else None)
+    pool = ServerPool({"mcpServers": {"files": {"urls": ["http://a", "http://b"]}}})
+    # 让失败的副本排在前面
+    for server in pool.groups["files"]:
+        server.outstanding = 0 if server.url in fail else 1
+    return pool
+
+
+def test_idempotent_tool_fails_over_to_another_replica(sessions):
+    pool = files_pool(sessions, [{"name": "read_file", "annotations": READ_ONLY}])
+
+    result = asyncio.run(pool.call_tool("read_file", {"file_path": "a.txt"}, delay=0))
+    assert result == {"tool": "read_file", "arguments": {"file_path": "a.txt"}}
+    # 失败副本先按原有次数重试，再切换
+    assert sessions["http://a"].calls == 2
+    assert sessions["http://b"].calls == 1
+    assert [s.outstanding for s in pool.groups["files"]] == [0, 1]
+
+
+def test_non_idempotent_tool_retries_on_the_same_replica_only(sessions):
+    pool = files_pool(sessions, [{"name": "write_file"}])
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(pool.call_tool("write_file", {"file_path": "a.txt"}, delay=0))
+    assert sessions["http://a"].calls == 2
+    assert sessions["http://b"].calls == 0
+
+
+def test_connect_failure_fails_over_for_any_tool(sessions):
+    pool = files_pool(sessions, [{"name": "write_file"}], connect_error=OSError("拒绝连接"))
+    pool.annotations["write_file"] = {}
+
+    result = asyncio.run(pool.call_tool("write_file", {"file_path": "a.txt"}, delay=0))
+    assert result["tool"] == "write_file"
+    assert sessions["http://b"].calls == 1
+
+
+def test_candidates_prefer_least_outstanding_and_rotate_ties():
+    pool = ServerPool({"mcpServers": {"files": {"urls": ["http://a", "http://b", "http://c"]}}})
+    a, b, c = pool.groups["files"]
+    a.outstanding, b.outstanding, c.outstanding = 3, 0, 1
+    assert [s.name for s in pool.candidates("files")] == [b.name, c.name, a.name]
+
+    a.outstanding = b.outstanding = c.outstanding = 0
+    firsts = {pool.candidates("files")[0].name for _ in range(3)}
+    assert firsts == {a.name, b.name, c.name}
+
+
+def test_routes_table_prefers_the_first_configured_server(sessions):
+    sessions["http://files"] = FakeSession([{"name": "read_file", "annotations": READ_ONLY}, {"name": "shared"}])
+    sessions["http://db"] = FakeSession([{"name": "database_execute_sql"}, {"name": "shared"}])
+    pool = ServerPool({"mcpServers": {"files": {"url": "http://files"}, "db": {"url": "http://db"}}})
+
+    tools = asyncio.run(pool.list_tools())
+    assert [t["name"] for t in tools] == ["read_file", "shared", "database_execute_sql"]
+    assert pool.routes == {"read_file": "files", "shared": "files", "database_execute_sql": "db"}
+    assert pool.is_idempotent("read_file") and not pool.is_idempotent("shared")
+    assert pool.route("database_execute_sql") == "db"
+    assert pool.route("unknown_tool") == "files"
+    assert pool.route("shared", server_name="db") == "db"
+    with pytest.raises(RuntimeError):
+        pool.route("shared", server_name="missing")
+
+    result = asyncio.run(pool.call_tool("database_execute_sql", {"sql": "SELECT 1"}))
+    assert result["tool"] == "database_execute_sql"
+    assert sessions["http://db"].calls == 1
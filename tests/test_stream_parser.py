@@ -0,0 +1,117 @@
+import json
+
+import pytest
+
+from agents.utils.stream_parser import IncrementalStructuredParser
+
+TASKS = [
+    {"intent": "DataCrawlGuild", "query": "商汤 \"新闻\" [最新]", "depends_on": []},
+    {"intent": "ChartGuild", "spec": {"type": "bar", "series": [1, 2, {"x": "}"}]}},
+    {"intent": "ReportGuild", "path": "output\\report.md"},
+]
+
+
+def feed_in_chunks(parser, text, size):
+    """按固定大小切分增量，记录每个列表项在第几个字符处产出"""
+    emitted = []
+    for start in range(0, len(text), size):
+        for item in parser.feed(text[start:start + size]):
+            emitted.append((item, start + size))
+    return emitted
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, 64])
+def test_json_items_are_emitted_before_the_document_ends(size):
+    text = json.dumps({"goal": "研报", "tasks": TASKS, "note": "tasks: ignored"}, ensure_ascii=False, indent=2)
+    parser = IncrementalStructuredParser()
+    emitted = feed_in_chunks(parser, text, size)
+    assert [item for item, _ in emitted] == TASKS
+    assert emitted[0][1] < len(text) - len(json.dumps(TASKS[1:], ensure_ascii=False))
+    document = parser.close()
+    assert document["note"] == "tasks: ignored"
+    assert parser.remaining_items(document) == []
+
+
+def test_fenced_json_with_nested_tasks_key():
+    body = json.dumps({"meta": {"tasks": ["ignored"]}, "tasks": TASKS[:2]}, ensure_ascii=False)
+    text = f"```json\n{body}\n```"
+    parser = IncrementalStructuredParser()
+    emitted = feed_in_chunks(parser, text, 2)
+    assert [item for item, _ in emitted] == TASKS[:2]
+    assert parser.close()["meta"] == {"tasks": ["ignored"]}
+
+
+def test_root_list_mode():
+    text = json.dumps(TASKS, ensure_ascii=False)
+    parser = IncrementalStructuredParser(list_key=None)
+    assert [item for item, _ in feed_in_chunks(parser, text, 5)] == TASKS
+
+
+@pytest.mark.parametrize("size", [1, 4, 50])
+def test_yaml_items_across_chunk_boundaries(size):
+    text = (
+        "```yaml\n"
+        "goal: 研报\n"
+        "tasks:\n"
+        "  - intent: DataCrawlGuild\n"
+        "    query: 商汤\n"
+        "\n"
+        "  - intent: ChartGuild\n"
+        "    spec:\n"
+        "      type: bar\n"
+        "  - intent: ReportGuild\n"
+        "note: done\n"
+        "```"
+    )
+    parser = IncrementalStructuredParser()
+    emitted = feed_in_chunks(parser, text, size)
+    assert [item for item, _ in emitted] == [
+        {"intent": "DataCrawlGuild", "query": "商汤"},
+        {"intent": "ChartGuild", "spec": {"type": "bar"}},
+        {"intent": "ReportGuild"},
+    ]
+    assert emitted[0][1] < text.index("ReportGuild") + size
+    assert parser.close()["note"] == "done"
+
+
+def test_last_item_waits_for_closing_bracket():
+    text = json.dumps({"tasks": TASKS[:2]}, ensure_ascii=False)
+    parser = IncrementalStructuredParser()
+    # 最后一个列表项在闭合的 ] 之前不会产出
+    emitted = feed_in_chunks(parser, text[:-2], 4)
+    assert [item for item, _ in emitted] == TASKS[:1]
+    assert parser.feed(text[-2:]) == TASKS[1:2]
+    document = parser.close()
+    assert parser.remaining_items(document) == []
+
+
+def test_remaining_items_cover_what_feed_missed():
+    parser = IncrementalStructuredParser()
+    # 列表项在行内 YAML 中无法增量识别，由 close 的完整解析兜底
+    parser.feed("tasks: [{intent: A}, {intent: B}]\n")
+    document = parser.close()
+    assert parser.emitted == 0
+    assert parser.remaining_items(document) == [{"intent": "A"}, {"intent": "B"}]
+
+
+@pytest.mark.parametrize("size", [1, 6, 200])
+def test_yaml_nested_key_with_the_list_name_is_ignored(size):
+    text = (
+        "goal: 研报\n"
+        "meta:\n"
+        "  tasks:\n"
+        "    - intent: Ignored\n"
+        "tasks:\n"
+        "  - intent: DataCrawlGuild\n"
+        "    tasks:\n"
+        "      - 子步骤\n"
+        "  - intent: ReportGuild\n"
+    )
+    parser = IncrementalStructuredParser()
+    emitted = [item for item, _ in feed_in_chunks(parser, text, size)]
+    document = parser.close()
+    emitted += parser.remaining_items(document)
+    assert emitted == [
+        {"intent": "DataCrawlGuild", "tasks": ["子步骤"]},
+        {"intent": "ReportGuild"},
+    ]
@@ -0,0 +1,85 @@
+import contextvars
+import json
+import threading
+
+import pytest
+
+from agents.utils import telemetry
+from config.settings import get_settings
+
+
+@pytest.fixture(autouse=True)
+def no_export(monkeypatch):
+    monkeypatch.setattr(get_settings(), "telemetry_export_dir", "")
+    monkeypatch.setattr(get_settings(), "telemetry_otlp_endpoint", "")
+
+
+def test_run_summary_aggregates_by_agent_task_and_span():
+    with telemetry.start_run(run_id="run-1") as run:
+        with telemetry.scope(agent="DataCrawlGuild", task_idx=0), telemetry.span("task"):
+            with telemetry.span("llm.call", prompt_tokens=100, completion_tokens=20, queue_wait_ms=5):
+                pass
+            with telemetry.span("mcp.call_tool", tool="google_news_search"):
+                pass
+        with telemetry.scope(agent="ChartGuild", task_idx=1):
+            with pytest.raises(RuntimeError):
+                with telemetry.span("llm.call", prompt_tokens=50):
+                    raise RuntimeError("接口超时")
+
+    summary = run.summary()
+    assert summary["run_id"] == "run-1"
+    assert summary["total"]["calls"] == 3
+    assert summary["total"]["prompt_tokens"] == 150
+    assert summary["total"]["errors"] == 1
+    assert summary["by_agent"]["DataCrawlGuild"]["calls"] == 2
+    assert summary["by_agent"]["ChartGuild"]["errors"] == 1
+    assert summary["by_task"][0]["completion_tokens"] == 20
+    assert summary["by_task"][0]["queue_wait_ms"] == 5
+    assert summary["by_span"]["llm.call"]["calls"] == 2
+    # task 等非调用span不计入调用统计，但保留在trace中
+    assert "task" not in summary["by_span"]
+    assert {s.name for s in run.spans} == {"orchestrator.dispatch", "task", "llm.call", "mcp.call_tool"}
+
+
+def test_spans_from_worker_threads_join_the_run_with_parent_links():
+    with telemetry.start_run(run_id="run-2") as run:
+        with telemetry.span("task") as task_span:
+            def worker():
+                with telemetry.span("llm.call", prompt_tokens=1):
+                    pass
+            threads = [threading.Thread(target=contextvars.copy_context().run, args=(worker,)) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+    calls = [s for s in run.spans if s.name == "llm.call"]
+    assert len(calls) == 4
+    assert all(s.parent_id == task_span.span_id and s.trace_id == run.trace_id for s in calls)
+    assert all(s.attributes["run_id"] == "run-2" for s in calls)
+    assert run.summary()["total"]["prompt_tokens"] == 4
+
+
+def test_nested_run_reuses_the_outer_trace():
+    with telemetry.start_run(run_id="outer") as outer:
+        with telemetry.start_run(run_id="inner") as inner:
+            with telemetry.span("llm.call"):
+                pass
+    assert inner is outer
+    assert outer.summary()["total"]["calls"] == 1
+    assert telemetry.current_run() is None
+
+
+def test_record_and_otlp_export(tmp_path, monkeypatch):
+    monkeypatch.setattr(get_settings(), "telemetry_export_dir", str(tmp_path))
+    with telemetry.start_run(run_id="run-3") as run:
+        with telemetry.scope(agent="ReportGuild"):
+            telemetry.record("llm.stream", start_ns=0, error="中断", completion_tokens=7)
+
+    with open(tmp_path / "trace_run-3.json", encoding="utf-8") as f:
+        exported = json.load(f)
+    spans = exported["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    stream = next(s for s in spans if s["name"] == "llm.stream")
+    assert stream["status"] == {"code": 2, "message": "中断"}
+    assert {"key": "completion_tokens", "value": {"intValue": "7"}} in stream["attributes"]
+    assert run.summary()["by_agent"]["ReportGuild"]["errors"] == 1
@@ -0,0 +1,105 @@
+import threading
+import time
+
+import pytest
+
+from tools.tool_catalog import ToolCatalog, schema_version
+
+V1 = [{"name": "search", "description": "搜索"}]
+V2 = V1 + [{"name": "chart", "description": "画图"}]
+
+
+class Loader:
+    """按顺序返回预设的工具列表；gate 未放行时阻塞，模拟慢速的 tools/list"""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = 0
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def __call__(self):
+        self.calls += 1
+        self.gate.wait(5)
+        result = self.results[min(self.calls, len(self.results)) - 1]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+def wait_until(condition, timeout=2.0):
+    end = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > end:
+            pytest.fail("条件未在超时前满足")
+        time.sleep(0.01)
+
+
+def make_catalog(loader, ttl=300, snapshot_path=""):
+    return ToolCatalog(ttl_seconds=ttl, snapshot_path=snapshot_path, loader=loader)
+
+
+def test_first_get_loads_synchronously():
+    catalog = make_catalog(Loader(V1))
+    assert catalog.get() == (V1, schema_version(V1))
+    assert schema_version(V2) != schema_version(V1)
+
+
+def test_expired_catalog_is_served_stale_while_revalidating():
+    loader = Loader(V1, V2)
+    catalog = make_catalog(loader, ttl=0.05)
+    notified = []
+    catalog.subscribe(lambda schemas, version: notified.append(version))
+    catalog.get()
+    time.sleep(0.06)
+
+    loader.gate.clear()
+    start = time.monotonic()
+    for _ in range(5):
+        assert catalog.get()[0] == V1
+    assert time.monotonic() - start < 0.5
+    loader.gate.set()
+
+    wait_until(lambda: len(notified) == 2)
+    # 刷新进行中的重复 get 不会再发起新的拉取
+    assert loader.calls == 2
+    assert notified == [schema_version(V1), schema_version(V2)]
+
+
+def test_unchanged_or_failed_refresh_keeps_version_without_notifying():
+    loader = Loader(V1, list(V1), [], RuntimeError("服务不可用"))
+    catalog = make_catalog(loader)
+    catalog.get()
+    notified = []
+    catalog.subscribe(lambda schemas, version: notified.append(version))
+    for _ in range(3):
+        assert catalog.refresh() is False
+    assert catalog.get() == (V1, schema_version(V1))
+    assert notified == []
+
+
+def test_list_changed_notification_refreshes_within_ttl():
+    loader = Loader(V1, V2)
+    catalog = make_catalog(loader)
+    catalog.get()
+    changed = threading.Event()
+    catalog.subscribe(lambda schemas, version: changed.set())
+    catalog.invalidate("server")
+    assert changed.wait(2)
+    assert catalog.get() == (V2, schema_version(V2))
+
+
+def test_snapshot_serves_cold_start_then_refreshes(tmp_path):
+    path = str(tmp_path / "tool_catalog.json")
+    make_catalog(Loader(V1), snapshot_path=path).get()
+
+    loader = Loader(V2)
+    loader.gate.clear()
+    catalog = make_catalog(loader, snapshot_path=path)
+    refreshed = threading.Event()
+    catalog.subscribe(lambda schemas, version: refreshed.set())
+    # 冷启动直接使用快照，后台刷新不阻塞首次 get
+    assert catalog.get() == (V1, schema_version(V1))
+    loader.gate.set()
+    assert refreshed.wait(2)
+    assert make_catalog(Loader(V1), snapshot_path=path).version == schema_version(V2)
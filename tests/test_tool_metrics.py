@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("mcp.server.fastmcp")
+
+from tools.mcp import tool_metrics as metrics_module
+from tools.mcp.tool_metrics import ToolMetrics, instrument_tool
+
+
+def parse(text):
+    """把 Prometheus 文本解析为 {样本名{标签}: 值}，并返回 TYPE 声明"""
+    samples, types = {}, {}
+    for line in text.strip().splitlines():
+        if line.startswith("# TYPE "):
+            _, _, name, kind = line.split(" ")
+            types[name] = kind
+        else:
+            key, value = line.rsplit(" ", 1)
+            samples[key] = float(value)
+    return samples, types
+
+
+def test_durations_land_in_cumulative_buckets():
+    metrics = ToolMetrics(buckets=(0.1, 1.0))
+    for duration in (0.05, 0.1, 0.5, 3.0):
+        metrics.start("read_file")
+        metrics.finish("read_file", duration, error=False, request_bytes=10, response_bytes=100)
+
+    samples, types = parse(metrics.render_prometheus())
+    bucket = 'seven_agents_mcp_tool_duration_seconds_bucket{tool="read_file",le="%s"}'
+    # 上界包含等于边界的值；超过最大上界的只计入 +Inf
+    assert samples[bucket % "0.1"] == 2
+    assert samples[bucket % "1.0"] == 3
+    assert samples[bucket % "+Inf"] == 4
+    assert samples['seven_agents_mcp_tool_duration_seconds_count{tool="read_file"}'] == 4
+    assert samples['seven_agents_mcp_tool_duration_seconds_sum{tool="read_file"}'] == pytest.approx(3.65)
+    assert samples['seven_agents_mcp_tool_request_bytes_total{tool="read_file"}'] == 40
+    assert samples['seven_agents_mcp_tool_in_flight{tool="read_file"}'] == 0
+    assert types["seven_agents_mcp_tool_duration_seconds"] == "histogram"
+    assert types["seven_agents_mcp_tool_in_flight"] == "gauge"
+    assert types["seven_agents_mcp_tool_calls_total"] == "counter"
+
+
+def test_tools_are_rendered_separately_and_in_flight_before_first_finish():
+    metrics = ToolMetrics(buckets=(1.0,))
+    metrics.start("slow_tool")
+    metrics.start("fast_tool")
+    metrics.finish("fast_tool", 0.2, error=True, request_bytes=0, response_bytes=0)
+
+    samples, _ = parse(metrics.render_prometheus())
+    assert samples['seven_agents_mcp_tool_in_flight{tool="slow_tool"}'] == 1
+    assert samples['seven_agents_mcp_tool_calls_total{tool="slow_tool"}'] == 0
+    assert samples['seven_agents_mcp_tool_duration_seconds_bucket{tool="slow_tool",le="+Inf"}'] == 0
+    assert samples['seven_agents_mcp_tool_errors_total{tool="fast_tool"}'] == 1
+    assert metrics.snapshot()["fast_tool"]["calls_total"] == 1
+
+
+def test_instrumented_tool_counts_errors_and_keeps_signature(monkeypatch):
+    metrics = ToolMetrics()
+    monkeypatch.setattr(metrics_module, "tool_metrics", metrics)
+
+    async def lookup(key: str, limit: int = 3):
+        """查询"""
+        if key == "boom":
+            raise RuntimeError("失败")
+        return {"success": key != "missing", "key": key}
+
+    tool = instrument_tool(lookup, "lookup")
+    assert tool.__name__ == "lookup" and tool.__doc__ == "查询"
+
+    async def main():
+        await tool(key="a")
+        await tool(key="missing")
+        with pytest.raises(RuntimeError):
+            await tool(key="boom")
+
+    asyncio.run(main())
+    stats = metrics.snapshot()["lookup"]
+    assert stats["calls_total"] == 3
+    assert stats["errors_total"] == 2
+    assert stats["in_flight"] == 0
+    assert stats["request_bytes_total"] > 0 and stats["response_bytes_total"] > 0
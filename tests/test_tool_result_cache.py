@@ -0,0 +1,166 @@
+import asyncio
+
+import pytest
+
+from tools.tool_result_cache import ToolResultCache
+
+
+def make_cache(cache_dir=""):
+    return ToolResultCache(max_entries=16, cache_dir=cache_dir, default_ttl_seconds=60)
+
+
+def counting_fetch(values, delay=0.0):
+    """依次返回 values 中的结果，记录调用次数"""
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        return values[min(len(calls), len(values)) - 1]
+
+    return fetch, calls
+
+
+def test_waiter_survives_leader_timeout():
+    cache = make_cache()
+    fetch, calls = counting_fetch([{"content": "v"}], delay=0.3)
+
+    async def main():
+        leader = asyncio.ensure_future(asyncio.wait_for(cache.call("read_file", {"file_path": "a.txt"}, fetch), 0.1))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.ensure_future(asyncio.wait_for(cache.call("read_file", {"file_path": "a.txt"}, fetch), 5))
+        with pytest.raises(asyncio.TimeoutError):
+            await leader
+        return await waiter
+
+    assert asyncio.run(main()) == {"content": "v"}
+    # 发起者超时后由等待者重新发起调用
+    assert len(calls) == 2
+
+
+def test_waiter_timeout_does_not_cancel_leader():
+    cache = make_cache()
+    fetch, calls = counting_fetch([{"content": "v"}], delay=0.2)
+
+    async def main():
+        leader = asyncio.ensure_future(cache.call("read_file", {"file_path": "a.txt"}, fetch))
+        await asyncio.sleep(0.01)
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(cache.call("read_file", {"file_path": "a.txt"}, fetch), 0.05)
+        return await leader
+
+    assert asyncio.run(main()) == {"content": "v"}
+    assert len(calls) == 1
+
+
+def test_concurrent_calls_are_coalesced():
+    cache = make_cache()
+    fetch, calls = counting_fetch([{"content": "v"}], delay=0.05)
+
+    async def main():
+        return await asyncio.gather(*(cache.call("read_file", {"file_path": "a.txt"}, fetch) for _ in range(5)))
+
+    assert asyncio.run(main()) == [{"content": "v"}] * 5
+    assert len(calls) == 1
+
+
+@pytest.mark.parametrize("writer", ["write_file", "append_file"])
+def test_read_after_write_is_fresh(writer, tmp_path):
+    cache = make_cache(str(tmp_path))
+    read, reads = counting_fetch([{"content": "old"}, {"content": "new"}])
+    other, others = counting_fetch([{"content": "other"}])
+    write, _ = counting_fetch([{"success": True}])
+
+    async def main():
+        assert await cache.call("read_file", {"file_path": "a.txt"}, read) == {"content": "old"}
+        await cache.call("read_file", {"file_path": "b.txt"}, other)
+        await cache.call(writer, {"file_path": "a.txt", "content": "new"}, write)
+        assert await cache.call("read_file", {"file_path": "a.txt"}, read) == {"content": "new"}
+        await cache.call("read_file", {"file_path": "b.txt"}, other)
+
+    asyncio.run(main())
+    assert len(reads) == 2
+    # 其他文件的缓存不受影响
+    assert len(others) == 1
+
+
+def test_disk_entries_are_invalidated(tmp_path):
+    read, reads = counting_fetch([{"content": "old"}, {"content": "new"}])
+    write, _ = counting_fetch([{"success": True}])
+
+    async def main():
+        await make_cache(str(tmp_path)).call("read_file", {"file_path": "a.txt"}, read)
+        # 另一个进程（新的缓存实例，内存为空）写入同一文件
+        await make_cache(str(tmp_path)).call("write_file", {"file_path": "a.txt", "content": "new"}, write)
+        return await make_cache(str(tmp_path)).call("read_file", {"file_path": "a.txt"}, read)
+
+    assert asyncio.run(main()) == {"content": "new"}
+    assert len(reads) == 2
+
+
+def test_non_select_sql_flushes_query_cache():
+    cache = make_cache()
+    select, selects = counting_fetch([{"rows": [1]}, {"rows": [1, 2]}])
+    insert, _ = counting_fetch([{"success": True}])
+    sql = {"sql": "SELECT id FROM t"}
+
+    async def main():
+        await cache.call("database_execute_sql", sql, select)
+        assert await cache.call("database_execute_sql", sql, select) == {"rows": [1]}
+        await cache.call("database_execute_sql", {"sql": "INSERT INTO t VALUES (2)"}, insert)
+        return await cache.call("database_execute_sql", sql, select)
+
+    assert asyncio.run(main()) == {"rows": [1, 2]}
+    assert len(selects) == 2
+
+
+def test_result_fetched_across_a_write_is_not_cached():
+    cache = make_cache()
+    read, reads = counting_fetch([{"content": "old"}, {"content": "new"}], delay=0.1)
+    write, _ = counting_fetch([{"success": True}])
+
+    async def main():
+        pending = asyncio.ensure_future(cache.call("read_file", {"file_path": "a.txt"}, read))
+        await asyncio.sleep(0.01)
+        await cache.call("write_file", {"file_path": "a.txt", "content": "new"}, write)
+        await pending
+        return await cache.call("read_file", {"file_path": "a.txt"}, read)
+
+    assert asyncio.run(main()) == {"content": "new"}
+    assert len(reads) == 2
+
+
+@pytest.mark.parametrize("params", [
+    {"file_path": "app.log", "tail_lines": 50},
+    {"file_path": "app.log", "offset": 1024},
+    {"file_path": "app.log", "offset": 0, "length": 4096},
+])
+def test_tail_and_offset_reads_are_not_cached(params):
+    cache = make_cache()
+    read, reads = counting_fetch([{"content": "old"}, {"content": "appended"}])
+
+    async def main():
+        await cache.call("read_file", params, read)
+        return await cache.call("read_file", params, read)
+
+    assert asyncio.run(main()) == {"content": "appended"}
+    assert len(reads) == 2
+    assert cache.policy_for("read_file", {"file_path": "app.log", "start_line": 1, "end_line": 10}) is not None
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT id FROM t WHERE id = 1 FOR UPDATE",
+    "select id from t for share",
+    "SELECT id FROM t FOR KEY SHARE SKIP LOCKED",
+    "SELECT nextval('order_seq')",
+    "SELECT pg_advisory_lock(42)",
+    "WITH s AS (SELECT setval('order_seq', 10)) SELECT * FROM s",
+])
+def test_locking_and_side_effecting_selects_are_not_cached(sql):
+    assert make_cache().policy_for("database_execute_sql", {"sql": sql}) is None
+
+
+def test_plain_selects_are_cached():
+    cache = make_cache()
+    assert cache.policy_for("database_execute_sql", {"sql": "SELECT share, next_value FROM t ORDER BY id"}) is not None
+    assert cache.policy_for("database_execute_sql", {"sql": "WITH x AS (SELECT 1) SELECT * FROM x;"}) is not None
@@ -0,0 +1,86 @@
+import pytest
+
+from agents.utils.tool_router import HashingEmbedder, ToolRouter
+
+TOOLS = [
+    {"name": "google_news_search", "description": "search google news articles by keyword",
+     "inputSchema": {"properties": {"keyword": {"description": "search keyword"}}}},
+    {"name": "write_file", "description": "write text content to a local file",
+     "inputSchema": {"properties": {"path": {"description": "file path"}, "content": {"description": "text"}}}},
+    {"name": "database_execute_sql", "description": "execute sql query on the postgres database",
+     "inputSchema": {"properties": {"sql": {"description": "sql statement"}}}},
+]
+
+
+class CountingEmbedder(HashingEmbedder):
+    def __init__(self):
+        super().__init__(dim=1024)
+        self.calls = 0
+
+    def embed(self, texts):
+        self.calls += 1
+        return super().embed(texts)
+
+
+def make_router(**kwargs):
+    kwargs.setdefault("threshold", 0.3)
+    kwargs.setdefault("margin", 0.05)
+    return ToolRouter(embedder=CountingEmbedder(), **kwargs)
+
+
+def test_shortlist_ranks_the_matching_tool_first():
+    router = make_router()
+    router.build(TOOLS)
+    names = [name for name, _ in router.shortlist("search news articles about keyword AI", top_k=3)]
+    assert names[0] == "google_news_search"
+    assert len(names) == 3
+
+
+def test_route_requires_threshold_and_margin():
+    router = make_router()
+    router.build(TOOLS)
+    assert router.route("execute sql query on database") == "database_execute_sql"
+    strict = make_router(threshold=0.99)
+    strict.build(TOOLS)
+    assert strict.route("execute sql query on database") is None
+    # 与多个工具同样相关的请求不直接选定
+    wide = make_router(margin=1.0)
+    wide.build(TOOLS)
+    assert wide.route("execute sql query on database") is None
+
+
+def test_empty_index_routes_nothing():
+    router = make_router()
+    assert router.shortlist("anything") == []
+    assert router.route("anything") is None
+    router.build([])
+    assert router.route("search news") is None
+
+
+def test_build_skips_unchanged_version_and_rebuilds_on_change():
+    router = make_router()
+    router.build(TOOLS, version="v1")
+    router.build(TOOLS, version="v1")
+    assert router.embedder.calls == 1
+    router.build(TOOLS[:1], version="v2")
+    assert router.embedder.calls == 2
+    assert [name for name, _ in router.shortlist("write file", top_k=5)] == ["google_news_search"]
+
+
+class _StaleRouter:
+    """模拟索引已按新目录重建：路由结果不在本次请求拿到的目录中"""
+
+    def route(self, query):
+        return "removed_tool"
+
+    def shortlist(self, query, top_k=5):
+        return [("removed_tool", 0.9)]
+
+
+def test_tool_collective_falls_back_to_llm_when_routed_tool_is_missing():
+    tool_agent = pytest.importorskip("agents.tool_agent")
+    collective = tool_agent.ToolCollective.__new__(tool_agent.ToolCollective)
+    collective._tool_router = _StaleRouter()
+    assert collective._select_tool({"目标": "搜索新闻"}, "搜索新闻", TOOLS) is None
+    assert collective._select_tool({"tool": "write_file"}, "写文件", TOOLS) == "write_file"
+    assert collective._select_tool({"目标": "搜索新闻"}, "搜索新闻", []) is None
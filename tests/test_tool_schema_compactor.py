@@ -0,0 +1,60 @@
+import threading
+
+from agents.utils.tool_schema_compactor import ToolSchemaCompactor
+
+
+def make_tools(n):
+    return [
+        {
+            "name": f"tool_{i}",
+            "description": f"工具 {i} 用于 topic{i} 相关的数据处理",
+            "inputSchema": {"properties": {"q": {"type": "string", "description": "查询"}}, "required": ["q"]},
+        }
+        for i in range(n)
+    ]
+
+
+def test_small_catalog_is_rendered_in_full():
+    tools = make_tools(3)
+    catalog, candidates = ToolSchemaCompactor().render_split(tools, query="topic1", token_budget=10000, top_k=10)
+    assert candidates == ""
+    assert all(t["name"] in catalog for t in tools)
+
+
+def test_catalog_prefix_is_stable_across_queries():
+    compactor = ToolSchemaCompactor()
+    tools = make_tools(30)
+    first, first_candidates = compactor.render_split(tools, query="topic3", token_budget=200, top_k=2)
+    second, second_candidates = compactor.render_split(tools, query="topic17", token_budget=200, top_k=2)
+    assert first == second
+    assert all(f"- {t['name']}:" in first for t in tools)
+    assert "tool_3" in first_candidates and "tool_17" not in first_candidates
+    assert "tool_17" in second_candidates
+
+
+def test_pinned_tools_are_kept_in_candidates():
+    compactor = ToolSchemaCompactor()
+    _, candidates = compactor.render_split(make_tools(30), query="topic3", token_budget=200, top_k=1, pinned=["tool_9"])
+    assert "tool_9" in candidates
+
+
+def test_concurrent_renders_across_versions():
+    compactor = ToolSchemaCompactor()
+    catalogs = [make_tools(5), make_tools(8)]
+    errors = []
+
+    def worker(i):
+        try:
+            for j in range(200):
+                tools = catalogs[(i + j) % 2]
+                text = compactor.render(tools, query="topic1", token_budget=10000, top_k=100)
+                assert text.count("Tool: ") == len(tools)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors
@@ -0,0 +1,130 @@
+"""
+截止时间与取消模块
+通过 contextvar 把运行/任务的截止时间和取消信号从 Orchestrator.dispatch 一路传递到工会、
+ToolCollective 以及 LLM/MCP 调用；各调用按剩余时间收紧自身超时，在调用边界检查取消信号（协作式取消）。
+"""
+
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+
+class TaskCancelled(Exception):
+    """所在运行或任务已被取消（如必需的依赖任务失败）"""
+
+
+class DeadlineExceeded(TaskCancelled):
+    """所在运行或任务的截止时间已过"""
+
+
+class Deadline:
+    """
+    一个截止时间作用域。expires_at 为 time.monotonic() 时间点（None 表示不限时），
+    子作用域的截止时间不晚于父作用域，父作用域取消时子作用域同时视为取消。
+    """
+
+    def __init__(self, seconds: Optional[float] = None, parent: Optional["Deadline"] = None, name: str = ""):
+        self.name = name
+        self.parent = parent
+        expires_at = time.monotonic() + seconds if seconds else None
+        if parent is not None and parent.expires_at is not None:
+            expires_at = parent.expires_at if expires_at is None else min(expires_at, parent.expires_at)
+        self.expires_at = expires_at
+        self._cancelled = threading.Event()
+        self.reason: Optional[str] = None
+
+    def cancel(self, reason: str = "已取消"):
+        self.reason = reason
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set() or (self.parent is not None and self.parent.cancelled)
+
+    @property
+    def cancel_reason(self) -> Optional[str]:
+        if self._cancelled.is_set():
+            return self.reason
+        return self.parent.cancel_reason if self.parent is not None else None
+
+    def remaining(self) -> Optional[float]:
+        """剩余秒数，不限时返回 None"""
+        if self.expires_at is None:
+            return None
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    @property
+    def expired(self) -> bool:
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0
+
+    def check(self):
+        """已取消或已超时时抛出异常，供长流程在调用边界处协作式退出"""
+        if self.cancelled:
+            raise TaskCancelled(self.cancel_reason or "已取消")
+        if self.expired:
+            raise DeadlineExceeded(f"{self.name or '任务'} 已超过截止时间")
+
+
+_current: contextvars.ContextVar[Optional[Deadline]] = contextvars.ContextVar("deadline", default=None)
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current.get()
+
+
+@contextmanager
+def deadline(seconds: Optional[float] = None, name: str = ""):
+    """进入一个截止时间作用域（seconds 为空或0表示只继承外层截止时间），产出 Deadline 对象"""
+    scope = Deadline(seconds, parent=_current.get(), name=name)
+    token = _current.set(scope)
+    try:
+        yield scope
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def use(scope: Deadline):
+    """把已创建的 Deadline 设为当前作用域（如在工作线程中执行由调度方创建、可被外部取消的作业）"""
+    token = _current.set(scope)
+    try:
+        yield scope
+    finally:
+        _current.reset(token)
+
+
+def check():
+    """检查当前作用域的取消与截止时间"""
+    scope = _current.get()
+    if scope is not None:
+        scope.check()
+
+
+def effective_timeout(default: Optional[float] = None) -> Optional[float]:
+    """
+    调用自身的超时与当前剩余时间取较小者（0或None表示不限）。
+    调用前先检查取消状态，剩余时间已耗尽时直接抛出 DeadlineExceeded。
+    """
+    scope = _current.get()
+    if scope is None:
+        return default or None
+    scope.check()
+    remaining = scope.remaining()
+    if remaining is None:
+        return default or None
+    return min(default, remaining) if default else remaining
+
+
+__all__ = [
+    "Deadline",
+    "DeadlineExceeded",
+    "TaskCancelled",
+    "current_deadline",
+    "deadline",
+    "use",
+    "check",
+    "effective_timeout",
+]
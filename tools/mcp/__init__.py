@@ -4,7 +4,58 @@ MCP (Model Context Protocol) 工具包
 提供与外部模型和服务的工具调用功能
 """
 
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
 from mcp.server.fastmcp import FastMCP
+from config.settings import get_settings
+
 mcp = FastMCP("AllToolsDemo")
 
-__all__ = ["mcp"] 
\ No newline at end of file
+# 所有通过 @mcp.tool 注册的工具自动包上指标统计
+_register_tool = mcp.tool
+
+
+def _instrumented_tool(*args, **kwargs):
+    from tools.mcp.tool_metrics import instrument_tool
+    decorator = _register_tool(*args, **kwargs)
+
+    def register(fn):
+        return decorator(instrument_tool(fn, kwargs.get("name") or fn.__name__))
+
+    return register
+
+
+mcp.tool = _instrumented_tool
+
+_tool_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_tool_executor() -> ThreadPoolExecutor:
+    """CPU密集/阻塞型工具逻辑使用的线程池，大小由 MCP_TOOL_THREAD_POOL_SIZE 配置"""
+    global _tool_executor
+    if _tool_executor is None:
+        _tool_executor = ThreadPoolExecutor(
+            max_workers=get_settings().mcp_tool_thread_pool_size,
+            thread_name_prefix="mcp-tool"
+        )
+    return _tool_executor
+
+
+async def run_blocking(func, *args, **kwargs):
+    """把阻塞调用放到工具线程池执行，不占用事件循环"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_tool_executor(), functools.partial(func, *args, **kwargs))
+
+
+def shutdown_tool_executor(wait: bool = True):
+    """等待线程池中进行中的任务完成后关闭（服务优雅停止时调用）"""
+    global _tool_executor
+    if _tool_executor is not None:
+        _tool_executor.shutdown(wait=wait)
+        _tool_executor = None
+
+
+__all__ = ["mcp", "get_tool_executor", "run_blocking", "shutdown_tool_executor"]
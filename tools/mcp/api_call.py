@@ -3,65 +3,45 @@
 API调用工具
 """
 
+from mcp.types import ToolAnnotations
 from tools.mcp import mcp
-import requests
+from tools.mcp.http_client import decode_body, fetch
 
-def _format_response(resp):
-    try:
-        data = resp.json() if resp.headers.get('content-type', '').startswith('application/json') else resp.text
-    except Exception:
-        data = resp.text
-    return {
-        "success": resp.ok,
-        "status_code": resp.status_code,
-        "headers": dict(resp.headers),
-        "data": data
+def _format_response(result):
+    status_code = result["status_code"]
+    response = {
+        "success": 200 <= status_code < 400,
+        "status_code": status_code,
+        "headers": result["headers"],
+        "data": decode_body(result)
     }
+    if result["truncated"]:
+        response["truncated"] = True
+    return response
 
-@mcp.tool(description="发起GET请求，返回响应内容")
-async def api_get(url: str, headers: dict = None):
-    headers = headers or {}
+async def _request(method, url, headers=None, data=None):
     try:
-        resp = requests.get(url, headers=headers, timeout=30)
-        return _format_response(resp)
+        result = await fetch(method, url, headers=headers or {}, json_data=data)
+        return _format_response(result)
     except Exception as e:
         return {"success": False, "error": str(e)}
 
+@mcp.tool(description="发起GET请求，返回响应内容", annotations=ToolAnnotations(readOnlyHint=True, idempotentHint=True))
+async def api_get(url: str, headers: dict = None):
+    return await _request("GET", url, headers)
+
 @mcp.tool(description="发起POST请求，支持JSON数据体")
 async def api_post(url: str, headers: dict = None, data: dict = None):
-    headers = headers or {}
-    data = data or {}
-    try:
-        resp = requests.post(url, headers=headers, json=data, timeout=30)
-        return _format_response(resp)
-    except Exception as e:
-        return {"success": False, "error": str(e)}
+    return await _request("POST", url, headers, data or {})
 
 @mcp.tool(description="发起PUT请求，支持JSON数据体")
 async def api_put(url: str, headers: dict = None, data: dict = None):
-    headers = headers or {}
-    data = data or {}
-    try:
-        resp = requests.put(url, headers=headers, json=data, timeout=30)
-        return _format_response(resp)
-    except Exception as e:
-        return {"success": False, "error": str(e)}
+    return await _request("PUT", url, headers, data or {})
 
 @mcp.tool(description="发起DELETE请求")
 async def api_delete(url: str, headers: dict = None):
-    headers = headers or {}
-    try:
-        resp = requests.delete(url, headers=headers, timeout=30)
-        return _format_response(resp)
-    except Exception as e:
-        return {"success": False, "error": str(e)}
+    return await _request("DELETE", url, headers)
 
 @mcp.tool(description="发起PATCH请求，支持JSON数据体")
 async def api_patch(url: str, headers: dict = None, data: dict = None):
-    headers = headers or {}
-    data = data or {}
-    try:
-        resp = requests.patch(url, headers=headers, json=data, timeout=30)
-        return _format_response(resp)
-    except Exception as e:
-        return {"success": False, "error": str(e)} 
\ No newline at end of file
+    return await _request("PATCH", url, headers, data or {})
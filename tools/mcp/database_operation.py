@@ -1,61 +1,128 @@
 from tools.mcp import mcp
-from sqlalchemy import create_engine, inspect, text
-from sqlalchemy.orm import sessionmaker
-from config.settings import SQLALCHEMY_DATABASE_URL
+from sqlalchemy import text
+from config.settings import get_settings
+from database.engine import get_async_engine
+import base64
+import json
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL, echo=False)
-Session = sessionmaker(bind=engine)
+settings = get_settings()
+
+# 所有工具都通过共享的异步引擎（asyncpg）访问数据库，查询期间不阻塞MCP服务的事件循环
 
 @mcp.tool(description="创建表，传入SQL建表语句")
 async def database_create_table(sql: str):
     """执行CREATE TABLE语句创建新表"""
-    session = Session()
     try:
-        session.execute(text(sql))
-        session.commit()
+        async with get_async_engine().begin() as conn:
+            await conn.execute(text(sql))
         return {"success": True, "message": "表创建成功"}
     except Exception as e:
-        session.rollback()
         return {"success": False, "error": str(e)}
-    finally:
-        session.close()
 
 @mcp.tool(description="删除表，传入表名")
 async def database_drop_table(table_name: str):
     """删除指定表"""
-    session = Session()
     try:
-        session.execute(text(f"DROP TABLE IF EXISTS {table_name}"))
-        session.commit()
+        async with get_async_engine().begin() as conn:
+            await conn.execute(text(f"DROP TABLE IF EXISTS {table_name}"))
         return {"success": True, "message": f"表 {table_name} 已删除"}
     except Exception as e:
-        session.rollback()
         return {"success": False, "error": str(e)}
-    finally:
-        session.close()
 
-@mcp.tool(description="通用SQL查询，支持自定义SQL语句和参数")
-async def database_execute_sql(sql: str, params: dict = None):
+def _is_select(sql):
+    return sql.strip().lower().startswith("select")
+
+
+def _encode_cursor(state):
+    """续页令牌直接携带查询与偏移量，不依赖任何进程内状态，任一工作进程都能接着读下一页"""
+    raw = json.dumps(state, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def _decode_cursor(token):
+    try:
+        state = json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+        sql, offset, max_rows = state["sql"], int(state["offset"]), int(state["max_rows"])
+    except Exception:
+        return None
+    if not _is_select(sql) or offset < 0:
+        return None
+    # 令牌由客户端回传，行数上限仍以服务端配置为准
+    state.update(offset=offset, max_rows=min(max_rows, settings.db_tool_max_rows), params=state.get("params") or {})
+    return state
+
+
+def _encode_rows(columns, rows, encoding):
+    if encoding == "columnar":
+        # 列式编码：列名只出现一次，每列一个值数组，比逐行字典小得多
+        return {"columns": columns, "column_values": [list(col) for col in zip(*rows)] if rows else [[] for _ in columns]}
+    return {"rows": [dict(zip(columns, row)) for row in rows]}
+
+
+async def _read_page(state, page_size, encoding):
+    """
+    按偏移量读取一页：把原查询包成子查询加 LIMIT/OFFSET，多取一行判断是否还有下一页。
+    每页都会重新执行查询，查询需带 ORDER BY 才能保证各页之间顺序稳定。
+    """
+    offset, max_rows = state["offset"], state["max_rows"]
+    limit = min(page_size, max_rows - offset)
+    if limit > 0:
+        paged_sql = f"SELECT * FROM ({state['sql'].strip().rstrip(';')}) AS _cursor_page LIMIT :_cursor_limit OFFSET :_cursor_offset"
+        params = {**state["params"], "_cursor_limit": limit + 1, "_cursor_offset": offset}
+        async with get_async_engine().connect() as conn:
+            result = await conn.execute(text(paged_sql), params)
+            columns = list(result.keys())
+            rows = result.fetchall()
+    else:
+        columns, rows = [], []
+    exhausted = len(rows) <= limit
+    rows = rows[:limit]
+    capped = not exhausted and offset + len(rows) >= max_rows
+    has_more = not exhausted and not capped
+    token = _encode_cursor({**state, "offset": offset + len(rows)}) if has_more else None
+    page = {"success": True, **_encode_rows(columns, rows, encoding), "row_count": len(rows),
+            "has_more": has_more, "cursor": token}
+    if capped:
+        page["truncated"] = True
+        page["message"] = f"已达到行数上限 {max_rows}，如需更多数据请缩小查询范围"
+    return page
+
+
+@mcp.tool(description="通用SQL查询，支持自定义SQL语句和参数；SELECT结果分页返回，has_more为true时用cursor调用database_fetch_cursor获取下一页，encoding=columnar时按列返回")
+async def database_execute_sql(sql: str, params: dict = None, page_size: int = None, max_rows: int = None, encoding: str = "rows"):
     """
     通用SQL执行工具，支持任意查询/写入/更新/删除。
     - sql: SQL语句（如SELECT * FROM tablename WHERE name=:name）
     - params: 参数字典（如{"name": "张三"}）
+    - page_size: 每页行数，默认 DB_TOOL_PAGE_SIZE；DB_TOOL_CURSOR_PAGING=false 时不分页，一次返回至多 max_rows 行
+      （续页令牌携带查询与偏移量，每页重新执行一次查询，需要稳定顺序时请写 ORDER BY）
+    - max_rows: 整个查询最多返回的行数，默认且不超过 DB_TOOL_MAX_ROWS
+    - encoding: rows（逐行字典）或 columnar（列名 + 列值数组）
     """
-    session = Session()
+    page_size = max(1, page_size or settings.db_tool_page_size)
+    max_rows = min(max_rows or settings.db_tool_max_rows, settings.db_tool_max_rows)
+    if not settings.db_tool_cursor_paging:
+        # 不分页：一次读到行数上限
+        page_size = max_rows
+    if _is_select(sql):
+        state = {"sql": sql, "params": params or {}, "offset": 0, "max_rows": max_rows}
+        try:
+            return await _read_page(state, page_size, encoding)
+        except Exception as e:
+            return {"success": False, "error": str(e)}
     try:
-        result = session.execute(text(sql), params or {})
-        if sql.strip().lower().startswith("select"):
-            rows = result.fetchall()
-            # 兼容不同SQLAlchemy版本
-            try:
-                return [dict(row._mapping) for row in rows]
-            except Exception:
-                return [dict(row) for row in rows]
-        else:
-            session.commit()
-            return {"success": True, "rowcount": result.rowcount}
+        async with get_async_engine().begin() as conn:
+            result = await conn.execute(text(sql), params or {})
+        return {"success": True, "rowcount": result.rowcount}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+@mcp.tool(description="获取database_execute_sql分页查询的下一页，传入上一页返回的cursor")
+async def database_fetch_cursor(cursor: str, page_size: int = None, encoding: str = "rows"):
+    state = _decode_cursor(cursor)
+    if state is None:
+        return {"success": False, "error": "游标无效，请重新执行查询"}
+    try:
+        return await _read_page(state, max(1, page_size or settings.db_tool_page_size), encoding)
     except Exception as e:
-        session.rollback()
         return {"success": False, "error": str(e)}
-    finally:
-        session.close() 
\ No newline at end of file
@@ -3,29 +3,223 @@
 文件操作工具
 """
 
-from typing import Dict, Any
-from tools.mcp import mcp
+from typing import Dict, Any, List, Optional, Tuple
+from mcp.types import ToolAnnotations
+from tools.mcp import mcp, run_blocking
+from config.settings import get_settings
+import asyncio
+import mmap
 import os
 
-@mcp.tool(description="读取指定文件内容")
-async def read_file(file_path: str):
+settings = get_settings()
+
+
+def _trim_partial_utf8(data: bytes) -> bytes:
+    """去掉末尾被截断的UTF-8多字节字符，保证分块边界不破坏字符"""
+    for back in range(1, min(4, len(data)) + 1):
+        byte = data[-back]
+        if byte & 0xC0 != 0x80:
+            # 找到首字节，判断该字符是否完整
+            need = 1 if byte < 0x80 else 2 if byte >> 5 == 0x6 else 3 if byte >> 4 == 0xE else 4 if byte >> 3 == 0x1E else 1
+            return data if back >= need else data[:-back]
+    return data
+
+
+def _open_view(f, size: int):
+    """大文件使用内存映射按需读取，小文件直接读入"""
+    if size >= settings.file_tool_mmap_threshold_bytes:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return f.read()
+
+
+def _read_bytes(file_path: str, offset: int, length: int) -> Tuple[bytes, int]:
+    size = os.path.getsize(file_path)
+    with open(file_path, 'rb') as f:
+        if size >= settings.file_tool_mmap_threshold_bytes:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                data = view[offset:offset + length]
+        else:
+            f.seek(offset)
+            data = f.read(length)
+    return data, size
+
+
+def _read_lines(file_path: str, start_line: int, end_line: Optional[int], max_bytes: int) -> Tuple[bytes, int, Optional[int], int]:
+    """读取 [start_line, end_line] 行（从1开始，含两端），超过 max_bytes 时提前停止；返回 (内容, 实际结束行, 下一行起始偏移, 文件大小)"""
+    size = os.path.getsize(file_path)
+    if size == 0:
+        return b"", 0, None, 0
+    with open(file_path, 'rb') as f:
+        view = _open_view(f, size)
+        try:
+            pos, line = 0, 1
+            while line < start_line and pos < size:
+                nl = view.find(b"\n", pos)
+                pos = size if nl < 0 else nl + 1
+                line += 1
+            begin, last_line = pos, line - 1
+            while pos < size and (end_line is None or line <= end_line):
+                nl = view.find(b"\n", pos)
+                stop = size if nl < 0 else nl + 1
+                if stop - begin > max_bytes and pos > begin:
+                    break
+                pos, last_line = stop, line
+                line += 1
+            # 单行超过上限时按字节截断
+            pos = min(pos, begin + max_bytes)
+            data = view[begin:pos]
+        finally:
+            if isinstance(view, mmap.mmap):
+                view.close()
+    return data, last_line, pos if pos < size else None, size
+
+
+def _read_tail(file_path: str, tail_lines: int, max_bytes: int) -> Tuple[bytes, int]:
+    size = os.path.getsize(file_path)
+    if size == 0:
+        return b"", 0
+    with open(file_path, 'rb') as f:
+        view = _open_view(f, size)
+        try:
+            # 从末尾（忽略最后的换行）向前找 tail_lines 个换行符
+            pos = size - 1 if view[size - 1:size] == b"\n" else size
+            for _ in range(tail_lines):
+                pos = view.rfind(b"\n", 0, pos)
+                if pos < 0:
+                    break
+            begin = max(pos + 1, size - max_bytes)
+            data = view[begin:size]
+        finally:
+            if isinstance(view, mmap.mmap):
+                view.close()
+    return data, size
+
+
+def _file_metadata(file_path: str) -> Dict[str, Any]:
+    stat = os.stat(file_path)
+    with open(file_path, 'rb') as f:
+        preview = _trim_partial_utf8(f.read(settings.file_tool_preview_bytes))
+    return {
+        "size": stat.st_size,
+        "modified": stat.st_mtime,
+        "preview": preview.decode('utf-8', errors='replace'),
+        "next_offset": len(preview),
+    }
+
+
+@mcp.tool(
+    description="读取指定文件内容；大文件请用 offset/length（字节范围）、start_line/end_line（行范围）或 tail_lines（末尾N行）分段读取，按返回的 next_offset 继续读取",
+    annotations=ToolAnnotations(readOnlyHint=True, idempotentHint=True)
+)
+async def read_file(
+    file_path: str,
+    offset: int = None,
+    length: int = None,
+    start_line: int = None,
+    end_line: int = None,
+    tail_lines: int = None
+):
     if not file_path:
         return {"success": False, "error": "缺少file_path参数"}
+    max_bytes = settings.file_tool_max_read_bytes
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
+        if tail_lines:
+            data, size = await run_blocking(_read_tail, file_path, tail_lines, max_bytes)
+            return {"success": True, "content": data.decode('utf-8', errors='replace'), "size": size,
+                    "truncated": len(data) >= max_bytes}
+        if start_line or end_line:
+            data, last_line, next_offset, size = await run_blocking(
+                _read_lines, file_path, max(1, start_line or 1), end_line, max_bytes
+            )
+            return {"success": True, "content": data.decode('utf-8', errors='replace'), "size": size,
+                    "end_line": last_line, "next_offset": next_offset}
+        if offset is not None or length is not None:
+            offset = max(0, offset or 0)
+            length = min(length or max_bytes, max_bytes)
+            data, size = await run_blocking(_read_bytes, file_path, offset, length)
+            if offset + len(data) < size:
+                data = _trim_partial_utf8(data)
+            next_offset = offset + len(data)
+            return {"success": True, "content": data.decode('utf-8', errors='replace'), "size": size,
+                    "offset": offset, "next_offset": next_offset if next_offset < size else None}
+        size = os.path.getsize(file_path)
+        if size > max_bytes:
+            # 大小保护：只返回元信息和开头预览，由调用方按需分段读取
+            metadata = await run_blocking(_file_metadata, file_path)
+            return {"success": True, "truncated": True, **metadata,
+                    "message": f"文件大小 {size} 字节超过单次读取上限 {max_bytes}，请按范围分段读取"}
+        content = await run_blocking(_read_text, file_path)
         return {"success": True, "content": content}
     except Exception as e:
         return {"success": False, "error": str(e)}
 
+
+def _read_text(file_path: str) -> str:
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def _ensure_parent(file_path: str):
+    directory = os.path.dirname(file_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+
+def _write(file_path: str, mode: str, chunks: List[str]):
+    _ensure_parent(file_path)
+    with open(file_path, mode, encoding='utf-8', buffering=settings.file_tool_write_buffer_bytes) as f:
+        f.writelines(chunks)
+
+
+class _AppendBatcher:
+    """
+    同一文件的并发追加合并为一次写入：先到的调用安排刷盘，同一轮事件循环内到达的追加一起写入；
+    每个调用都等待自己所在批次落盘后才返回。同一文件的覆盖写入与追加按到达顺序串行。
+    """
+
+    def __init__(self):
+        self._pending: Dict[str, List[Tuple[str, asyncio.Future]]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def lock(self, file_path: str) -> asyncio.Lock:
+        key = os.path.abspath(file_path)
+        if key not in self._locks:
+            self._locks[key] = asyncio.Lock()
+        return self._locks[key]
+
+    async def append(self, file_path: str, content: str):
+        key = os.path.abspath(file_path)
+        future = asyncio.get_running_loop().create_future()
+        batch = self._pending.get(key)
+        if batch is None:
+            batch = self._pending[key] = []
+            asyncio.create_task(self._flush(file_path, key))
+        batch.append((content, future))
+        await future
+
+    async def _flush(self, file_path: str, key: str):
+        async with self.lock(file_path):
+            batch = self._pending.pop(key, [])
+            try:
+                await run_blocking(_write, file_path, 'a', [content for content, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                return
+            for _, future in batch:
+                future.set_result(None)
+
+
+_append_batcher = _AppendBatcher()
+
+
 @mcp.tool(description="写入内容到指定文件（覆盖模式）")
 async def write_file(file_path: str, content: str):
     if not file_path:
         return {"success": False, "error": "缺少file_path参数"}
     try:
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(content)
+        async with _append_batcher.lock(file_path):
+            await run_blocking(_write, file_path, 'w', [content])
         return {"success": True, "message": f"文件 {file_path} 写入成功"}
     except Exception as e:
         return {"success": False, "error": str(e)}
@@ -35,9 +229,7 @@ async def append_file(file_path: str, content: str):
     if not file_path:
         return {"success": False, "error": "缺少file_path参数"}
     try:
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        with open(file_path, 'a', encoding='utf-8') as f:
-            f.write(content)
+        await _append_batcher.append(file_path, content)
         return {"success": True, "message": f"文件 {file_path} 追加成功"}
     except Exception as e:
-        return {"success": False, "error": str(e)} 
\ No newline at end of file
+        return {"success": False, "error": str(e)}
@@ -1,17 +1,98 @@
-from tools.mcp import mcp
+from mcp.types import ToolAnnotations
+from tools.mcp import mcp, run_blocking
+from tools.mcp.http_client import fetch
 from datetime import datetime
-import requests
+from urllib.parse import quote_plus
 from bs4 import BeautifulSoup
+import asyncio
 import logging
+import math
+import soupsieve
 
-@mcp.tool(description="谷歌新闻搜索，支持关键词、时间范围和最大条数")
+logger = logging.getLogger("google_news_search")
+logger.setLevel(logging.INFO)
+if not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    logger.addHandler(_handler)
+
+# 优先使用 lxml 解析（C实现，明显快于纯Python的 html.parser），未安装时回退
+try:
+    import lxml  # noqa: F401
+    _HTML_PARSER = "lxml"
+except ImportError:
+    _HTML_PARSER = "html.parser"
+
+# 预编译CSS选择器，避免每个结果条目重复解析选择器
+_RESULT_SELECTOR = soupsieve.compile('div.SoaBEf')
+_LINK_SELECTOR = soupsieve.compile('a.WlydOe')
+_TITLE_SELECTOR = soupsieve.compile('div.n0jPhd')
+_DESC_SELECTOR = soupsieve.compile('div.GI74Re')
+_SOURCE_SELECTOR = soupsieve.compile('div.MgUUmf span')
+_DATE_SELECTORS = (soupsieve.compile('div.LfVVr span'), soupsieve.compile('div.OSrXXb span'))
+
+_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/120.0.0.0 Safari/537.36"
+    ),
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.5",
+    "Accept-Encoding": "gzip, deflate",
+    "DNT": "1",
+    "Connection": "keep-alive",
+    "Upgrade-Insecure-Requests": "1",
+}
+_RESULTS_PER_PAGE = 10
+_MAX_PAGES = 3
+
+
+def _text(el, selector):
+    tag = selector.select_one(el)
+    return tag.get_text(strip=True) if tag else ''
+
+
+def _parse_page(content):
+    """解析一页搜索结果（CPU密集，在线程池中执行）"""
+    soup = BeautifulSoup(content, _HTML_PARSER)
+    items = []
+    for el in _RESULT_SELECTOR.select(soup):
+        a_tag = _LINK_SELECTOR.select_one(el)
+        news_url = a_tag['href'] if a_tag and a_tag.has_attr('href') else ''
+        title = _text(el, _TITLE_SELECTOR)
+        date = ''
+        for selector in _DATE_SELECTORS:
+            date = _text(el, selector)
+            if date:
+                break
+        if title and news_url:
+            items.append({
+                'title': title,
+                'url': news_url,
+                'snippet': _text(el, _DESC_SELECTOR),
+                'source': _text(el, _SOURCE_SELECTOR),
+                'date': date
+            })
+    return items
+
+
+async def _fetch_page(query, tbs, page):
+    url = (
+        f"https://www.google.com/search?q={quote_plus(query)}"
+        f"{tbs}"
+        f"&tbm=nws&start={page * _RESULTS_PER_PAGE}"
+    )
+    logger.info(f"搜索第 {page + 1} 页: {url}")
+    result = await fetch("GET", url, headers=_HEADERS, timeout=15)
+    logger.info(f"实际返回URL: {result['url']}")
+    if result["status_code"] >= 400:
+        raise RuntimeError(f"HTTP {result['status_code']}")
+    return await run_blocking(_parse_page, result["content"])
+
+
+@mcp.tool(description="谷歌新闻搜索，支持关键词、时间范围和最大条数", annotations=ToolAnnotations(readOnlyHint=True, idempotentHint=True))
 async def google_news_search(query: str, max_results: int = 5, start_date: str = None, end_date: str = None):
-    logger = logging.getLogger("google_news_search")
-    logger.setLevel(logging.INFO)
-    if not logger.handlers:
-        handler = logging.StreamHandler()
-        handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
-        logger.addHandler(handler)
     tbs = ""
     if start_date and end_date:
         if "-" in start_date:
@@ -23,77 +104,36 @@ async def google_news_search(query: str, max_results: int = 5, start_date: str =
         else:
             end_date_fmt = end_date
         tbs = f"&tbs=cdr:1,cd_min:{start_date_fmt},cd_max:{end_date_fmt}"
-    headers = {
-        "User-Agent": (
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-            "AppleWebKit/537.36 (KHTML, like Gecko) "
-            "Chrome/120.0.0.0 Safari/537.36"
-        ),
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
-        "Accept-Language": "en-US,en;q=0.5",
-        "Accept-Encoding": "gzip, deflate",
-        "DNT": "1",
-        "Connection": "keep-alive",
-        "Upgrade-Insecure-Requests": "1",
-    }
     news_results = []
+    # 按还差的结果数并发抓取后续页面，页面按顺序消费；结果够数后取消仍在进行的请求
+    tasks = {}
     page = 0
-    max_pages = 3
-    while page < max_pages and len(news_results) < max_results:
-        offset = page * 10
-        url = (
-            f"https://www.google.com/search?q={query}"
-            f"{tbs}"
-            f"&tbm=nws&start={offset}"
-        )
-        logger.info(f"搜索第 {page + 1} 页: {url}")
-        try:
-            response = requests.get(url, headers=headers, timeout=15)
-            logger.info(f"实际返回URL: {response.url}")
-            logger.debug(f"部分HTML: {response.text[:1000]}")
-            response.raise_for_status()
-            soup = BeautifulSoup(response.content, "html.parser")
-        except Exception as e:
-            logger.error(f"Google News搜索请求或解析失败: {e}")
-            break
-        try:
-            results_on_page = soup.select('div.SoaBEf')
-            logger.debug(f"使用选择器 'div.SoaBEf' 查找新闻结果，数量: {len(results_on_page)}")
-            if not results_on_page:
+    try:
+        while page < _MAX_PAGES and len(news_results) < max_results:
+            wanted = math.ceil((max_results - len(news_results)) / _RESULTS_PER_PAGE)
+            for p in range(page, min(_MAX_PAGES, page + wanted)):
+                if p not in tasks:
+                    tasks[p] = asyncio.create_task(_fetch_page(query, tbs, p))
+            try:
+                items = await tasks[page]
+            except Exception as e:
+                logger.error(f"Google News搜索请求或解析失败: {e}")
+                break
+            if not items:
                 logger.warning(f"页面 {page + 1} 没有找到新闻结果，选择器未命中")
                 break
-            logger.info(f"页面 {page + 1} 找到 {len(results_on_page)} 个新闻结果")
-            for el in results_on_page:
-                if len(news_results) >= max_results:
-                    break
-                a_tag = el.select_one('a.WlydOe')
-                news_url = a_tag['href'] if a_tag and a_tag.has_attr('href') else ''
-                title_tag = el.select_one('div.n0jPhd')
-                title = title_tag.get_text(strip=True) if title_tag else ''
-                desc_tag = el.select_one('div.GI74Re')
-                description = desc_tag.get_text(strip=True) if desc_tag else ''
-                source_tag = el.select_one('div.MgUUmf span')
-                source = source_tag.get_text(strip=True) if source_tag else ''
-                date_tag = el.select_one('div.LfVVr span')
-                if not date_tag:
-                    date_tag = el.select_one('div.OSrXXb span')
-                date = date_tag.get_text(strip=True) if date_tag else ''
-                if title and news_url:
-                    news_results.append({
-                        'title': title,
-                        'url': news_url,
-                        'snippet': description,
-                        'source': source,
-                        'date': date
-                    })
-                    logger.debug(f"添加新闻结果: {title[:50]}...")
-        except Exception as e:
-            logger.error(f"Google News结果解析失败: {e}")
-            break
-        page += 1
+            logger.info(f"页面 {page + 1} 找到 {len(items)} 个新闻结果")
+            news_results.extend(items[:max_results - len(news_results)])
+            page += 1
+    finally:
+        for task in tasks.values():
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled():
+                task.exception()
     logger.info(f"Google News搜索完成，共找到 {len(news_results)} 个结果")
     return {
         "query": query,
         "results": news_results[:max_results],
         "total_results": len(news_results)
-    } 
\ No newline at end of file
+    }
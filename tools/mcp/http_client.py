@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+MCP工具共享的异步HTTP客户端
+连接池复用（keep-alive）、全局与单主机连接数限制、可配置超时，响应体流式读取并按上限截断。
+"""
+
+import asyncio
+import json
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from config.settings import get_settings
+
+_client: Optional[httpx.AsyncClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+_host_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """获取当前事件循环上的共享客户端（客户端与事件循环绑定，循环变化时重新创建）"""
+    global _client, _client_loop, _host_semaphores
+    loop = asyncio.get_running_loop()
+    if _client is None or _client_loop is not loop or _client.is_closed:
+        settings = get_settings()
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(settings.http_tool_timeout_seconds, connect=settings.http_tool_connect_timeout_seconds),
+            limits=httpx.Limits(
+                max_connections=settings.http_tool_max_connections,
+                max_keepalive_connections=settings.http_tool_max_keepalive_connections,
+            ),
+            follow_redirects=True,
+        )
+        _client_loop = loop
+        _host_semaphores = {}
+    return _client
+
+
+def _host_semaphore(url: str) -> asyncio.Semaphore:
+    host = urlsplit(url).netloc
+    semaphore = _host_semaphores.get(host)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(get_settings().http_tool_max_connections_per_host)
+        _host_semaphores[host] = semaphore
+    return semaphore
+
+
+async def fetch(
+    method: str,
+    url: str,
+    headers: Optional[dict] = None,
+    json_data: Optional[dict] = None,
+    max_bytes: Optional[int] = None,
+    timeout: Optional[float] = None,
+) -> Dict[str, Any]:
+    """
+    发起请求并流式读取响应体，超过 max_bytes（默认 HTTP_TOOL_MAX_RESPONSE_BYTES）时截断。
+
+    Returns:
+        {"status_code", "headers", "content", "truncated", "encoding", "url"}
+    """
+    max_bytes = get_settings().http_tool_max_response_bytes if max_bytes is None else max_bytes
+    client = get_http_client()
+    request = client.build_request(
+        method, url, headers=headers or {}, json=json_data,
+        timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT,
+    )
+    async with _host_semaphore(url):
+        response = await client.send(request, stream=True)
+        try:
+            chunks, size, truncated = [], 0, False
+            async for chunk in response.aiter_bytes():
+                if size + len(chunk) > max_bytes:
+                    chunks.append(chunk[:max_bytes - size])
+                    truncated = True
+                    break
+                chunks.append(chunk)
+                size += len(chunk)
+        finally:
+            await response.aclose()
+    return {
+        "status_code": response.status_code,
+        "headers": dict(response.headers),
+        "content": b"".join(chunks),
+        "truncated": truncated,
+        "encoding": response.encoding or "utf-8",
+        "url": str(response.url),
+    }
+
+
+def decode_body(result: Dict[str, Any]) -> Any:
+    """按 content-type 解析响应体：未截断的JSON返回对象，其余返回文本"""
+    text = result["content"].decode(result["encoding"], errors="replace")
+    if result["headers"].get("content-type", "").startswith("application/json") and not result["truncated"]:
+        try:
+            return json.loads(text)
+        except ValueError:
+            return text
+    return text
+
+
+async def close_http_client():
+    """关闭共享客户端（服务停止时调用）"""
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
+
+
+__all__ = ["get_http_client", "fetch", "decode_body", "close_http_client"]
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+MCP工具指标
+为每个 @mcp.tool 统计调用次数、错误数、耗时直方图、进行中调用数和请求/响应大小，
+以 Prometheus 文本格式输出，并可记录慢调用。指标按进程统计，多工作进程时需逐个进程采集。
+"""
+
+import functools
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, List
+
+from config.settings import get_settings
+
+logger = logging.getLogger("mcp_tool_metrics")
+
+# 耗时直方图的桶上界（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _payload_size(value: Any) -> int:
+    try:
+        return len(json.dumps(value, ensure_ascii=False, default=str).encode('utf-8'))
+    except Exception:
+        return 0
+
+
+def _is_error(result: Any) -> bool:
+    return isinstance(result, dict) and result.get("success") is False
+
+
+class ToolMetrics:
+    """进程级工具指标注册表"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        self._histograms: Dict[str, List[int]] = defaultdict(lambda: [0] * (len(self.buckets) + 1))
+        self._in_flight: Dict[str, int] = defaultdict(int)
+
+    def start(self, tool: str):
+        with self._lock:
+            self._in_flight[tool] += 1
+
+    def finish(self, tool: str, duration: float, error: bool, request_bytes: int, response_bytes: int):
+        with self._lock:
+            self._in_flight[tool] -= 1
+            counter = self._counters[tool]
+            counter["calls_total"] += 1
+            counter["errors_total"] += 1 if error else 0
+            counter["duration_seconds_sum"] += duration
+            counter["request_bytes_total"] += request_bytes
+            counter["response_bytes_total"] += response_bytes
+            histogram = self._histograms[tool]
+            for idx, bound in enumerate(self.buckets):
+                if duration <= bound:
+                    histogram[idx] += 1
+                    break
+            else:
+                histogram[-1] += 1
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """按工具返回当前统计（便于日志或调试）"""
+        with self._lock:
+            return {
+                tool: {**counter, "in_flight": self._in_flight.get(tool, 0)}
+                for tool, counter in self._counters.items()
+            }
+
+    def render_prometheus(self) -> str:
+        prefix = "seven_agents_mcp_tool"
+        with self._lock:
+            tools = sorted(set(self._counters) | set(self._in_flight))
+            counters = {t: dict(self._counters.get(t, {})) for t in tools}
+            histograms = {t: list(self._histograms.get(t, [0] * (len(self.buckets) + 1))) for t in tools}
+            in_flight = dict(self._in_flight)
+        lines = []
+        for metric in ("calls_total", "errors_total", "request_bytes_total", "response_bytes_total"):
+            lines.append(f"# TYPE {prefix}_{metric} counter")
+            for tool in tools:
+                lines.append(f'{prefix}_{metric}{{tool="{tool}"}} {counters[tool].get(metric, 0)}')
+        lines.append(f"# TYPE {prefix}_in_flight gauge")
+        for tool in tools:
+            lines.append(f'{prefix}_in_flight{{tool="{tool}"}} {in_flight.get(tool, 0)}')
+        lines.append(f"# TYPE {prefix}_duration_seconds histogram")
+        for tool in tools:
+            cumulative = 0
+            for bound, count in zip(self.buckets, histograms[tool]):
+                cumulative += count
+                lines.append(f'{prefix}_duration_seconds_bucket{{tool="{tool}",le="{bound}"}} {cumulative}')
+            cumulative += histograms[tool][-1]
+            lines.append(f'{prefix}_duration_seconds_bucket{{tool="{tool}",le="+Inf"}} {cumulative}')
+            lines.append(f'{prefix}_duration_seconds_sum{{tool="{tool}"}} {counters[tool].get("duration_seconds_sum", 0)}')
+            lines.append(f'{prefix}_duration_seconds_count{{tool="{tool}"}} {cumulative}')
+        return "\n".join(lines) + "\n"
+
+
+tool_metrics = ToolMetrics()
+
+
+def instrument_tool(func, tool_name: str):
+    """包装异步工具函数，记录指标并按 MCP_TOOL_SLOW_CALL_SECONDS 记录慢调用；保留原函数签名供FastMCP生成schema"""
+    slow_seconds = get_settings().mcp_tool_slow_call_seconds
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        tool_metrics.start(tool_name)
+        started = time.perf_counter()
+        result, error = None, True
+        try:
+            result = await func(*args, **kwargs)
+            error = _is_error(result)
+            return result
+        finally:
+            duration = time.perf_counter() - started
+            tool_metrics.finish(tool_name, duration, error, _payload_size(kwargs), _payload_size(result))
+            if slow_seconds and duration >= slow_seconds:
+                logger.warning(f"[MCP工具] 慢调用 {tool_name} 耗时 {duration:.2f}s，参数: {json.dumps(kwargs, ensure_ascii=False, default=str)[:500]}")
+
+    return wrapper
+
+
+__all__ = ["ToolMetrics", "tool_metrics", "instrument_tool", "LATENCY_BUCKETS"]
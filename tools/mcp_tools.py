@@ -6,15 +6,20 @@ MCP (Model Context Protocol) 工具模块
 """
 
 import asyncio
+import atexit
 import json
 import logging
 import os
 import shutil
+import threading
 from contextlib import AsyncExitStack
-from typing import Any, Dict, Optional, List
+from typing import Any, Callable, Dict, Optional, List
 from dotenv import load_dotenv
+from mcp import types as mcp_types
 from mcp.client.session import ClientSession
 from mcp.client.stdio import stdio_client
+from config.settings import get_settings
+from tools import deadline, scheduler
 
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
@@ -34,6 +39,24 @@ class Configuration:
         with open(file_path, "r", encoding="utf-8") as f:
             return json.load(f)
 
+# 收到服务端 notifications/tools/list_changed 时依次调用的回调（如工具目录失效）
+_tool_list_changed_handlers: List[Callable[[str], None]] = []
+
+
+def on_tool_list_changed(callback: Callable[[str], None]) -> None:
+    """注册工具列表变更回调，参数为发出通知的服务名"""
+    if callback not in _tool_list_changed_handlers:
+        _tool_list_changed_handlers.append(callback)
+
+
+def _dump_annotations(annotations: Any) -> Optional[dict]:
+    if annotations is None or isinstance(annotations, dict):
+        return annotations
+    if hasattr(annotations, "model_dump"):
+        return annotations.model_dump(exclude_none=True)
+    return None
+
+
 class Server:
     def __init__(self, name: str, config: dict) -> None:
         self.name = name
@@ -43,6 +66,65 @@ class Server:
         self.is_http = bool(config.get("url"))
         self.url = config.get("url")
         self.transport_type = config.get("transport_type", "sse")
+        # 正在进行中的请求数，用于副本间的最少未完成请求负载均衡
+        self.outstanding = 0
+        self._connect_lock: Optional[asyncio.Lock] = None
+        self._stop_event: Optional[asyncio.Event] = None
+        self._runner: Optional[asyncio.Task] = None
+
+    async def connect(self) -> None:
+        """
+        建立持久会话（幂等）。会话由一个常驻任务打开并持有，
+        保证 sse/stdio 客户端的上下文在同一个任务中进入和退出。
+        """
+        if self.session:
+            return
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+        async with self._connect_lock:
+            if self.session:
+                return
+            ready = asyncio.get_running_loop().create_future()
+            self._stop_event = asyncio.Event()
+            self._runner = asyncio.create_task(self._hold_session(ready))
+            await ready
+
+    async def _hold_session(self, ready: asyncio.Future) -> None:
+        try:
+            await self.initialize()
+        except BaseException as e:
+            await self.cleanup()
+            if not ready.done():
+                ready.set_exception(e)
+            return
+        ready.set_result(None)
+        try:
+            await self._stop_event.wait()
+        finally:
+            await self.cleanup()
+
+    async def disconnect(self) -> None:
+        """关闭持久会话，下次调用时自动重连"""
+        runner, self._runner = self._runner, None
+        self.session = None
+        if self._stop_event is not None:
+            self._stop_event.set()
+        if runner is not None:
+            try:
+                await asyncio.wait_for(runner, timeout=5)
+            except Exception as e:
+                logging.warning(f"Error closing session of server {self.name}: {e}")
+
+    async def _handle_message(self, message: Any) -> None:
+        """处理服务端主动推送的消息，目前只关心工具列表变更通知"""
+        notification = getattr(message, "root", message)
+        if isinstance(notification, mcp_types.ToolListChangedNotification):
+            logging.info(f"[MCP工具] 服务 {self.name} 的工具列表已变更")
+            for callback in list(_tool_list_changed_handlers):
+                try:
+                    callback(self.name)
+                except Exception as e:
+                    logging.error(f"[MCP工具] 工具列表变更回调异常: {e}")
 
     async def initialize(self) -> None:
         if self.is_http:
@@ -54,7 +136,7 @@ class Server:
             else:
                 client_ctx = streamablehttp_client(url=self.url)
                 read_stream, write_stream, _ = await self.exit_stack.enter_async_context(client_ctx)
-            session = await self.exit_stack.enter_async_context(ClientSession(read_stream, write_stream))
+            session = await self.exit_stack.enter_async_context(ClientSession(read_stream, write_stream, message_handler=self._handle_message))
             await session.initialize()
             self.session = session
             return
@@ -77,7 +159,7 @@ class Server:
         try:
             stdio_transport = await self.exit_stack.enter_async_context(stdio_client(server_params))
             read, write = stdio_transport
-            session = await self.exit_stack.enter_async_context(ClientSession(read, write))
+            session = await self.exit_stack.enter_async_context(ClientSession(read, write, message_handler=self._handle_message))
             await session.initialize()
             self.session = session
         except Exception as e:
@@ -110,7 +192,8 @@ class Server:
                     "description": getattr(tool, "description", ""),
                     "inputSchema": getattr(tool, "inputSchema", {}),
                     "outputSchema": getattr(tool, "outputSchema", {}),
-                    "title": getattr(tool, "title", None)
+                    "title": getattr(tool, "title", None),
+                    "annotations": _dump_annotations(getattr(tool, "annotations", None))
                 })
         return result
 
@@ -140,9 +223,162 @@ class Server:
         except Exception as e:
             logging.error(f"Error during cleanup of server {self.name}: {e}")
 
+class ServerPool:
+    """
+    MCP服务池：加载 mcp_servers.json 中的全部服务，维护 工具名→服务 的路由表。
+
+    同一服务可配置多个副本（"urls": [...]，或stdio服务的 "replicas": N），
+    调用时选择未完成请求最少的副本。连接失败（请求尚未发出）时总是切换到下一个副本；
+    请求发出后的失败先在同一副本上按 execute_tool 的次数重试（与单副本时一致），
+    仍失败时只有注解声明为幂等/只读的工具才切换到其他副本，其余工具不跨副本重复执行。
+    各服务的会话持久保持，不同服务上的工具可以并发调用。
+    """
+
+    def __init__(self, config: dict) -> None:
+        servers = config.get('mcpServers', {})
+        if not servers:
+            raise RuntimeError("mcpServers.json未配置任何MCP服务")
+        self.groups: Dict[str, List[Server]] = {
+            name: self._expand(name, conf) for name, conf in servers.items()
+        }
+        self.default_group = next(iter(self.groups))
+        self.routes: Dict[str, str] = {}
+        # 工具名 -> 服务端声明的注解（readOnlyHint/idempotentHint 等），决定失败后能否重试
+        self.annotations: Dict[str, dict] = {}
+        self._cursor = 0
+
+    @staticmethod
+    def _expand(name: str, conf: dict) -> List[Server]:
+        urls = conf.get("urls") or ([conf["url"]] if conf.get("url") else [])
+        if urls:
+            configs = [{**conf, "url": url} for url in urls]
+        else:
+            configs = [dict(conf) for _ in range(max(1, int(conf.get("replicas", 1))))]
+        if len(configs) == 1:
+            return [Server(name, configs[0])]
+        return [Server(f"{name}[{i}]", c) for i, c in enumerate(configs)]
+
+    def candidates(self, group: str) -> List[Server]:
+        """按未完成请求数从少到多排列副本，数量相同时轮转起点以分摊负载"""
+        replicas = self.groups[group]
+        self._cursor = (self._cursor + 1) % len(replicas)
+        rotated = replicas[self._cursor:] + replicas[:self._cursor]
+        return sorted(rotated, key=lambda s: s.outstanding)
+
+    def route(self, tool_name: str, server_name: Optional[str] = None) -> str:
+        if server_name:
+            if server_name not in self.groups:
+                raise RuntimeError(f"未配置MCP服务: {server_name}")
+            return server_name
+        return self.routes.get(tool_name, self.default_group)
+
+    async def _list_group(self, group: str) -> List[dict]:
+        last_error = None
+        for server in self.candidates(group):
+            try:
+                await server.connect()
+                return await server.list_tools()
+            except Exception as e:
+                last_error = e
+                logging.warning(f"[MCP工具] 服务 {server.name} 工具列表获取失败: {e}")
+                await server.disconnect()
+        raise last_error
+
+    async def list_tools(self, server_name: Optional[str] = None) -> List[dict]:
+        """并发列出各服务的工具并重建路由表；同名工具以配置中靠前的服务为准"""
+        groups = [server_name] if server_name else list(self.groups)
+        results = await asyncio.gather(*(self._list_group(g) for g in groups), return_exceptions=True)
+        tools, routes = [], {}
+        for group, result in zip(groups, results):
+            if isinstance(result, BaseException):
+                logging.error(f"[MCP工具] 服务 {group} 不可用: {result}")
+                continue
+            for tool in result:
+                name = tool.get("name")
+                if name in routes:
+                    logging.warning(f"[MCP工具] 工具 {name} 同时存在于 {routes[name]} 与 {group}，使用 {routes[name]}")
+                    continue
+                routes[name] = group
+                self.annotations[name] = tool.get("annotations") or {}
+                tools.append(tool)
+        if server_name:
+            self.routes.update(routes)
+        else:
+            self.routes = routes
+        return tools
+
+    def is_idempotent(self, tool_name: str) -> bool:
+        """工具注解声明了 idempotentHint 或 readOnlyHint 时，重复执行不会产生额外副作用"""
+        annotations = self.annotations.get(tool_name) or {}
+        return any(annotations.get(key) for key in ("idempotentHint", "idempotent_hint", "readOnlyHint", "read_only_hint"))
+
+    async def call_tool(self, tool_name: str, arguments: dict, server_name: Optional[str] = None, **kwargs) -> Any:
+        if not self.routes and not server_name and len(self.groups) > 1:
+            await self.list_tools()
+        group = self.route(tool_name, server_name)
+        if len(self.groups[group]) > 1 and tool_name not in self.annotations:
+            # 有多个副本时需要知道工具是否幂等才能决定失败后能否切换副本
+            try:
+                await self.list_tools(group)
+            except Exception as e:
+                logging.warning(f"[MCP工具] 服务 {group} 工具注解获取失败: {e}")
+        idempotent = self.is_idempotent(tool_name)
+        last_error = None
+        for server in self.candidates(group):
+            server.outstanding += 1
+            try:
+                try:
+                    await server.connect()
+                except Exception as e:
+                    # 请求尚未发出，换副本是安全的
+                    last_error = e
+                    logging.warning(f"[MCP工具] 副本 {server.name} 连接失败，尝试下一个副本: {e}")
+                    await server.disconnect()
+                    continue
+                try:
+                    return await server.execute_tool(tool_name, arguments, **kwargs)
+                except Exception as e:
+                    last_error = e
+                    await server.disconnect()
+                    if not idempotent:
+                        # 同一副本的重试已用完，非幂等工具不再换副本重复执行
+                        logging.warning(f"[MCP工具] 副本 {server.name} 调用 {tool_name} 失败（非幂等工具，不切换副本）: {e}")
+                        raise
+                    logging.warning(f"[MCP工具] 副本 {server.name} 调用 {tool_name} 失败，尝试下一个副本: {e}")
+            finally:
+                server.outstanding -= 1
+        raise last_error
+
+    async def close(self) -> None:
+        await asyncio.gather(*(s.disconnect() for replicas in self.groups.values() for s in replicas))
+
+
+class _LoopThread:
+    """常驻后台事件循环，持有全部MCP会话；同步调用与其他事件循环中的调用都提交到这里执行"""
+
+    def __init__(self) -> None:
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="mcp-client-loop", daemon=True)
+        self.thread.start()
+
+    def run(self, coro, timeout: Optional[float] = None) -> Any:
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    async def run_async(self, coro) -> Any:
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self.loop:
+            return await coro
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self.loop))
+
+
 # 兼容原有接口
 _config_cache = None
-_server_cache = None
+_pool: Optional[ServerPool] = None
+_loop_thread: Optional[_LoopThread] = None
+_pool_lock = threading.Lock()
 
 def load_mcp_servers_config(config_path=None) -> dict:
     global _config_cache
@@ -153,33 +389,41 @@ def load_mcp_servers_config(config_path=None) -> dict:
         _config_cache = json.load(f)
     return _config_cache
 
+def get_server_pool() -> ServerPool:
+    global _pool, _loop_thread
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _loop_thread = _LoopThread()
+                _pool = ServerPool(load_mcp_servers_config())
+                atexit.register(close_mcp_servers)
+    return _pool
+
+def close_mcp_servers(timeout: float = 5.0) -> None:
+    """关闭全部持久会话（进程退出时自动调用）"""
+    if _pool is None or _loop_thread is None:
+        return
+    try:
+        _loop_thread.run(_pool.close(), timeout=timeout)
+    except Exception as e:
+        logging.warning(f"[MCP工具] 关闭MCP会话异常: {e}")
+
 def get_server(server_name: Optional[str] = None) -> Server:
-    global _server_cache
-    if _server_cache is not None and (server_name is None or _server_cache.name == server_name):
-        return _server_cache
-    config = load_mcp_servers_config()
-    servers = config.get('mcpServers', {})
-    if not servers:
-        raise RuntimeError("mcpServers.json未配置任何MCP服务")
-    if server_name and server_name in servers:
-        srv = Server(server_name, servers[server_name])
-    else:
-        name, conf = next(iter(servers.items()))
-        srv = Server(name, conf)
-    _server_cache = srv
-    return srv
+    """返回服务的一个副本（未完成请求最少者）；未指定时返回第一个配置的服务"""
+    pool = get_server_pool()
+    return pool.candidates(pool.route("", server_name))[0]
 
 async def list_mcp_tools_async(server_name=None):
-    server = get_server(server_name)
+    pool = get_server_pool()
     try:
-        await server.initialize()
-        tools = await server.list_tools()
+        tools = await _loop_thread.run_async(pool.list_tools(server_name))
         return [
             {
                 "name": t.get("name"),
                 "description": t.get("description"),
                 "inputSchema": t.get("inputSchema"),
-                "title": t.get("title")
+                "title": t.get("title"),
+                "annotations": _dump_annotations(t.get("annotations"))
             } for t in tools
         ]
     except (GeneratorExit, RuntimeError) as e:
@@ -190,7 +434,8 @@ async def list_mcp_tools_async(server_name=None):
         return []
 
 def list_mcp_tools(server_name=None):
-    return asyncio.run(list_mcp_tools_async(server_name))
+    get_server_pool()
+    return _loop_thread.run(list_mcp_tools_async(server_name))
 
 def format_tool_schema(tool: dict) -> str:
     # 直接用dict格式化
@@ -213,23 +458,104 @@ def format_tool_schema(tool: dict) -> str:
             output += f"- {out_name}: {out_info.get('description', 'No description')}\n"
     return output
 
-async def call_mcp_tool_async(tool_name, params, server_name=None, **kwargs):
-    server = get_server(server_name)
+async def _call_mcp_tool_raw(tool_name, params, server_name=None, use_cache=True, flow=None, **kwargs):
+    """
+    调用MCP工具，异常直接抛出；可缓存的工具先查结果缓存，相同参数的并发调用只发起一次。
+    实际发起调用时占用一个MCP共享槽位，槽位已满时按调度流 flow 公平排队（命中缓存不占槽位）。
+    """
+    pool = get_server_pool()
+
+    async def fetch():
+        async with scheduler.get_scheduler("mcp").slot_async(flow):
+            return await _loop_thread.run_async(pool.call_tool(tool_name, params, server_name, **kwargs))
+
+    if not get_settings().tool_cache_enabled:
+        return await fetch()
+    from tools.tool_result_cache import get_tool_result_cache
+    cache = get_tool_result_cache()
+    if use_cache:
+        return await cache.call(tool_name, params, fetch, server_name)
+    # 跳过缓存的调用仍可能是写操作，完成后同样清除受影响的缓存条目
+    try:
+        return await fetch()
+    finally:
+        cache.invalidate_for(tool_name, params)
+
+async def call_mcp_tool_async(tool_name, params, server_name=None, use_cache=True, timeout=None, flow=None, **kwargs):
+    """
+    调用MCP工具，失败或超时返回 None。timeout 为空时取 MCP_TOOL_CALL_TIMEOUT_SECONDS
+    与当前截止时间剩余时间中的较小者（含等待共享槽位的时间）；flow 为空时取当前调度流。
+    所在任务已取消或已超时时抛出 TaskCancelled/DeadlineExceeded。
+    """
+    if timeout is None:
+        timeout = deadline.effective_timeout(get_settings().mcp_tool_call_timeout_seconds)
+    flow = flow or scheduler.current_flow()
     try:
-        await server.initialize()
-        return await server.execute_tool(tool_name, params, **kwargs)
+        return await asyncio.wait_for(_call_mcp_tool_raw(tool_name, params, server_name, use_cache, flow, **kwargs), timeout)
+    except asyncio.TimeoutError:
+        logging.error(f"[MCP工具] 工具 {tool_name} 调用超时（{timeout:.1f}s）")
     except (GeneratorExit, RuntimeError) as e:
         logging.error(f"[MCP工具] 流关闭异常: {e}")
-        return None
     except Exception as e:
         logging.error(f"[MCP工具] 工具调用异常: {e}")
-        return None
+    # 因截止时间耗尽而失败时向上抛出，便于调用方停止后续步骤
+    deadline.check()
+    return None
+
+def call_mcp_tool(tool_name, params, server_name=None, use_cache=True, **kwargs):
+    get_server_pool()
+    # 截止时间与调度流保存在调用线程的上下文中，需在提交到后台事件循环前换算为超时并取出
+    timeout = deadline.effective_timeout(get_settings().mcp_tool_call_timeout_seconds)
+    flow = scheduler.current_flow()
+    result = _loop_thread.run(call_mcp_tool_async(tool_name, params, server_name, use_cache=use_cache, timeout=timeout, flow=flow, **kwargs))
+    if result is None:
+        deadline.check()
+    return result
+
+async def call_mcp_tools_batch_async(calls, server_name=None, max_concurrency=None, use_cache=True, timeout=None, flow=None, **kwargs):
+    """
+    并发执行一批工具调用，复用持久会话（同一会话上的请求多路复用），整批耗时约等于最慢的一次调用。
+
+    Args:
+        calls: [(工具名, 参数字典), ...]
+        max_concurrency: 同时进行的调用数上限，默认 MCP_BATCH_MAX_CONCURRENCY。
+        timeout: 单个调用的超时，为空时按 MCP_TOOL_CALL_TIMEOUT_SECONDS 与当前截止时间计算。
+        flow: 调度流，为空时取当前调度流；每个调用另外占用一个MCP共享槽位。
+
+    Returns:
+        与 calls 顺序一致的列表，每项为 {"tool", "success", "result"} 或 {"tool", "success": False, "error"}。
+    """
+    if timeout is None:
+        timeout = deadline.effective_timeout(get_settings().mcp_tool_call_timeout_seconds)
+    flow = flow or scheduler.current_flow()
+    semaphore = asyncio.Semaphore(max_concurrency or get_settings().mcp_batch_max_concurrency)
+
+    async def run(tool_name, params):
+        async with semaphore:
+            try:
+                result = await asyncio.wait_for(_call_mcp_tool_raw(tool_name, params, server_name, use_cache, flow, **kwargs), timeout)
+                return {"tool": tool_name, "success": not getattr(result, "isError", False), "result": result}
+            except asyncio.TimeoutError:
+                logging.error(f"[MCP工具] 批量调用 {tool_name} 超时")
+                return {"tool": tool_name, "success": False, "error": "timeout"}
+            except Exception as e:
+                logging.error(f"[MCP工具] 批量调用 {tool_name} 异常: {e}")
+                return {"tool": tool_name, "success": False, "error": str(e)}
+
+    return await asyncio.gather(*(run(tool_name, params) for tool_name, params in calls))
 
-def call_mcp_tool(tool_name, params, server_name=None, **kwargs):
-    return asyncio.run(call_mcp_tool_async(tool_name, params, server_name, **kwargs))
+def call_mcp_tools_batch(calls, server_name=None, max_concurrency=None, use_cache=True, **kwargs):
+    get_server_pool()
+    timeout = deadline.effective_timeout(get_settings().mcp_tool_call_timeout_seconds)
+    return _loop_thread.run(call_mcp_tools_batch_async(calls, server_name, max_concurrency, use_cache, timeout,
+                                                       scheduler.current_flow(), **kwargs))
 
 __all__ = [
     "call_mcp_tool",
+    "call_mcp_tools_batch",
     "list_mcp_tools",
-    "format_tool_schema"
+    "get_server_pool",
+    "close_mcp_servers",
+    "format_tool_schema",
+    "on_tool_list_changed"
 ] 
\ No newline at end of file
@@ -0,0 +1,311 @@
+"""
+公平调度模块
+多个蓝图同时运行时，LLM 与 MCP 调用共享有限的并发槽位。每个请求属于一个调度流（租户 + 优先级），
+槽位按加权公平排队（SCFQ，自计时公平排队）分配：流的权重 = 优先级权重 × 租户权重，
+权重越大的流排队标签增长越慢，交互式请求即使在大批量作业运行时也能很快拿到槽位，低优先级流也不会饿死。
+低优先级运行在任务边界（开始下一个任务前）检查是否有更高优先级的请求在排队，有则暂缓，实现任务粒度的抢占。
+"""
+
+import asyncio
+import contextvars
+import heapq
+import itertools
+import logging
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from config.settings import get_settings
+from tools import deadline
+
+DEFAULT_TENANT = "default"
+
+
+@lru_cache(maxsize=16)
+def _parse_weights(spec: str) -> Dict[str, float]:
+    """解析 "name:weight,name:weight" 格式的权重配置，格式错误的条目忽略"""
+    weights = {}
+    for item in (spec or "").split(","):
+        name, _, value = item.strip().partition(":")
+        try:
+            if name and float(value) > 0:
+                weights[name.strip()] = float(value)
+        except ValueError:
+            logging.warning(f"[调度] 忽略无效的权重配置: {item}")
+    return weights
+
+
+def priority_weights() -> Dict[str, float]:
+    """优先级名 -> 权重（SCHEDULER_PRIORITY_WEIGHTS），权重越大优先级越高"""
+    return _parse_weights(get_settings().scheduler_priority_weights)
+
+
+def tenant_weight(tenant: str) -> float:
+    """租户权重（SCHEDULER_TENANT_WEIGHTS），未配置的租户为1"""
+    return _parse_weights(get_settings().scheduler_tenant_weights).get(tenant, 1.0)
+
+
+def validate_priority(priority: str) -> str:
+    """校验优先级名，未配置时抛出 ValueError"""
+    if priority not in priority_weights():
+        raise ValueError(f"未知的优先级 {priority}，可选: {', '.join(priority_weights())}")
+    return priority
+
+
+@dataclass(frozen=True)
+class Flow:
+    """调度流：同一租户、同一优先级的请求共享一个公平份额"""
+    tenant: str = DEFAULT_TENANT
+    priority: str = "normal"
+
+    @property
+    def rank(self) -> float:
+        return priority_weights().get(self.priority, 1.0)
+
+    @property
+    def weight(self) -> float:
+        return self.rank * tenant_weight(self.tenant)
+
+
+_current: contextvars.ContextVar[Optional[Flow]] = contextvars.ContextVar("scheduling_flow", default=None)
+
+
+def current_flow() -> Flow:
+    """当前调度流，未进入调度作用域时为默认租户 + SCHEDULER_DEFAULT_PRIORITY"""
+    return _current.get() or Flow(DEFAULT_TENANT, get_settings().scheduler_default_priority)
+
+
+@contextmanager
+def scheduling(tenant: Optional[str] = None, priority: Optional[str] = None):
+    """进入调度作用域，未指定的字段沿用外层；未配置的优先级记录警告后沿用外层优先级"""
+    outer = current_flow()
+    if priority and priority not in priority_weights():
+        logging.warning(f"[调度] 未知的优先级 {priority}，沿用 {outer.priority}")
+        priority = None
+    flow = Flow(tenant or outer.tenant, priority or outer.priority)
+    token = _current.set(flow)
+    try:
+        yield flow
+    finally:
+        _current.reset(token)
+
+
+class FairQueue:
+    """
+    SCFQ 标签计算（非线程安全，由调用方加锁）。
+    tag 为新请求计算完成标签 max(虚拟时间, 该流上一个标签) + cost/权重，标签小者先服务；
+    advance 在请求被服务时把虚拟时间推进到它的标签。
+    """
+
+    def __init__(self):
+        self.virtual_time = 0.0
+        self._last_finish: Dict[Flow, float] = {}
+
+    def tag(self, flow: Flow, cost: float = 1.0) -> float:
+        start = max(self.virtual_time, self._last_finish.get(flow, 0.0))
+        finish = start + cost / flow.weight
+        self._last_finish[flow] = finish
+        return finish
+
+    def advance(self, tag: float):
+        self.virtual_time = max(self.virtual_time, tag)
+        if len(self._last_finish) > 1024:
+            # 标签已落后于虚拟时间的流与新流等价，不必再记录
+            self._last_finish = {f: t for f, t in self._last_finish.items() if t > self.virtual_time}
+
+
+class _Waiter:
+    __slots__ = ("flow", "tag", "enqueued_at", "granted", "cancelled", "event", "loop", "future")
+
+    def __init__(self, flow: Flow, tag: float, loop=None, future=None):
+        self.flow = flow
+        self.tag = tag
+        self.enqueued_at = time.monotonic()
+        self.granted = False
+        self.cancelled = False
+        self.event = threading.Event() if loop is None else None
+        self.loop = loop
+        self.future = future
+
+    def wake(self):
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class FairScheduler:
+    """
+    一组共享并发槽位（capacity 为0表示不限）。
+
+    slot / slot_async 获取一个槽位，槽位已满时按 SCFQ 标签排队；线程安全，
+    同步调用方与不同事件循环中的协程可以同时排队。
+    """
+
+    def __init__(self, name: str, capacity: int):
+        self.name = name
+        self.capacity = capacity
+        self.in_use = 0
+        self._lock = threading.Lock()
+        self._heap: List[tuple] = []
+        self._seq = itertools.count()
+        self._fair = FairQueue()
+        self._waiting: Dict[str, int] = {}
+        self.granted: Dict[str, int] = {}
+        self.wait_seconds: Dict[str, float] = {}
+
+    def _enqueue(self, waiter: _Waiter) -> bool:
+        """加锁调用：有空闲槽位且无人排队时直接授予，否则入队；返回是否已授予"""
+        if not self.capacity or (self.in_use < self.capacity and not self._heap):
+            self._grant(waiter)
+            return True
+        heapq.heappush(self._heap, (waiter.tag, next(self._seq), waiter))
+        self._waiting[waiter.flow.priority] = self._waiting.get(waiter.flow.priority, 0) + 1
+        return False
+
+    def _grant(self, waiter: _Waiter):
+        waiter.granted = True
+        self.in_use += 1
+        self._fair.advance(waiter.tag)
+        priority = waiter.flow.priority
+        self.granted[priority] = self.granted.get(priority, 0) + 1
+        self.wait_seconds[priority] = self.wait_seconds.get(priority, 0.0) + time.monotonic() - waiter.enqueued_at
+
+    def _dispatch(self):
+        """加锁调用：按标签顺序把空闲槽位授予排队的请求"""
+        while self._heap and (not self.capacity or self.in_use < self.capacity):
+            _, _, waiter = heapq.heappop(self._heap)
+            if waiter.cancelled:
+                continue
+            self._waiting[waiter.flow.priority] -= 1
+            self._grant(waiter)
+            waiter.wake()
+
+    def _release(self):
+        with self._lock:
+            self.in_use -= 1
+            self._dispatch()
+
+    def _abandon(self, waiter: _Waiter):
+        """放弃排队；已被授予的槽位归还"""
+        with self._lock:
+            if not waiter.granted:
+                waiter.cancelled = True
+                self._waiting[waiter.flow.priority] -= 1
+                return
+        self._release()
+
+    def waiting_above(self, rank: float) -> int:
+        """优先级权重高于 rank 的排队请求数"""
+        weights = priority_weights()
+        with self._lock:
+            return sum(n for p, n in self._waiting.items() if weights.get(p, 1.0) > rank)
+
+    @contextmanager
+    def slot(self, flow: Optional[Flow] = None, cost: float = 1.0):
+        """同步获取槽位；排队期间所在任务被取消或超过截止时间时抛出 TaskCancelled/DeadlineExceeded"""
+        flow = flow or current_flow()
+        with self._lock:
+            waiter = _Waiter(flow, self._fair.tag(flow, cost))
+            granted = self._enqueue(waiter)
+        if not granted:
+            try:
+                while not waiter.event.wait(0.2):
+                    deadline.check()
+            except BaseException:
+                self._abandon(waiter)
+                raise
+        try:
+            yield
+        finally:
+            self._release()
+
+    @asynccontextmanager
+    async def slot_async(self, flow: Optional[Flow] = None, cost: float = 1.0):
+        """异步获取槽位；外层 wait_for 超时或协程被取消时放弃排队"""
+        flow = flow or current_flow()
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            waiter = _Waiter(flow, self._fair.tag(flow, cost), loop, loop.create_future())
+            granted = self._enqueue(waiter)
+        if not granted:
+            try:
+                await waiter.future
+            except BaseException:
+                self._abandon(waiter)
+                raise
+        try:
+            yield
+        finally:
+            self._release()
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "capacity": self.capacity,
+                "in_use": self.in_use,
+                "waiting": dict(self._waiting),
+                "granted": dict(self.granted),
+                "wait_seconds": dict(self.wait_seconds),
+            }
+
+
+_schedulers: Dict[str, FairScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(kind: str) -> FairScheduler:
+    """获取进程内共享的槽位调度器：kind 为 "llm"（SCHEDULER_LLM_SLOTS）或 "mcp"（SCHEDULER_MCP_SLOTS）"""
+    scheduler = _schedulers.get(kind)
+    if scheduler is None:
+        with _schedulers_lock:
+            scheduler = _schedulers.get(kind)
+            if scheduler is None:
+                settings = get_settings()
+                capacity = {"llm": settings.scheduler_llm_slots, "mcp": settings.scheduler_mcp_slots}[kind]
+                scheduler = _schedulers[kind] = FairScheduler(kind, capacity)
+    return scheduler
+
+
+def all_schedulers() -> List[FairScheduler]:
+    return list(_schedulers.values())
+
+
+def yield_point(max_wait: Optional[float] = None) -> float:
+    """
+    任务边界的抢占点：有优先级更高的请求在排队等待槽位时，当前运行暂不开始下一个任务，
+    直到这些请求都拿到槽位或已等待 max_wait 秒（默认 SCHEDULER_PREEMPT_MAX_WAIT_SECONDS）；返回让出的秒数。
+    当前截止时间作用域已取消或超时时立即返回，由调用方按原有逻辑处理。
+    """
+    if max_wait is None:
+        max_wait = get_settings().scheduler_preempt_max_wait_seconds
+    rank = current_flow().rank
+    scope = deadline.current_deadline()
+    start = time.monotonic()
+    while time.monotonic() - start < max_wait and any(s.waiting_above(rank) for s in all_schedulers()):
+        if scope is not None and (scope.cancelled or scope.expired):
+            break
+        time.sleep(0.05)
+    return time.monotonic() - start
+
+
+__all__ = [
+    "Flow",
+    "FairQueue",
+    "FairScheduler",
+    "current_flow",
+    "scheduling",
+    "priority_weights",
+    "validate_priority",
+    "get_scheduler",
+    "all_schedulers",
+    "yield_point",
+]
@@ -0,0 +1,180 @@
+"""
+工具目录模块
+进程内共享的MCP工具schema目录：按TTL在后台线程刷新（过期时先返回旧数据），
+以内容哈希作为版本号，响应服务端 tools/list_changed 通知，并落盘快照以加速冷启动。
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+from config.settings import get_settings
+from tools.mcp_tools import list_mcp_tools, on_tool_list_changed
+
+
+def schema_version(tool_schemas: List[dict]) -> str:
+    """工具schema列表的内容哈希，schema有任何变化时版本随之变化"""
+    canonical = json.dumps(tool_schemas, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:16]
+
+
+class ToolCatalog:
+    """
+    共享工具目录。
+
+    get 永不因刷新而阻塞（仅在既无内存数据也无磁盘快照的首次调用时同步加载一次）；
+    数据超过TTL或收到变更通知后由后台线程重新拉取，版本变化时写快照并通知订阅者。
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: Optional[float] = None,
+        snapshot_path: Optional[str] = None,
+        loader: Callable[[], List[dict]] = list_mcp_tools
+    ):
+        settings = get_settings()
+        self.ttl_seconds = settings.tool_catalog_ttl_seconds if ttl_seconds is None else ttl_seconds
+        self.snapshot_path = settings.tool_catalog_snapshot_path if snapshot_path is None else snapshot_path
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._schemas: List[dict] = []
+        self._version: Optional[str] = None
+        self._loaded_at = 0.0
+        self._loaded = False
+        self._stale = True
+        self._refreshing = False
+        self._listeners: List[Callable[[List[dict], str], None]] = []
+        self._load_snapshot()
+
+    @property
+    def version(self) -> Optional[str]:
+        return self._version
+
+    def get(self) -> Tuple[List[dict], Optional[str]]:
+        """返回 (工具schema列表, 版本号)；数据过期时触发后台刷新并立即返回当前数据"""
+        if not self._loaded:
+            with self._load_lock:
+                if not self._loaded:
+                    self.refresh()
+        elif self._stale or time.time() - self._loaded_at > self.ttl_seconds:
+            self.refresh_async()
+        with self._lock:
+            return self._schemas, self._version
+
+    def get_schemas(self) -> List[dict]:
+        return self.get()[0]
+
+    def find(self, tool_name: str) -> Optional[dict]:
+        """按名称查找工具schema，只查当前已有数据，不触发加载或刷新"""
+        with self._lock:
+            schemas = self._schemas
+        return next((t for t in schemas if t.get("name") == tool_name), None)
+
+    def subscribe(self, callback: Callable[[List[dict], str], None]):
+        """注册版本变化回调，参数为 (新schema列表, 新版本号)，在刷新线程中调用"""
+        self._listeners.append(callback)
+
+    def invalidate(self, server_name: Optional[str] = None):
+        """标记目录过期并在后台刷新（收到 tools/list_changed 通知时调用）"""
+        self._stale = True
+        if self._loaded:
+            self.refresh_async()
+
+    def refresh_async(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh_worker, name="tool-catalog-refresh", daemon=True).start()
+
+    def _refresh_worker(self):
+        try:
+            self.refresh()
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def refresh(self) -> bool:
+        """同步拉取一次工具列表，版本变化时返回 True"""
+        self._stale = False
+        try:
+            schemas = self._loader()
+        except Exception as e:
+            logging.error(f"[工具目录] 工具列表拉取失败: {e}")
+            schemas = []
+        # list_mcp_tools 失败时返回空列表，此时保留已有目录，等下一个TTL周期重试
+        if not schemas and self._schemas:
+            with self._lock:
+                self._loaded_at = time.time()
+                self._loaded = True
+            return False
+        version = schema_version(schemas)
+        with self._lock:
+            changed = version != self._version
+            self._schemas, self._version = schemas, version
+            self._loaded_at = time.time()
+            self._loaded = True
+        if changed:
+            logging.info(f"[工具目录] 加载到 {len(schemas)} 个工具，版本 {version}")
+            self._save_snapshot(schemas, version)
+            for callback in list(self._listeners):
+                try:
+                    callback(schemas, version)
+                except Exception as e:
+                    logging.error(f"[工具目录] 版本变更回调异常: {e}")
+        return changed
+
+    def _load_snapshot(self):
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return
+        try:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+            self._schemas = snapshot["tools"]
+            self._version = snapshot.get("version") or schema_version(self._schemas)
+            # 快照只用于冷启动，首次 get 时仍会在后台刷新
+            self._loaded_at = snapshot.get("saved_at", 0.0)
+            self._loaded = True
+            self._stale = True
+        except Exception as e:
+            logging.warning(f"[工具目录] 快照读取失败，将重新拉取: {e}")
+
+    def _save_snapshot(self, schemas: List[dict], version: str):
+        if not self.snapshot_path:
+            return
+        try:
+            directory = os.path.dirname(os.path.abspath(self.snapshot_path))
+            os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.snapshot_path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"version": version, "saved_at": time.time(), "tools": schemas}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.snapshot_path)
+        except Exception as e:
+            logging.warning(f"[工具目录] 快照写入失败: {e}")
+
+
+_catalog: Optional[ToolCatalog] = None
+_catalog_lock = threading.Lock()
+
+
+def get_tool_catalog() -> ToolCatalog:
+    """获取全局工具目录（首次调用时创建并订阅工具列表变更通知）"""
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = ToolCatalog()
+                on_tool_list_changed(_catalog.invalidate)
+    return _catalog
+
+
+__all__ = [
+    "ToolCatalog",
+    "get_tool_catalog",
+    "schema_version"
+]
@@ -0,0 +1,391 @@
+"""
+MCP工具结果缓存模块
+为声明为幂等/只读的工具缓存调用结果：按规范化参数生成缓存键，按工具TTL过期，
+相同参数的并发调用合并为一次（single-flight），可选落盘以便跨进程、跨运行复用；
+写文件、写库等调用完成后按 INVALIDATION_RULES 清除受影响的缓存条目，写后读不会拿到旧数据。
+"""
+
+import asyncio
+import concurrent.futures
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from config.settings import get_settings
+from tools.tool_catalog import get_tool_catalog
+
+_SELECT_PATTERN = re.compile(r'^\s*(with\b[\s\S]*?\)\s*)?select\b', re.IGNORECASE)
+_WRITE_PATTERN = re.compile(r'\b(insert|update|delete|merge|create|drop|alter|truncate|grant|revoke)\b|\binto\b', re.IGNORECASE)
+# 加行锁的 SELECT（FOR UPDATE 已由 _WRITE_PATTERN 排除）与有副作用的函数调用
+_SIDE_EFFECT_PATTERN = re.compile(
+    r'\bfor\s+(key\s+)?share\b'
+    r'|\b(nextval|setval|set_config|pg_advisory_\w+|pg_try_advisory_\w+|pg_notify|pg_sleep|'
+    r'pg_cancel_backend|pg_terminate_backend|lo_import|lo_export|dblink_exec)\s*\(',
+    re.IGNORECASE
+)
+
+
+def _is_select_query(params: dict) -> bool:
+    """只缓存单条、只读且无副作用的SELECT语句"""
+    sql = (params or {}).get("sql") or ""
+    return (bool(_SELECT_PATTERN.match(sql)) and not _WRITE_PATTERN.search(sql)
+            and not _SIDE_EFFECT_PATTERN.search(sql) and ";" not in sql.strip().rstrip(";"))
+
+
+def _is_stable_read(params: dict) -> bool:
+    """tail_lines 与按 offset 续读通常用于跟踪持续追加的文件，结果很快过时，不缓存"""
+    params = params or {}
+    return not params.get("tail_lines") and params.get("offset") is None
+
+
+def _result_payload(result: Any) -> Any:
+    """取出工具结果中的结构化内容（dict结果、structuredContent 或首个JSON文本块）"""
+    if isinstance(result, dict):
+        return result
+    structured = getattr(result, "structuredContent", None)
+    if structured is not None:
+        return structured
+    for block in getattr(result, "content", None) or []:
+        text = getattr(block, "text", None)
+        if text:
+            try:
+                return json.loads(text)
+            except ValueError:
+                return None
+    return None
+
+
+def _is_complete_page(result: Any) -> bool:
+    """分页查询只缓存已读完的结果，带续页游标的结果不可复用"""
+    payload = _result_payload(result)
+    return not (isinstance(payload, dict) and payload.get("has_more"))
+
+
+@dataclass
+class CachePolicy:
+    """
+    工具缓存策略：ttl_seconds 为结果有效期，predicate 按参数判断本次调用是否可缓存，
+    result_predicate 按结果判断是否可写入缓存。
+    """
+    ttl_seconds: float
+    predicate: Optional[Callable[[dict], bool]] = None
+    result_predicate: Optional[Callable[[Any], bool]] = None
+
+    def allows(self, params: dict) -> bool:
+        return self.predicate is None or self.predicate(params)
+
+    def accepts(self, result: Any) -> bool:
+        return self.result_predicate is None or self.result_predicate(result)
+
+
+def _same_file(writer_params: dict, cached_params: dict) -> bool:
+    """写入的文件与缓存的读取结果是同一路径"""
+    def normalize(params):
+        path = params.get("file_path")
+        return os.path.abspath(str(path)) if path else None
+    return normalize(writer_params) is not None and normalize(writer_params) == normalize(cached_params)
+
+
+def _always(writer_params: dict, cached_params: dict) -> bool:
+    return True
+
+
+# 写操作完成后失效的缓存：写工具 -> [(被缓存的工具, 判断缓存条目是否受影响)]；
+# database_execute_sql 只有不可缓存（非SELECT）的调用才会触发失效
+INVALIDATION_RULES: Dict[str, List[Tuple[str, Callable[[dict, dict], bool]]]] = {
+    "write_file": [("read_file", _same_file)],
+    "append_file": [("read_file", _same_file)],
+    "database_execute_sql": [("database_execute_sql", _always)],
+    "database_create_table": [("database_execute_sql", _always)],
+    "database_drop_table": [("database_execute_sql", _always)],
+}
+
+# 进行中的调用被取消时交给等待者的标记：等待者重新查缓存并自行发起调用，不继承发起者的取消
+_RETRY = object()
+
+
+# 客户端侧默认策略，服务端未声明注解的已知只读工具也能命中缓存
+DEFAULT_CACHE_POLICIES: Dict[str, CachePolicy] = {
+    "google_news_search": CachePolicy(ttl_seconds=1800),
+    "api_get": CachePolicy(ttl_seconds=300),
+    "read_file": CachePolicy(ttl_seconds=60, predicate=_is_stable_read),
+    "database_execute_sql": CachePolicy(ttl_seconds=300, predicate=_is_select_query, result_predicate=_is_complete_page),
+}
+
+
+def _annotation(annotations: dict, camel: str, snake: str) -> bool:
+    return bool(annotations.get(camel, annotations.get(snake)))
+
+
+def make_cache_key(tool_name: str, params: Optional[dict], server_name: Optional[str] = None) -> str:
+    """由工具名、服务名和规范化参数（键排序、紧凑分隔）生成缓存键"""
+    canonical = json.dumps(
+        {"server": server_name, "tool": tool_name, "params": params or {}},
+        ensure_ascii=False, sort_keys=True, separators=(',', ':'), default=str
+    )
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def _is_error_result(result: Any) -> bool:
+    if result is None:
+        return True
+    if isinstance(result, dict):
+        return bool(result.get("isError")) or result.get("success") is False
+    return bool(getattr(result, "isError", False))
+
+
+def _serialize_result(result: Any) -> Any:
+    if hasattr(result, "model_dump"):
+        return {"__type__": "CallToolResult", "data": result.model_dump(mode="json", by_alias=True)}
+    return {"__type__": "json", "data": result}
+
+
+def _deserialize_result(payload: dict) -> Any:
+    if payload.get("__type__") == "CallToolResult":
+        from mcp.types import CallToolResult
+        return CallToolResult.model_validate(payload["data"])
+    return payload.get("data")
+
+
+class ToolResultCache:
+    """
+    工具结果缓存。
+
+    内存中为有界LRU，配置了 cache_dir 时同时写入磁盘（每个键一个JSON文件）；
+    进行中的调用按缓存键登记为 concurrent.futures.Future，其他线程/事件循环中的
+    相同调用直接等待该Future，不再重复请求。
+    """
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        cache_dir: Optional[str] = None,
+        default_ttl_seconds: Optional[float] = None,
+        policies: Optional[Dict[str, CachePolicy]] = None
+    ):
+        settings = get_settings()
+        self.max_entries = settings.tool_cache_max_entries if max_entries is None else max_entries
+        self.cache_dir = settings.tool_cache_dir if cache_dir is None else cache_dir
+        self.default_ttl_seconds = settings.tool_cache_default_ttl_seconds if default_ttl_seconds is None else default_ttl_seconds
+        self.policies = dict(DEFAULT_CACHE_POLICIES if policies is None else policies)
+        self._lock = threading.Lock()
+        # 缓存键 -> (过期时间, 结果, 工具名, 参数)，工具名与参数用于写操作后的失效匹配
+        self._entries: "OrderedDict[str, Tuple[float, Any, Optional[str], Optional[dict]]]" = OrderedDict()
+        self._inflight: Dict[str, concurrent.futures.Future] = {}
+        # 每次失效递增；调用期间发生过失效的结果不写入缓存（可能是写操作之前读到的旧数据）
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    def register_policy(
+        self,
+        tool_name: str,
+        ttl_seconds: float,
+        predicate: Optional[Callable[[dict], bool]] = None,
+        result_predicate: Optional[Callable[[Any], bool]] = None
+    ):
+        """为工具声明缓存策略（覆盖默认策略）"""
+        self.policies[tool_name] = CachePolicy(ttl_seconds, predicate, result_predicate)
+
+    def policy_for(self, tool_name: str, params: dict) -> Optional[CachePolicy]:
+        """
+        返回本次调用适用的缓存策略，不可缓存时返回 None。
+        显式策略优先；否则服务端注解同时声明 readOnlyHint 与 idempotentHint 的工具使用默认TTL
+        （INVALIDATION_RULES 中的写工具除外）。
+        """
+        policy = self.policies.get(tool_name)
+        if policy is None and tool_name not in INVALIDATION_RULES:
+            # 写工具（会使其他缓存失效的工具）即使注解声明只读也不缓存
+            tool = get_tool_catalog().find(tool_name)
+            annotations = (tool or {}).get("annotations") or {}
+            if _annotation(annotations, "readOnlyHint", "read_only_hint") and _annotation(annotations, "idempotentHint", "idempotent_hint"):
+                policy = CachePolicy(self.default_ttl_seconds)
+        if policy is None or policy.ttl_seconds <= 0 or not policy.allows(params):
+            return None
+        return policy
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    return True, entry[1]
+                del self._entries[key]
+        if self.cache_dir:
+            path = self._path(key)
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    payload = json.load(f)
+                if payload["expires_at"] > now:
+                    value = _deserialize_result(payload["result"])
+                    self._remember(key, payload["expires_at"], value, payload.get("tool"), payload.get("params"))
+                    return True, value
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                logging.warning(f"[工具缓存] 读取缓存文件失败: {e}")
+        return False, None
+
+    def set(self, key: str, value: Any, ttl_seconds: float, tool_name: Optional[str] = None, params: Optional[dict] = None):
+        expires_at = time.time() + ttl_seconds
+        self._remember(key, expires_at, value, tool_name, params)
+        if self.cache_dir:
+            try:
+                tmp_path = f"{self._path(key)}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump({"expires_at": expires_at, "tool": tool_name, "params": params,
+                               "result": _serialize_result(value)}, f, ensure_ascii=False, default=str)
+                os.replace(tmp_path, self._path(key))
+            except Exception as e:
+                logging.warning(f"[工具缓存] 写入缓存文件失败: {e}")
+
+    def _remember(self, key: str, expires_at: float, value: Any, tool_name: Optional[str] = None, params: Optional[dict] = None):
+        with self._lock:
+            self._entries[key] = (expires_at, value, tool_name, params)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def invalidate_for(self, tool_name: str, params: Optional[dict]) -> int:
+        """
+        写工具调用完成后清除受影响的缓存条目（内存与磁盘），返回清除的条数。
+        磁盘缓存需逐个读取文件比对，写操作远少于读操作，开销可以接受。
+        """
+        rules = INVALIDATION_RULES.get(tool_name)
+        if not rules:
+            return 0
+        params = params or {}
+
+        def affected(cached_tool, cached_params):
+            return any(cached_tool == target and match(params, cached_params or {}) for target, match in rules)
+
+        with self._lock:
+            self._generation += 1
+            stale = [key for key, entry in self._entries.items() if affected(entry[2], entry[3])]
+            for key in stale:
+                del self._entries[key]
+        removed = len(stale)
+        if self.cache_dir:
+            for name in os.listdir(self.cache_dir):
+                if not name.endswith(".json") or name[:-5] in stale:
+                    continue
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        payload = json.load(f)
+                    if affected(payload.get("tool"), payload.get("params")):
+                        os.remove(path)
+                        removed += 1
+                except FileNotFoundError:
+                    pass
+                except Exception as e:
+                    logging.warning(f"[工具缓存] 清除缓存文件失败: {e}")
+            for key in stale:
+                try:
+                    os.remove(self._path(key))
+                except FileNotFoundError:
+                    pass
+        if removed:
+            logging.info(f"[工具缓存] {tool_name} 写操作后清除 {removed} 条缓存")
+        return removed
+
+    async def call(
+        self,
+        tool_name: str,
+        params: dict,
+        fetch: Callable[[], Awaitable[Any]],
+        server_name: Optional[str] = None
+    ) -> Any:
+        """
+        带缓存地执行一次工具调用，fetch 为实际发起调用的协程工厂。
+        出错或 isError 的结果不会写入缓存；不可缓存的调用完成后按 INVALIDATION_RULES 清除受影响的条目。
+        相同调用的等待者各自受自身超时约束：等待者超时不影响进行中的调用，
+        发起者被取消时由等待者重新发起，而不是把取消传给它们。
+        """
+        policy = self.policy_for(tool_name, params)
+        if policy is None:
+            try:
+                return await fetch()
+            finally:
+                self.invalidate_for(tool_name, params)
+        key = make_cache_key(tool_name, params, server_name)
+        while True:
+            hit, value = self.get(key)
+            if hit:
+                self.hits += 1
+                logging.info(f"[工具缓存] 命中 {tool_name}")
+                return value
+            with self._lock:
+                future = self._inflight.get(key)
+                leader = future is None
+                if leader:
+                    future = concurrent.futures.Future()
+                    self._inflight[key] = future
+                generation = self._generation
+            if leader:
+                break
+            # 等待进行中的相同调用（可能位于其他线程的事件循环中）；shield 使本等待者的超时不会取消共享的Future
+            value = await asyncio.shield(asyncio.wrap_future(future))
+            if value is not _RETRY:
+                return value
+        self.misses += 1
+        try:
+            value = await fetch()
+        except BaseException as e:
+            # 先注销再通知等待者，重试的等待者不会再拿到这个已结束的Future
+            with self._lock:
+                self._inflight.pop(key, None)
+            if isinstance(e, Exception):
+                future.set_exception(e)
+            else:
+                future.set_result(_RETRY)
+            raise
+        if not _is_error_result(value) and policy.accepts(value) and self._generation == generation:
+            self.set(key, value, policy.ttl_seconds, tool_name, params)
+        with self._lock:
+            self._inflight.pop(key, None)
+        future.set_result(value)
+        return value
+
+
+_cache: Optional[ToolResultCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_tool_result_cache() -> ToolResultCache:
+    """获取全局工具结果缓存"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ToolResultCache()
+    return _cache
+
+
+__all__ = [
+    "CachePolicy",
+    "DEFAULT_CACHE_POLICIES",
+    "INVALIDATION_RULES",
+    "ToolResultCache",
+    "get_tool_result_cache",
+    "make_cache_key"
+]